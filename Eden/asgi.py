@@ -8,8 +8,13 @@ https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
 """
 
 import os
-import django
-from channels.routing import ProtocolTypeRouter, get_default_application
+from channels.routing import ProtocolTypeRouter
+from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Eden.settings')
-django.setup()
\ No newline at end of file
+# Lu par connection_settings() (Eden/settings/base.py) : pas de connexions persistantes sous ASGI.
+os.environ.setdefault('EDEN_SERVER', 'asgi')
+
+application = ProtocolTypeRouter({
+    'http': get_asgi_application(),
+})
@@ -23,11 +23,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'Website.middleware.AdmissionControlMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'Website.middleware.DisableCSRFForAPI',
     'django.middleware.csrf.CsrfViewMiddleware',
     'Website.middleware.SkipLoginForAPI',
+    'Website.middleware.ReplicaPinMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -66,17 +68,71 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Connexions PostgreSQL : 'pool' (pool psycopg par processus, statistiques sur /metrics/), 'persistent' (connexion
+# gardée DB_CONN_MAX_AGE secondes par thread, vérifiée avant réutilisation) ou 'close' (une connexion par requête).
+# Sous ASGI (daphne), 'persistent' devient 'pool' : les threads des vues n'y rendent pas leurs connexions.
+DB_CONNECTIONS = os.environ.get('DB_CONNECTIONS', 'pool')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+# Pool de chaque processus : MAX_SIZE vaut DB_POOL_MAX_SIZE, ou les connexions réservées au site (DB_MAX_CONNECTIONS)
+# réparties entre les processus web (WEB_CONCURRENCY, la variable lue par gunicorn). TIMEOUT : attente maximale
+# d'une connexion libre (secondes) ; au-delà la réception bascule sur le tampon disque.
+DB_POOL = {
+    'MIN_SIZE': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+    'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE') or max(
+        2, int(os.environ.get('DB_MAX_CONNECTIONS', 40)) // int(os.environ.get('WEB_CONCURRENCY', 1))
+    )),
+    'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+    'MAX_IDLE': 300,
+    'MAX_LIFETIME': 1800,
+}
+
+
+def connection_settings(database):
+    """Entrée de DATABASES complétée selon DB_CONNECTIONS (PostgreSQL uniquement)."""
+    if database['ENGINE'] != 'django.db.backends.postgresql':
+        return database
+    mode = DB_CONNECTIONS
+    if mode == 'persistent' and os.environ.get('EDEN_SERVER') == 'asgi':
+        mode = 'pool'
+    if mode == 'pool':
+        from psycopg_pool import ConnectionPool
+
+        return {**database, 'CONN_MAX_AGE': 0, 'OPTIONS': {**database.get('OPTIONS', {}), 'pool': {
+            'min_size': min(DB_POOL['MIN_SIZE'], DB_POOL['MAX_SIZE']),
+            'max_size': DB_POOL['MAX_SIZE'],
+            'timeout': DB_POOL['TIMEOUT'],
+            'max_idle': DB_POOL['MAX_IDLE'],
+            'max_lifetime': DB_POOL['MAX_LIFETIME'],
+            'check': ConnectionPool.check_connection,
+        }}}
+    if mode == 'persistent':
+        return {**database, 'CONN_MAX_AGE': DB_CONN_MAX_AGE, 'CONN_HEALTH_CHECKS': True}
+    return database
+
+
 DATABASES = {
-    'default': {
+    'default': connection_settings({
         'ENGINE': 'django.db.backends.postgresql',
         'NAME': os.environ.get('DB_NAME', 'eden_db'),
         'USER': os.environ.get('DB_USER', 'postgres'),
         'PASSWORD': os.environ.get('DB_PASSWORD', 'password'),
         'HOST': os.environ.get('DB_HOST', 'localhost'),
         'PORT': os.environ.get('DB_PORT', '5432'),
-    }
+    })
 }
 
+# Réplique en lecture (Website/replicas.py) : ajoutée si DB_REPLICA_HOST est défini, mêmes identifiants que 'default'.
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['Website.replicas.ReplicaRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -106,4 +162,138 @@ FILE_UPLOAD_HANDLERS = [
     'django.core.files.uploadhandler.TemporaryFileUploadHandler',
 ]
 
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Nombre maximal de relevés acceptés dans un même envoi groupé (batch), y compris lors de la reprise d'un arriéré
+INGEST_MAX_BATCH_SIZE = int(os.environ.get('INGEST_MAX_BATCH_SIZE', 2000))
+
+# Nombre maximal d'identifiants (Raspberry, emplacements) gardés en mémoire par processus
+INGEST_REGISTRY_SIZE = 10000
+
+# Durée pendant laquelle l'ancienne clé d'un Raspberry reste valide après une rotation
+DEVICE_KEY_GRACE_HOURS = 72
+
+# Durée (secondes) pendant laquelle un processus réutilise une clé de Raspberry sans la revérifier en base (rotation faite ailleurs)
+DEVICE_KEY_CACHE_TTL = 30
+
+# Durée (secondes) pendant laquelle l'état pompe/ventilateur renvoyé au Raspberry est gardé en cache
+DEVICE_STATE_TTL = 5
+
+# 'sync' : les données sont écrites en base avant la réponse.
+# 'queue' : les données sont validées puis mises en file ; `manage.py ingest_worker` les écrit.
+INGEST_MODE = os.environ.get('INGEST_MODE', 'sync')
+
+INGEST_QUEUE = {
+    'BACKEND': 'Website.ingest_queue.RedisStreamQueue',
+    'OPTIONS': {
+        'url': os.environ.get('INGEST_QUEUE_URL', 'redis://redis:6379/0'),
+        'stream': 'eden:ingest',
+        'visibility_timeout': 60,
+    },
+}
+INGEST_WORKER_BATCH_SIZE = 500
+INGEST_WORKER_MAX_AGE = 2.0
+
+# Vue de réception : 'sync' (DRF, WSGI ou ASGI) ou 'async' (native, à utiliser sous daphne)
+INGEST_VIEW = os.environ.get('INGEST_VIEW', 'sync')
+
+# Tampon disque utilisé quand la base est indisponible ou dépasse LATENCY_BUDGET_MS (mode sync), ou Redis injoignable (mode queue) ; Website/spool.py
+INGEST_SPOOL = {
+    'ENABLED': os.environ.get('INGEST_SPOOL_ENABLED', '1') == '1',
+    'DIRECTORY': os.environ.get('INGEST_SPOOL_DIR', str(BASE_DIR / 'spool')),
+    'SEGMENT_SIZE': 16 * 1024 * 1024,
+    'FSYNC': True,
+    'LATENCY_BUDGET_MS': 2000,
+    'RETRY_INTERVAL': 5,
+}
+
+# Limitation du débit de réception par Raspberry (seaux à jetons, voir Website/throttle.py) :
+# RATE envois par seconde, BURST envois d'affilée ; OVERRIDES par device_id ou nom de groupe ('RATE': None = illimité,
+# 'RATE': 0 = tout refuser). MAX_RETRY_AFTER : délai Retry-After maximal renvoyé (secondes).
+# Backend partagé entre processus : 'Website.throttle.RedisTokenBuckets' avec 'OPTIONS': {'url': 'redis://redis:6379/0'}
+INGEST_RATE_LIMIT = {
+    'ENABLED': os.environ.get('INGEST_RATE_LIMIT_ENABLED', '1') == '1',
+    'BACKEND': 'Website.throttle.LocalTokenBuckets',
+    'OPTIONS': {},
+    'RATE': 0.5,
+    'BURST': 30,
+    'MAX_RETRY_AFTER': 3600,
+    'OVERRIDES': {},
+}
+
+# Contrôle d'admission (Website/admission.py) : requêtes simultanées (LIMIT), file d'attente (QUEUE)
+# et attente maximale en secondes (TIMEOUT) par classe de route ; STALE sert la dernière réponse en cache
+# au lieu d'un 503. ROUTES : première expression (sur le chemin) qui correspond, None = non contrôlé.
+ADMISSION_CONTROL = {
+    'ENABLED': os.environ.get('ADMISSION_CONTROL_ENABLED', '1') == '1',
+    'ROUTES': [
+        (r'^/api/sensor-data/$', 'ingest'),
+        (r'^/(admin|metrics)/', 'admin'),
+        (r'^/(guest/|\d+/guest-graphs/)', 'guest'),
+        (r'^/(static|media)/', None),
+    ],
+    'DEFAULT_CLASS': 'dashboard',
+    'CLASSES': {
+        'ingest': {'LIMIT': 32, 'QUEUE': 128, 'TIMEOUT': 5.0},
+        'admin': {'LIMIT': 4, 'QUEUE': 8, 'TIMEOUT': 5.0},
+        'dashboard': {'LIMIT': 8, 'QUEUE': 16, 'TIMEOUT': 1.0, 'STALE': True},
+        'guest': {'LIMIT': 4, 'QUEUE': 8, 'TIMEOUT': 0.5, 'STALE': True},
+    },
+    'STALE_CACHE': 'default',
+    'STALE_TTL': 600,
+}
+
+# Partitions mensuelles de SensorData et Reading (Website/partitions.py, PostgreSQL) : « manage.py ensure_partitions »
+# crée MONTHS_AHEAD mois à l'avance ; « manage.py drop_expired_partitions » garde RETENTION_MONTHS mois (None = tout garder).
+SENSOR_DATA_PARTITIONS = {
+    'MONTHS_AHEAD': 3,
+    'RETENTION_MONTHS': int(os.environ['SENSOR_DATA_RETENTION_MONTHS']) if os.environ.get('SENSOR_DATA_RETENTION_MONTHS') else None,
+}
+
+# Agrégats horaires et journaliers (Website/rollups.py), tenus à jour à chaque enregistrement : les graphiques et
+# l'API les lisent au-delà de HOURLY_FROM_HOURS heures (grain horaire) et DAILY_FROM_HOURS heures (grain journalier).
+# « manage.py rebuild_rollups » calcule l'historique, « manage.py reconcile_rollups » rattrape les écritures tardives.
+ROLLUPS = {
+    'ENABLED': os.environ.get('ROLLUPS_ENABLED', '1') == '1',
+    'HOURLY_FROM_HOURS': 72,
+    'DAILY_FROM_HOURS': 24 * 90,
+}
+
+# Archive froide (Website/archive.py) : « manage.py archive_sensor_data » déplace les mois entiers plus anciens
+# que AFTER_DAYS jours dans des fichiers Parquet par Raspberry et par mois sous ROOT ; les graphiques et l'API les relisent.
+SENSOR_DATA_ARCHIVE = {
+    'ENABLED': os.environ.get('SENSOR_DATA_ARCHIVE_ENABLED', '0') == '1',
+    'ROOT': os.environ.get('SENSOR_DATA_ARCHIVE_DIR', str(BASE_DIR / 'archive')),
+    'AFTER_DAYS': int(os.environ.get('SENSOR_DATA_ARCHIVE_AFTER_DAYS', '365')),
+}
+
+# Stockage des relevés bruts (Website/chunks.py) : 'rows' (une ligne Reading/SensorData par relevé) ou 'chunks'
+# (un enregistrement compressé par Raspberry ou emplacement et par créneau de CHUNK_SECONDS secondes).
+SENSOR_DATA_STORAGE = {
+    'ENGINE': os.environ.get('SENSOR_DATA_STORAGE_ENGINE', 'rows'),
+    'CHUNK_SECONDS': 3600,
+}
+
+# Séries des graphiques : au plus MAX_POINTS points par courbe. SERIES = 'envelope' (moyenne de chaque créneau et
+# bande minimum/maximum, calculées en base) ou 'lttb' (relevés choisis par Largest-Triangle-Three-Buckets, sans bande).
+CHARTS = {
+    'SERIES': os.environ.get('CHART_SERIES', 'envelope'),
+    'MAX_POINTS': 200,
+}
+
+# get_latest_sensor_data : une ligne par créneau et par emplacement, au plus max_points créneaux (paramètre de la
+# requête, DEFAULT_POINTS par défaut, plafonné à MAX_POINTS) quelle que soit la période demandée.
+SENSOR_DATA_API = {
+    'DEFAULT_POINTS': 500,
+    'MAX_POINTS': 2000,
+}
+
+# Lectures des graphiques et de l'API sur la réplique ALIAS (si elle est déclarée dans DATABASES) ; retour sur la base
+# principale au-delà de MAX_LAG_SECONDS de retard (mesuré toutes les CHECK_INTERVAL secondes) et pendant PIN_SECONDS
+# secondes après une modification envoyée par le navigateur.
+READ_REPLICA = {
+    'ALIAS': 'replica',
+    'MAX_LAG_SECONDS': float(os.environ.get('DB_REPLICA_MAX_LAG', 10)),
+    'CHECK_INTERVAL': 5,
+    'PIN_SECONDS': 10,
+}
@@ -19,5 +19,14 @@ DATABASES = {
     }
 }
 
+# DB_REPLICA=1 : « réplique » en lecture seule sur le même fichier, pour essayer le routage en local.
+if os.environ.get('DB_REPLICA') == '1':
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        'OPTIONS': {'uri': True},
+        'TEST': {'MIRROR': 'default'},
+    }
+
 load_dotenv()
 AES_SECRET_KEY = bytes.fromhex(os.getenv('AES_SECRET_KEY'))
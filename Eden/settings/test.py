@@ -9,3 +9,7 @@ DATABASES = {
         'NAME': ':memory:',
     }
 }
+
+INGEST_QUEUE = {
+    'BACKEND': 'Website.ingest_queue.InMemoryQueue',
+}
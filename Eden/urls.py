@@ -20,8 +20,11 @@ urlpatterns = [
     path('raspberry/delete/<int:id>/', raspberry.raspberry_delete, name='raspberry_delete'),
     path('raspberry/<int:id>/<str:device>', raspberry.toggle_device, name='toggle_device'),
 
-    path('api/sensor-data/', api.receive_sensor_data, name='receive_sensor_data'),
+    path('api/sensor-data/',
+         api.receive_sensor_data_async if settings.INGEST_VIEW == 'async' else api.receive_sensor_data,
+         name='receive_sensor_data'),
     path('api/sensor-data/<int:raspberry_id>/', api.get_latest_sensor_data, name='get_latest_sensor_data'),
+    path('metrics/', api.get_metrics, name='metrics'),
 
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
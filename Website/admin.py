@@ -4,7 +4,10 @@ from .models import *
 
 admin.site.register(Raspberry)
 admin.site.register(Group)
+admin.site.register(Reading)
 admin.site.register(SensorData)
+admin.site.register(ReadingRollup)
+admin.site.register(SoilMoistureRollup)
 admin.site.register(SensorLocation)
 admin.site.register(Plant)
 admin.site.register(UserGroup)
\ No newline at end of file
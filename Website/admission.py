@@ -0,0 +1,218 @@
+"""
+Contrôle d'admission par classe de route (ADMISSION_CONTROL).
+
+Chaque classe (réception des données, tableau de bord authentifié, pages invités,
+administration) a sa propre limite de requêtes simultanées et une file d'attente
+bornée : une surcharge du tableau de bord ne peut pas prendre les places réservées à
+la réception des données. Une requête qui ne trouve pas de place (file pleine ou
+attente trop longue) reçoit un 503 rapide, ou la dernière réponse en cache pour les
+classes qui l'autorisent. Utilisé par Website.middleware.AdmissionControlMiddleware.
+"""
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from . import metrics
+
+
+class _Waiter:
+    """Requête en file d'attente ; granted passe à True quand une place lui est transmise."""
+
+    __slots__ = ('granted', 'event', 'loop', 'future')
+
+    def __init__(self, loop=None, future=None):
+        self.granted = False
+        self.event = None if loop else threading.Event()
+        self.loop = loop
+        self.future = future
+
+    def grant(self):
+        self.granted = True
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class AdmissionClass:
+    def __init__(self, name, limit, queue_size, timeout, stale=False):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.stale = stale
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.stale_served = 0
+        self.queued = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+
+    def _enter(self, waiter):
+        """Sous verrou : 'admitted', 'queued' ou 'full'."""
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            self.admitted += 1
+            return 'admitted'
+        if len(self._waiters) >= self.queue_size:
+            self.rejected += 1
+            return 'full'
+        self._waiters.append(waiter)
+        return 'queued'
+
+    def _leave_queue(self, waiter, started):
+        """Sous verrou, après l'attente : True si une place a été transmise au waiter."""
+        waited = time.monotonic() - started
+        self.queued += 1
+        self.queue_time_total += waited
+        self.queue_time_max = max(self.queue_time_max, waited)
+        if waiter.granted:
+            self.admitted += 1
+            return True
+        self._waiters.remove(waiter)
+        self.timed_out += 1
+        return False
+
+    def acquire(self):
+        waiter = _Waiter()
+        started = time.monotonic()
+        with self._lock:
+            state = self._enter(waiter)
+        if state != 'queued':
+            return state == 'admitted'
+        waiter.event.wait(self.timeout)
+        with self._lock:
+            return self._leave_queue(waiter, started)
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(loop, loop.create_future())
+        started = time.monotonic()
+        with self._lock:
+            state = self._enter(waiter)
+        if state != 'queued':
+            return state == 'admitted'
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.timeout)
+        except asyncio.TimeoutError:
+            pass
+        except BaseException:
+            # Client parti pendant l'attente : rendre la place si elle venait d'être transmise.
+            with self._lock:
+                admitted = self._leave_queue(waiter, started)
+            if admitted:
+                self.release()
+            raise
+        with self._lock:
+            return self._leave_queue(waiter, started)
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # La place passe directement à la plus ancienne requête en attente.
+                self._waiters.popleft().grant()
+            else:
+                self._active -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'active': self._active,
+                'waiting': len(self._waiters),
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'stale_served': self.stale_served,
+                'queue_time_avg_ms': round(self.queue_time_total * 1000 / self.queued, 1) if self.queued else 0,
+                'queue_time_max_ms': round(self.queue_time_max * 1000, 1),
+            }
+
+
+class AdmissionController:
+    def __init__(self, options):
+        self.routes = [(re.compile(pattern), name) for pattern, name in options['ROUTES']]
+        self.default_class = options['DEFAULT_CLASS']
+        self.classes = {
+            name: AdmissionClass(name, opts['LIMIT'], opts['QUEUE'], opts['TIMEOUT'], opts.get('STALE', False))
+            for name, opts in options['CLASSES'].items()
+        }
+        self.cache = caches[options.get('STALE_CACHE', 'default')]
+        self.stale_ttl = options.get('STALE_TTL', 600)
+        self.stale_max_size = options.get('STALE_MAX_SIZE', 1024 * 1024)
+
+    def classify(self, request):
+        """Classe de la requête, ou None si elle n'est pas soumise au contrôle."""
+        path = request.path_info
+        for pattern, name in self.routes:
+            if pattern.match(path):
+                return self.classes.get(name) if name else None
+        return self.classes[self.default_class]
+
+    def _stale_key(self, admission_class, request):
+        # Les pages authentifiées dépendent de l'utilisateur : la clé inclut le cookie de session.
+        session = request.COOKIES.get(settings.SESSION_COOKIE_NAME, '') if admission_class.name != 'guest' else ''
+        return f"admission:stale:{admission_class.name}:{session}:{request.get_full_path()}"
+
+    def remember(self, admission_class, request, response):
+        """Garde une copie de la réponse pour la servir en cas de surcharge."""
+        if (not admission_class.stale or request.method != 'GET' or response.status_code != 200
+                or response.streaming or len(response.content) > self.stale_max_size):
+            return
+        self.cache.set(
+            self._stale_key(admission_class, request),
+            (response.content, response['Content-Type']),
+            self.stale_ttl
+        )
+
+    def reject(self, admission_class, request):
+        if admission_class.stale and request.method == 'GET':
+            cached = self.cache.get(self._stale_key(admission_class, request))
+            if cached is not None:
+                with admission_class._lock:
+                    admission_class.stale_served += 1
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Eden-Stale'] = '1'
+                return response
+        response = HttpResponse(
+            '{"error": "Service surchargé, réessayez plus tard."}',
+            content_type='application/json',
+            status=503
+        )
+        response['Retry-After'] = '1'
+        return response
+
+    def stats(self):
+        return {name: admission_class.stats() for name, admission_class in self.classes.items()}
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_controller():
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(settings.ADMISSION_CONTROL)
+    return _controller
+
+
+if settings.ADMISSION_CONTROL.get('ENABLED'):
+    metrics.register('admission_control', lambda: get_controller().stats())
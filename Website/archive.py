@@ -0,0 +1,255 @@
+"""
+Archive froide de l'historique (SENSOR_DATA_ARCHIVE) : fichiers Parquet par Raspberry et par mois.
+
+archive_month() copie les relevés d'un mois (UTC, comme les partitions) d'un Raspberry dans
+<ROOT>/<id du Raspberry>/<AAAA-MM>-readings.parquet (Reading) et <AAAA-MM>-soil.parquet
+(SensorData), relit les fichiers écrits pour les comparer aux lignes de la base, puis
+supprime ces lignes. Un relevé du mois reçu après l'archivage (renvoi tardif) reste en
+base et est ajouté au fichier au passage suivant.
+
+Les lectures ouvrent les fichiers en mémoire projetée et ne décodent que les colonnes
+demandées et les groupes de lignes de la période ; les graphiques (Website/rollups.py),
+l'API et rebuild_rollups les fusionnent avec les données de la base, et la réception
+(Website/ingest.py) y reconnaît le renvoi d'un relevé déjà archivé. Les agrégats
+horaires et journaliers ne sont pas archivés.
+"""
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+
+from .models import Reading, SensorData
+from .partitions import add_months, month_start
+
+READING_COLUMNS = ['timestamp', 'temperature', 'air_humidity', 'water_level']
+SOIL_COLUMNS = ['sensor_location_id', 'timestamp', 'soil_moisture', 'soil_moisture_probes']
+KINDS = {
+    'readings': (Reading, 'raspberry_id', READING_COLUMNS, ['timestamp']),
+    'soil': (SensorData, 'sensor_location__raspberry_id', SOIL_COLUMNS, ['sensor_location_id', 'timestamp']),
+}
+ROW_GROUP_SIZE = 10000
+DELETE_BATCH_SIZE = 10000
+
+
+class ArchiveError(Exception):
+    """Fichier d'archive relu différent des lignes à archiver : rien n'est supprimé de la base."""
+
+
+def enabled():
+    return settings.SENSOR_DATA_ARCHIVE['ENABLED']
+
+
+def archive_path(raspberry_id, month, kind):
+    return os.path.join(settings.SENSOR_DATA_ARCHIVE['ROOT'], str(raspberry_id), f"{month:%Y-%m}-{kind}.parquet")
+
+
+def _schema(kind):
+    import pyarrow as pa
+
+    timestamp = pa.timestamp('us', tz='UTC')
+    if kind == 'readings':
+        return pa.schema([
+            ('timestamp', timestamp), ('temperature', pa.float64()),
+            ('air_humidity', pa.float64()), ('water_level', pa.float64()),
+        ])
+    return pa.schema([
+        ('sensor_location_id', pa.int64()), ('timestamp', timestamp),
+        ('soil_moisture', pa.float64()), ('soil_moisture_probes', pa.list_(pa.float64())),
+    ])
+
+
+def archived_months(raspberry_id, start, end, kind):
+    """Mois de [start, end[ archivés pour ce Raspberry : [(premier jour du mois, chemin)]."""
+    months = []
+    month = month_start(start)
+    while month < end:
+        path = archive_path(raspberry_id, month, kind)
+        if os.path.exists(path):
+            months.append((month, path))
+        month = add_months(month, 1)
+    return months
+
+
+def read(kind, raspberry_id, start, end, columns, location_ids=None):
+    """
+    Lignes archivées de [start, end[ (table Arrow, colonnes columns), None si aucun fichier ne
+    couvre la période. location_ids limite les lignes 'soil' à ces emplacements.
+    """
+    paths = [path for _, path in archived_months(raspberry_id, start, end, kind)]
+    if not paths:
+        return None
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    filters = [('timestamp', '>=', start), ('timestamp', '<', end)]
+    if location_ids is not None:
+        filters.append(('sensor_location_id', 'in', list(location_ids)))
+    return pa.concat_tables([
+        pq.read_table(path, columns=columns, filters=filters, memory_map=True) for path in paths
+    ])
+
+
+def bucketed(kind, raspberry_id, fields, start, end, seconds, group_by=(), location_ids=None):
+    """bucketed() (Website/timeseries.py) calculé sur les lignes archivées de [start, end[ ; [] sans archive."""
+    table = read(kind, raspberry_id, start, end, ['timestamp', *group_by, *fields], location_ids)
+    if table is None or not table.num_rows:
+        return []
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    micros = pc.cast(table['timestamp'], pa.int64())
+    table = table.append_column('bucket', pc.divide(micros, seconds * 1_000_000))
+    aggregates = [(field, stat) for field in fields for stat in ('mean', 'min', 'max', 'count')]
+    rows = []
+    for group in table.group_by([*group_by, 'bucket']).aggregate(aggregates).to_pylist():
+        row = {name: group[name] for name in group_by}
+        row['bucket_start'] = datetime.fromtimestamp(group['bucket'] * seconds, tz=dt_timezone.utc)
+        for field in fields:
+            row.update({
+                f"{field}_avg": group[f"{field}_mean"],
+                f"{field}_min": group[f"{field}_min"],
+                f"{field}_max": group[f"{field}_max"],
+                f"{field}_count": group[f"{field}_count"],
+            })
+        rows.append(row)
+    return sorted(rows, key=lambda row: row['bucket_start'])
+
+
+def points(kind, raspberry_id, start, end, columns, location_ids=None):
+    """
+    Lignes archivées de [start, end[ en tableau float64 (lignes, 1 + len(columns)) : secondes depuis
+    l'epoch puis columns (NaN pour une valeur absente) ; None sans archive.
+    """
+    table = read(kind, raspberry_id, start, end, ['timestamp', *columns], location_ids)
+    if table is None or not table.num_rows:
+        return None
+    import numpy as np
+    import pyarrow as pa
+
+    return np.column_stack([
+        table['timestamp'].cast(pa.int64()).to_numpy() / 1_000_000,
+        *(table[name].to_numpy().astype(np.float64) for name in columns),
+    ])
+
+
+def iter_rows(kind, raspberry_id, start, end):
+    """Tuples (colonnes de KINDS[kind]) des lignes archivées de [start, end[."""
+    columns = KINDS[kind][2]
+    table = read(kind, raspberry_id, start, end, columns)
+    if table is None:
+        return iter(())
+    return zip(*(table[name].to_pylist() for name in columns))
+
+
+def existing(raspberry_id, timestamps):
+    """
+    Relevés de timestamps déjà archivés pour ce Raspberry (renvoi d'un envoi ancien) :
+    (timestamps des Reading, couples (emplacement, timestamp) des SensorData). Seuls les
+    fichiers des mois archivés de la période sont lus.
+    """
+    wanted = set(timestamps)
+    if not wanted:
+        return set(), set()
+    start, end = min(wanted), max(wanted) + timedelta(microseconds=1)
+    readings = read('readings', raspberry_id, start, end, ['timestamp'])
+    soil = read('soil', raspberry_id, start, end, ['sensor_location_id', 'timestamp'])
+    found_readings = set() if readings is None else wanted.intersection(readings['timestamp'].to_pylist())
+    found_soil = set() if soil is None else {
+        (location_id, timestamp)
+        for location_id, timestamp in zip(soil['sensor_location_id'].to_pylist(), soil['timestamp'].to_pylist())
+        if timestamp in wanted
+    }
+    return found_readings, found_soil
+
+
+def archive_cutoff(now, after_days):
+    """Premier mois non archivable : les mois entiers antérieurs à now - after_days sont archivés."""
+    return month_start(now - timedelta(days=after_days))
+
+
+def months_to_archive(raspberry_id, cutoff):
+    """Mois (UTC) antérieurs à cutoff qui ont encore des lignes en base pour ce Raspberry."""
+    firsts = [
+        model.objects.filter(**{owner: raspberry_id}, timestamp__lt=cutoff).aggregate(first=Min('timestamp'))['first']
+        for model, owner, _, _ in KINDS.values()
+    ]
+    firsts = [first for first in firsts if first is not None]
+    if not firsts:
+        return []
+    months = []
+    month = month_start(min(firsts))
+    while month < cutoff:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def archive_month(raspberry_id, month):
+    """
+    Archive les lignes du mois (UTC) du Raspberry puis les supprime de la base.
+    Retourne {type: nombre de lignes archivées} (vide si le mois n'a plus de lignes en base).
+    """
+    import pyarrow as pa
+
+    start, end = month, add_months(month, 1)
+    archived = {}
+    for kind, (model, owner, columns, key) in KINDS.items():
+        rows = list(
+            model.objects.filter(**{owner: raspberry_id}, timestamp__gte=start, timestamp__lt=end)
+            .order_by('timestamp').values_list('id', *columns)
+        )
+        if not rows:
+            continue
+        table = pa.Table.from_arrays(
+            [pa.array([row[index + 1] for row in rows], type=field.type) for index, field in enumerate(_schema(kind))],
+            schema=_schema(kind)
+        )
+        path = archive_path(raspberry_id, month, kind)
+        if os.path.exists(path):
+            table = _merge(path, table, key)
+        _write_verified(table, path)
+        archived[kind] = [row[0] for row in rows]
+
+    with transaction.atomic():
+        for kind, ids in archived.items():
+            model = KINDS[kind][0]
+            for offset in range(0, len(ids), DELETE_BATCH_SIZE):
+                # La borne sur timestamp limite la suppression à la partition du mois.
+                model.objects.filter(
+                    id__in=ids[offset:offset + DELETE_BATCH_SIZE], timestamp__gte=start, timestamp__lt=end
+                ).delete()
+    return {kind: len(ids) for kind, ids in archived.items()}
+
+
+def _merge(path, table, key):
+    """Ajoute au fichier existant les lignes de table qu'il ne contient pas encore (même clé)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    existing = pq.read_table(path, memory_map=True)
+    seen = set(zip(*(existing[name].to_pylist() for name in key)))
+    keep = [item not in seen for item in zip(*(table[name].to_pylist() for name in key))]
+    return pa.concat_tables([existing, table.filter(pa.array(keep, type=pa.bool_()))]).sort_by('timestamp')
+
+
+def _write_verified(table, path):
+    """Écrit table dans un fichier temporaire, le relit et le compare, puis le renomme en path."""
+    import pyarrow.parquet as pq
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    pq.write_table(table, temporary, compression='zstd', row_group_size=ROW_GROUP_SIZE)
+    with open(temporary, 'rb') as f:
+        os.fsync(f.fileno())
+    if not pq.read_table(temporary, memory_map=True).equals(table):
+        os.remove(temporary)
+        raise ArchiveError(f"Le fichier relu ne correspond pas aux lignes archivées : {path}")
+    os.replace(temporary, path)
+    directory_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
@@ -0,0 +1,254 @@
+"""
+Jauges et graphiques Plotly de graph.html (graph_page et guest_graph_page).
+
+Les parties constantes de chaque spécification (mise en page, axes, jauges hors valeur) sont
+sérialisées une seule fois par thème (THEMES) au chargement du module ; une requête ne
+sérialise que les valeurs des jauges et les traces, insérées entre ces fragments. Les séries
+sont construites en un seul parcours des créneaux (ou des points LTTB), libellés de l'axe des
+temps compris.
+"""
+import json
+
+import numpy as np
+from django.conf import settings
+from django.utils.timezone import now, timedelta
+
+from . import rollups
+from .chunks import latest_reading
+from .models import SensorLocation
+from .timeseries import bucket_seconds
+
+TEMPERATURE_COLOR = "#FF5733"  # Rouge/orangé
+HUMIDITY_COLOR = "#33CFFF"     # Bleu clair
+WATER_COLOR = "#1f77b4"        # Bleu
+SOIL_COLOR = "#2ca02c"         # Vert
+SOIL_COLORS = ["#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd"]
+
+# (id, titre, mesure, couleur) ; l'humidité du sol de la jauge est la moyenne des emplacements.
+GAUGES = [
+    ('temperatureGauge', 'Température (°C)', 'temperature', TEMPERATURE_COLOR),
+    ('humidityGauge', 'Humidité de l’air (%)', 'air_humidity', HUMIDITY_COLOR),
+    ('soilMoistureGauge', 'Humidité du sol (%)', 'soil_moisture', SOIL_COLOR),
+    ('waterLevelGauge', 'Niveau d’eau (%)', 'water_level', WATER_COLOR),
+]
+# (id, titre, mesure) ; le graphique de l'humidité du sol a une courbe par emplacement.
+TIME_CHARTS = [
+    ('temperatureChart', 'Évolution température (°C)', 'temperature'),
+    ('humidityChart', "Évolution humidité de l'air (%)", 'air_humidity'),
+    ('waterChart', "Niveau d'eau (%)", 'water_level'),
+    ('soilChart', "Évolution de l'humidité du sol (%)", 'soil_moisture'),
+]
+METRIC_COLORS = {metric: color for _, _, metric, color in GAUGES}
+
+DASHBOARD_LAYOUT = {
+    "font":          {"color": "white"},
+    "paper_bgcolor": "rgba(0,0,0,0)",
+    "plot_bgcolor":  "rgba(0,0,0,0)",
+    "margin":        {"l": 60, "r": 60, "t": 20, "b": 0}
+}
+WHITE_AXIS = {"tickfont": {"color": "white"}, "title_font": {"color": "white"}, "color": "white"}
+
+_SLOT = '__slot__'
+
+
+def _dashboard_gauge(color, axis_range):
+    return {
+        "data": [{
+            "type":   "indicator",
+            "mode":   "gauge+number",
+            "value":  _SLOT,
+            "number": {"font": {"color": "white"}},
+            "gauge":  {
+                "axis": {"range": axis_range, "tickcolor": "white"},
+                "bar":  {"color": color}
+            }
+        }],
+        "layout": DASHBOARD_LAYOUT
+    }
+
+
+def _dashboard_chart(axis_range):
+    return {
+        "data": _SLOT,
+        "layout": {
+            **DASHBOARD_LAYOUT,
+            "xaxis": {"tickmode": "auto", "nticks": 10, **WHITE_AXIS},
+            "yaxis": {"range": axis_range, **WHITE_AXIS}
+        }
+    }
+
+
+def _guest_gauge(color, axis_range):
+    return {
+        'data': [{
+            'type': 'indicator',
+            'mode': 'gauge+number',
+            'value': _SLOT,
+            'gauge': {
+                'axis': {'range': axis_range},
+                'bar': {'color': color}
+            }
+        }],
+        'layout': {'margin': {'l': 30, 'r': 30, 't': 30, 'b': 30}}
+    }
+
+
+def _guest_chart(axis_range):
+    return {
+        'data': _SLOT,
+        'layout': {
+            'xaxis': {'tickmode': 'auto', 'nticks': 10},
+            'yaxis': {'range': axis_range},
+            'margin': {'l': 50, 'r': 50, 't': 50, 'b': 50}
+        }
+    }
+
+
+# Thème : (jauge(couleur, plage), graphique(plage), plage de la température) ; les autres mesures vont de 0 à 100.
+THEMES = {
+    'dashboard': (_dashboard_gauge, _dashboard_chart, [0, 50]),
+    'guest': (_guest_gauge, _guest_chart, [-10, 50]),
+}
+
+
+def _split(spec):
+    """Spécification sérialisée, coupée autour de sa partie variable (_SLOT) : (début, fin)."""
+    head, tail = json.dumps(spec).split(json.dumps(_SLOT))
+    return head, tail
+
+
+def _fragments(gauge, chart, temperature_range):
+    ranges = {'temperature': temperature_range}
+    return (
+        [
+            (gauge_id, title, metric, _split(gauge(color, ranges.get(metric, [0, 100]))))
+            for gauge_id, title, metric, color in GAUGES
+        ],
+        [
+            (chart_id, title, metric, _split(chart(ranges.get(metric, [0, 100]))))
+            for chart_id, title, metric in TIME_CHARTS
+        ],
+    )
+
+
+FRAGMENTS = {name: _fragments(*theme) for name, theme in THEMES.items()}
+
+
+def time_labels(seconds):
+    """Libellés de l'axe des temps (UTC + 2 h, comme les relevés affichés) d'un tableau de secondes depuis l'epoch."""
+    if not len(seconds):
+        return []
+    times = np.rint(seconds * 1_000_000).astype(np.int64).astype('datetime64[us]') + np.timedelta64(2, 'h')
+    return np.char.replace(np.datetime_as_string(times, unit='s'), 'T', ' ').tolist()
+
+
+def envelopes(rows, fields):
+    """
+    Séries (libellés, moyennes, minimums, maximums) de chaque champ de fields, en un seul
+    parcours de lignes de bucketed() ; les libellés sont partagés par les séries.
+    """
+    columns = list(zip(*(
+        (row['bucket_start'].timestamp(), *(row[f"{field}_{stat}"] for field in fields for stat in ('avg', 'min', 'max')))
+        for row in rows
+    )))
+    if not columns:
+        return {field: ([], [], [], []) for field in fields}
+    labels = time_labels(np.array(columns[0]))
+    return {
+        field: (labels, list(columns[1 + 3 * index]), list(columns[2 + 3 * index]), list(columns[3 + 3 * index]))
+        for index, field in enumerate(fields)
+    }
+
+
+def chart_series(raspberry, sensor_locations, start_time, end_time):
+    """
+    Séries des graphiques par mesure et par emplacement, au plus CHARTS['MAX_POINTS'] points.
+    CHARTS['SERIES'] = 'envelope' : moyenne, minimum et maximum de chaque créneau, calculés
+    en base ; 'lttb' : relevés choisis par LTTB (pics et creux conservés), sans minimums ni
+    maximums. Au-delà de ROLLUPS['HOURLY_FROM_HOURS'], à partir des agrégats.
+    """
+    max_points = settings.CHARTS['MAX_POINTS']
+    if settings.CHARTS['SERIES'] == 'lttb':
+        readings = {
+            metric: (time_labels(seconds), values.tolist(), None, None)
+            for metric, (seconds, values) in rollups.reading_points(raspberry, start_time, end_time, max_points).items()
+        }
+        soil = {
+            location_id: (time_labels(seconds), values.tolist(), None, None)
+            for location_id, (seconds, values) in rollups.soil_points(sensor_locations, start_time, end_time, max_points).items()
+        }
+        return readings, soil
+
+    seconds = bucket_seconds(start_time, end_time, max_points)
+    readings = envelopes(rollups.reading_series(raspberry, start_time, end_time, seconds), rollups.READING_METRICS)
+    by_location = {}
+    for row in rollups.soil_series(sensor_locations, start_time, end_time, seconds):
+        by_location.setdefault(row['sensor_location_id'], []).append(row)
+    soil = {
+        location_id: envelopes(location_rows, ['soil_moisture'])['soil_moisture']
+        for location_id, location_rows in by_location.items()
+    }
+    return readings, soil
+
+
+def band_color(color, alpha=0.2):
+    red, green, blue = (int(color[i:i + 2], 16) for i in (1, 3, 5))
+    return f"rgba({red}, {green}, {blue}, {alpha})"
+
+
+def traces(series, color, name=None):
+    """Traces Plotly d'une série : la courbe, précédée de sa bande minimum/maximum si la série en a une."""
+    labels, values, lows, highs = series
+    line = {'x': labels, 'y': values, 'mode': 'lines+markers', 'type': 'scatter', 'line': {'color': color}}
+    if name is not None:
+        line['name'] = name
+    if lows is None:
+        return [line]
+    line['customdata'] = list(zip(lows, highs))
+    line['hovertemplate'] = '%{y:.1f} (min %{customdata[0]:.1f}, max %{customdata[1]:.1f})'
+    if name is None:
+        line['hovertemplate'] += '<extra></extra>'
+    band = {'x': labels, 'mode': 'lines', 'type': 'scatter', 'line': {'width': 0, 'color': color}, 'hoverinfo': 'skip'}
+    return [
+        {**band, 'y': highs},
+        {**band, 'y': lows, 'fill': 'tonexty', 'fillcolor': band_color(color)},
+        line,
+    ]
+
+
+def payload(raspberry, hours, theme='dashboard'):
+    """
+    Jauges et graphiques de graph.html sur les hours dernières heures, dans le thème donné
+    (clé de THEMES) : {'gauges': [...], 'charts': [...]}, chaque élément ayant 'id', 'title'
+    et 'json' (spécification Plotly sérialisée).
+    """
+    end_time = now()
+    start_time = end_time - timedelta(hours=hours)
+    sensor_locations = SensorLocation.objects.filter(raspberry=raspberry)
+    locations = list(sensor_locations.values_list('id', 'location_name', 'soil_moisture'))
+
+    reading_series, soil_series = chart_series(raspberry, sensor_locations, start_time, end_time)
+    latest = latest_reading(raspberry, start_time)
+
+    soil_values = [soil_moisture for _, _, soil_moisture in locations if soil_moisture is not None]
+    current = {metric: getattr(latest, metric, None) or 0 for metric in rollups.READING_METRICS}
+    current['soil_moisture'] = sum(soil_values) / len(soil_values) if soil_values else 0
+
+    data = {metric: traces(series, METRIC_COLORS[metric]) for metric, series in reading_series.items()}
+    data['soil_moisture'] = []
+    for index, (location_id, location_name, _) in enumerate(locations):
+        series = soil_series.get(location_id)
+        if series is not None and series[0]:
+            data['soil_moisture'] += traces(series, SOIL_COLORS[index % len(SOIL_COLORS)], location_name)
+
+    gauges, charts = FRAGMENTS[theme]
+    return {
+        'gauges': [
+            {'id': gauge_id, 'title': title, 'json': head + json.dumps(current[metric]) + tail}
+            for gauge_id, title, metric, (head, tail) in gauges
+        ],
+        'charts': [
+            {'id': chart_id, 'title': title, 'json': head + json.dumps(data[metric]) + tail}
+            for chart_id, title, metric, (head, tail) in charts
+        ],
+    }
@@ -0,0 +1,275 @@
+"""
+Moteur de stockage compressé des relevés bruts (SENSOR_DATA_STORAGE['ENGINE'] = 'chunks').
+
+Au lieu d'une ligne Reading ou SensorData par relevé, store_readings() range les valeurs dans
+un enregistrement par Raspberry (ReadingChunk) ou par emplacement (SoilMoistureChunk) et par
+créneau de CHUNK_SECONDS secondes (aligné sur l'epoch, en UTC) :
+
+- timestamps : deltas successifs en microsecondes depuis chunk_start (int64), compressés avec
+  zlib ; des relevés réguliers donnent une suite de deltas identiques ;
+- data : une colonne float32 par mesure (NaN pour une valeur absente), octets regroupés par
+  rang (« byte shuffle ») avant zlib pour que signes et exposants se suivent.
+
+Une écriture relit, complète et réécrit le chunk de son créneau sous verrou de ligne ; un
+relevé en retard rejoint le chunk de son créneau. Les lectures ne décodent que les chunks qui
+recouvrent la période. Ce moteur ne conserve pas soil_moisture_probes. « manage.py
+compact_sensor_data » convertit en chunks les lignes déjà enregistrées, sauf celles qui portent
+des valeurs par sonde (sans --discard-probes).
+"""
+import zlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Reading, ReadingChunk, SensorData, SoilMoistureChunk
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+DELETE_BATCH_SIZE = 10000
+
+
+def enabled():
+    return settings.SENSOR_DATA_STORAGE['ENGINE'] == 'chunks'
+
+
+def to_micros(timestamp):
+    return (timestamp - EPOCH) // MICROSECOND
+
+
+def from_micros(micros):
+    return EPOCH + timedelta(microseconds=int(micros))
+
+
+def chunk_start(timestamp):
+    width = settings.SENSOR_DATA_STORAGE['CHUNK_SECONDS'] * 1_000_000
+    return from_micros(to_micros(timestamp) // width * width)
+
+
+def encode(start, micros, values):
+    """Contenu (timestamps, data) d'un chunk : micros trié (int64, epoch), values de forme (mesures, relevés)."""
+    deltas = np.diff(micros, prepend=to_micros(start)).astype('<i8')
+    planes = np.ascontiguousarray(values, dtype='<f4').view(np.uint8).reshape(-1, 4).T
+    return zlib.compress(deltas.tobytes()), zlib.compress(planes.tobytes())
+
+
+def decode_timestamps(start, count, timestamps):
+    if not count:
+        return np.empty(0, dtype=np.int64)
+    return np.cumsum(np.frombuffer(zlib.decompress(timestamps), dtype='<i8')) + to_micros(start)
+
+
+def decode_data(count, data, metric_count):
+    if not count:
+        return np.empty((metric_count, 0), dtype=np.float32)
+    planes = np.frombuffer(zlib.decompress(data), dtype=np.uint8).reshape(4, -1)
+    return np.ascontiguousarray(planes.T).view('<f4').reshape(metric_count, count)
+
+
+def _nullable(value):
+    return None if value != value else value
+
+
+def append(model, rows):
+    """
+    Ajoute aux chunks de model des relevés (instances non enregistrées de Reading ou SensorData) ;
+    un horodatage déjà présent dans son chunk est ignoré. À appeler dans une transaction.
+    Retourne les relevés ajoutés.
+    """
+    if not rows:
+        return []
+    owner = model.OWNER
+    groups = {}
+    for row in rows:
+        groups.setdefault((getattr(row, owner), chunk_start(row.timestamp)), []).append(row)
+
+    # Crée vides les chunks manquants puis les verrouille : deux écritures d'un même créneau s'attendent.
+    model.objects.bulk_create(
+        [model(**{owner: owner_id, 'chunk_start': start}) for owner_id, start in groups],
+        ignore_conflicts=True
+    )
+    locked = model.objects.select_for_update().filter(
+        **{f"{owner}__in": {owner_id for owner_id, _ in groups}},
+        chunk_start__in={start for _, start in groups}
+    ).order_by('pk')
+    chunks = {(getattr(chunk, owner), chunk.chunk_start): chunk for chunk in locked}
+
+    added = []
+    changed = []
+    for key, group in groups.items():
+        chunk = chunks[key]
+        micros = decode_timestamps(chunk.chunk_start, chunk.count, chunk.timestamps)
+        values = decode_data(chunk.count, chunk.data, len(model.METRICS))
+        known = set(micros.tolist())
+        new = {}
+        for row in group:
+            timestamp = to_micros(row.timestamp)
+            if timestamp in known or timestamp in new:
+                continue
+            new[timestamp] = [np.nan if getattr(row, metric) is None else getattr(row, metric) for metric in model.METRICS]
+            added.append(row)
+        if not new:
+            continue
+        micros = np.concatenate([micros, np.fromiter(new, dtype=np.int64, count=len(new))])
+        values = np.concatenate([values, np.array(list(new.values()), dtype=np.float32).T], axis=1)
+        order = np.argsort(micros, kind='stable')
+        micros, values = micros[order], values[:, order]
+        chunk.timestamps, chunk.data = encode(chunk.chunk_start, micros, values)
+        chunk.count = len(micros)
+        chunk.last_timestamp = from_micros(micros[-1])
+        changed.append(chunk)
+    if changed:
+        model.objects.bulk_update(changed, ['count', 'last_timestamp', 'timestamps', 'data'])
+    return added
+
+
+def existing(model, owner_ids, timestamps):
+    """Couples (propriétaire, timestamp) de timestamps déjà stockés dans les chunks (renvoi d'un envoi)."""
+    wanted = {to_micros(timestamp): timestamp for timestamp in timestamps}
+    found = set()
+    chunks = model.objects.filter(
+        **{f"{model.OWNER}__in": owner_ids},
+        chunk_start__in={chunk_start(timestamp) for timestamp in timestamps}
+    ).values_list(model.OWNER, 'chunk_start', 'count', 'timestamps')
+    for owner_id, start, count, blob in chunks:
+        for timestamp in wanted.keys() & set(decode_timestamps(start, count, blob).tolist()):
+            found.add((owner_id, wanted[timestamp]))
+    return found
+
+
+def read(model, owner_ids, start, end):
+    """
+    Relevés de [start, end[ : {propriétaire: (micros int64, valeurs float32 de forme (mesures, relevés))}.
+    Seuls les chunks qui recouvrent la période sont lus et décodés ; owner_ids None = tous.
+    """
+    chunks = model.objects.filter(
+        chunk_start__gt=start - timedelta(seconds=settings.SENSOR_DATA_STORAGE['CHUNK_SECONDS']),
+        chunk_start__lt=end,
+        count__gt=0
+    )
+    if owner_ids is not None:
+        chunks = chunks.filter(**{f"{model.OWNER}__in": owner_ids})
+    low, high = to_micros(start), to_micros(end)
+    parts = {}
+    for owner_id, first, count, timestamps, data in chunks.order_by(model.OWNER, 'chunk_start').values_list(
+        model.OWNER, 'chunk_start', 'count', 'timestamps', 'data'
+    ):
+        micros = decode_timestamps(first, count, timestamps)
+        values = decode_data(count, data, len(model.METRICS))
+        in_range = (micros >= low) & (micros < high)
+        parts.setdefault(owner_id, []).append((micros[in_range], values[:, in_range]))
+    return {
+        owner_id: (np.concatenate([micros for micros, _ in chunks]), np.concatenate([values for _, values in chunks], axis=1))
+        for owner_id, chunks in parts.items()
+    }
+
+
+def points(model, owner_ids, start, end):
+    """
+    Relevés de [start, end[ en tableau float64 (lignes, 2 + mesures) : propriétaire, secondes depuis
+    l'epoch puis les mesures de model (NaN pour une valeur absente) ; None si aucun chunk.
+    """
+    parts = [
+        np.column_stack([np.full(len(micros), owner_id, dtype=np.float64), micros / 1_000_000, values.T.astype(np.float64)])
+        for owner_id, (micros, values) in read(model, owner_ids, start, end).items()
+    ]
+    return np.concatenate(parts) if parts else None
+
+
+def iter_rows(model, owner_ids, start, end):
+    """(propriétaire, timestamp, [valeurs des mesures]) des relevés de [start, end[ ; None pour une valeur absente."""
+    for owner_id, (micros, values) in read(model, owner_ids, start, end).items():
+        for timestamp, row in zip(micros.tolist(), values.T.tolist()):
+            yield owner_id, from_micros(timestamp), [_nullable(value) for value in row]
+
+
+def bucketed(model, owner_ids, start, end, seconds, group_by_owner=False):
+    """
+    bucketed() (Website/timeseries.py) des mesures de model calculé sur les chunks de [start, end[ ;
+    avec group_by_owner, une ligne par propriétaire (clé model.OWNER) et par créneau.
+    """
+    rows = []
+    for owner_id, (micros, values) in read(model, owner_ids, start, end).items():
+        buckets, inverse = np.unique(micros // (seconds * 1_000_000), return_inverse=True)
+        owner_rows = [
+            {'bucket_start': datetime.fromtimestamp(bucket * seconds, tz=dt_timezone.utc)}
+            for bucket in buckets.tolist()
+        ]
+        for index, metric in enumerate(model.METRICS):
+            column = values[index].astype(np.float64)
+            valid = ~np.isnan(column)
+            groups, column = inverse[valid], column[valid]
+            counts = np.bincount(groups, minlength=len(buckets))
+            sums = np.bincount(groups, weights=column, minlength=len(buckets))
+            lows = np.full(len(buckets), np.inf)
+            highs = np.full(len(buckets), -np.inf)
+            np.minimum.at(lows, groups, column)
+            np.maximum.at(highs, groups, column)
+            for row, count, total, low, high in zip(owner_rows, counts.tolist(), sums.tolist(), lows.tolist(), highs.tolist()):
+                row.update({
+                    f"{metric}_avg": total / count if count else None,
+                    f"{metric}_min": low if count else None,
+                    f"{metric}_max": high if count else None,
+                    f"{metric}_count": count,
+                })
+        if group_by_owner:
+            for row in owner_rows:
+                row[model.OWNER] = owner_id
+        rows.extend(owner_rows)
+    return sorted(rows, key=lambda row: row['bucket_start'])
+
+
+def latest_reading(raspberry, since):
+    """Relevé le plus récent du Raspberry depuis since : ligne Reading, ou reconstitué depuis son dernier chunk."""
+    latest = Reading.objects.filter(raspberry=raspberry, timestamp__gte=since).order_by('-timestamp').first()
+    if not enabled():
+        return latest
+    chunk = (
+        ReadingChunk.objects.filter(raspberry=raspberry, last_timestamp__gte=since)
+        .order_by('-last_timestamp').first()
+    )
+    if chunk is None or (latest is not None and latest.timestamp >= chunk.last_timestamp):
+        return latest
+    values = decode_data(chunk.count, chunk.data, len(ReadingChunk.METRICS))[:, -1].tolist()
+    return Reading(
+        raspberry=raspberry, timestamp=chunk.last_timestamp,
+        **{metric: _nullable(value) for metric, value in zip(ReadingChunk.METRICS, values)}
+    )
+
+
+def last_data():
+    """Expression annotate() de l'horodatage du dernier relevé d'un Raspberry, lignes et chunks confondus."""
+    rows = Max('readings__timestamp')
+    if not enabled():
+        return rows
+    packed = Subquery(
+        ReadingChunk.objects.filter(raspberry=OuterRef('pk')).order_by('-last_timestamp').values('last_timestamp')[:1]
+    )
+    return Greatest(Coalesce(rows, packed), Coalesce(packed, rows))
+
+
+def compact(raspberry_id, start, end, keep_probes=True):
+    """
+    Déplace dans les chunks les lignes Reading et SensorData du Raspberry sur [start, end[
+    (une transaction). Avec keep_probes, les lignes SensorData dont soil_moisture_probes est
+    renseigné restent dans la table, les chunks ne conservant pas ces valeurs.
+    Retourne le nombre de lignes déplacées.
+    """
+    with transaction.atomic():
+        readings = list(Reading.objects.filter(raspberry_id=raspberry_id, timestamp__gte=start, timestamp__lt=end))
+        soil = SensorData.objects.filter(sensor_location__raspberry_id=raspberry_id, timestamp__gte=start, timestamp__lt=end)
+        if keep_probes:
+            soil = soil.filter(soil_moisture_probes__isnull=True)
+        soil = list(soil)
+        append(ReadingChunk, readings)
+        append(SoilMoistureChunk, soil)
+        for model, rows in ((Reading, readings), (SensorData, soil)):
+            ids = [row.id for row in rows]
+            for offset in range(0, len(ids), DELETE_BATCH_SIZE):
+                model.objects.filter(
+                    id__in=ids[offset:offset + DELETE_BATCH_SIZE], timestamp__gte=start, timestamp__lt=end
+                ).delete()
+    return len(readings) + len(soil)
@@ -0,0 +1,42 @@
+"""
+Statistiques des pools de connexions PostgreSQL (DB_CONNECTIONS = 'pool', voir Eden/settings/base.py).
+
+Django garde un pool psycopg par alias et par processus ; une requête emprunte une connexion
+à sa première requête SQL et la rend à la fin de la requête HTTP (request_finished), vue
+synchrone ou asynchrone.
+"""
+from django.db import connections
+
+from . import metrics
+
+
+def pool_stats(pool):
+    stats = pool.get_stats()
+    in_use = stats['pool_size'] - stats['pool_available']
+    requests = stats.get('requests_num', 0)
+    return {
+        'size': stats['pool_size'],
+        'max_size': stats['pool_max'],
+        'in_use': in_use,
+        'utilisation': in_use / stats['pool_max'] if stats['pool_max'] else 0.0,
+        'waiting': stats.get('requests_waiting', 0),
+        'requests': requests,
+        'queued': stats.get('requests_queued', 0),
+        'avg_wait_ms': stats.get('requests_wait_ms', 0) / requests if requests else 0.0,
+        'timeouts': stats.get('requests_errors', 0),
+        'connection_errors': stats.get('connections_errors', 0),
+        'connections_lost': stats.get('connections_lost', 0),
+    }
+
+
+def stats():
+    """Pools ouverts dans ce processus, par alias de base."""
+    result = {}
+    for alias in connections:
+        pools = getattr(type(connections[alias]), '_connection_pools', {})
+        if alias in pools:
+            result[alias] = pool_stats(pools[alias])
+    return result
+
+
+metrics.register('db_pool', stats)
@@ -0,0 +1,33 @@
+import json
+
+from django.db import models
+
+
+class FloatArrayField(models.Field):
+    """
+    Liste de flottants : tableau double precision[] sur PostgreSQL (indexable et agrégeable
+    en SQL), texte JSON sur les autres bases (SQLite en développement).
+    """
+    description = "Liste de nombres à virgule flottante"
+
+    def db_type(self, connection):
+        return 'double precision[]' if connection.vendor == 'postgresql' else 'text'
+
+    def from_db_value(self, value, expression, connection):
+        return self.to_python(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, list):
+            return value
+        return [float(item) for item in json.loads(value)]
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = self.to_python(value)
+        if value is None:
+            return None
+        value = [float(item) for item in value]
+        return value if connection.vendor == 'postgresql' else json.dumps(value)
+
+    def value_to_string(self, obj):
+        value = self.value_from_object(obj)
+        return None if value is None else json.dumps(value)
@@ -0,0 +1,594 @@
+import base64
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, InterfaceError, OperationalError, connection, transaction
+from rest_framework import status
+
+from .ingest_queue import QueueUnavailable, encode_message, decode_message, get_queue
+from .keyring import keyring, UnknownKeyError
+from .models import Raspberry, Reading, ReadingChunk, SensorLocation, SensorData, SoilMoistureChunk
+from .registry import registry
+from . import archive, chunks, rollups
+from .spool import encode_record, get_spool
+from .throttle import get_throttle
+from .telemetry import decode_readings, BinaryFormatError
+from .validation import validate_reading, validate_envelope
+
+logger = logging.getLogger('Website')
+
+NONCE_SIZE = 12
+
+
+class IngestRejected(Exception):
+    """Envoi refusé : corps et code HTTP à renvoyer au Raspberry (chiffré si encrypted)."""
+
+    def __init__(self, body, http_status, encrypted=False, headers=None):
+        super().__init__(body)
+        self.body = body
+        self.http_status = http_status
+        self.encrypted = encrypted
+        self.headers = headers
+
+
+class Submission:
+    """Envoi déchiffré et validé, prêt à être enregistré ou mis en file."""
+
+    def __init__(self, aesgcm, raspberry_id, device_name, readings, results, batch):
+        self.aesgcm = aesgcm
+        self.raspberry_id = raspberry_id
+        self.device_name = device_name
+        self.readings = readings
+        self.results = results
+        self.batch = batch
+        self.duplicates = set()
+        self.watermark = None
+        self.binary = False
+        # Numéros des relevés du lot refusés à la validation (voir settle_rejected).
+        self.rejected_sequences = [
+            result['seq'] for result in results or () if result['status'] == 'rejected' and 'seq' in result
+        ]
+
+
+def resolve_cipher(key_id):
+    """
+    Avec un identifiant de clé, le Raspberry est résolu par le trousseau avant le
+    déchiffrement et sa clé propre est utilisée ; sans, la clé globale est utilisée.
+    Retourne (id du Raspberry ou None, chiffreur).
+    """
+    if not key_id:
+        return None, keyring.legacy_cipher()
+    raspberry_id, aesgcm = keyring.resolve(key_id)
+    if aesgcm is None:
+        raise UnknownKeyError(key_id)
+    return raspberry_id, aesgcm
+
+
+async def aresolve_cipher(key_id):
+    if not key_id:
+        return None, keyring.legacy_cipher()
+    raspberry_id, aesgcm = await keyring.aresolve(key_id)
+    if aesgcm is None:
+        raise UnknownKeyError(key_id)
+    return raspberry_id, aesgcm
+
+
+def decrypt_payload(aesgcm, encrypted_data_b64):
+    encrypted_data = base64.b64decode(encrypted_data_b64)
+    nonce = encrypted_data[:NONCE_SIZE]
+    ciphertext = encrypted_data[NONCE_SIZE:]
+    decrypted_data = aesgcm.decrypt(nonce, ciphertext, None)
+    return json.loads(decrypted_data.decode('utf-8'))
+
+
+def open_envelope(aesgcm, raspberry_id, encrypted_data_b64, request_id):
+    """
+    Déchiffre et valide un envoi (relevé unique ou lot). Ne touche pas à la base :
+    la vue asynchrone l'exécute hors de la boucle d'événements.
+    Lève IngestRejected si l'envoi doit être refusé.
+    """
+    data = decrypt_payload(aesgcm, encrypted_data_b64)
+    logger.debug(f"[{request_id}] Decrypted data: {data}")
+
+    batch = is_batch(data)
+    results = None
+    if batch:
+        device_name, readings, results, errors = validate_batch(data)
+    else:
+        device_name, readings, errors = validate_single(data)
+    return _submission(aesgcm, raspberry_id, device_name, readings, results, batch, errors, request_id)
+
+
+def open_binary_envelope(aesgcm, raspberry_id, body, request_id):
+    """
+    Équivalent de open_envelope pour le format binaire (Website/telemetry.py) :
+    le corps brut nonce + chiffré est déchiffré et décodé sans passer par base64 ni JSON.
+    """
+    view = memoryview(body)
+    decrypted_data = aesgcm.decrypt(view[:NONCE_SIZE], view[NONCE_SIZE:], None)
+    try:
+        device_name, readings, results, batch = decode_readings(decrypted_data)
+    except BinaryFormatError as e:
+        logger.error(f"[{request_id}] Invalid binary payload: {e}")
+        raise IngestRejected(e.errors or {"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+    logger.debug(f"[{request_id}] Decoded binary payload: {len(results)} readings.")
+
+    errors = None
+    if not batch:
+        if len(results) != 1:
+            errors = {"error": "Un seul relevé attendu hors lot."}
+        elif results[0]['status'] == 'rejected':
+            errors = results[0]['errors']
+        results = None
+    submission = _submission(aesgcm, raspberry_id, device_name, readings, results, batch, errors, request_id)
+    submission.binary = True
+    return submission
+
+
+def _submission(aesgcm, raspberry_id, device_name, readings, results, batch, errors, request_id):
+    if errors:
+        logger.error(f"[{request_id}] Invalid data received: {errors}")
+        raise IngestRejected(errors, status.HTTP_400_BAD_REQUEST)
+
+    if raspberry_id is None and not device_name:
+        logger.error(f"[{request_id}] No key id and no device_name in payload.")
+        raise IngestRejected({"error": "Raspberry non identifié."}, status.HTTP_400_BAD_REQUEST)
+
+    return Submission(aesgcm, raspberry_id, device_name, readings, results, batch)
+
+
+def admit(submission, request_id):
+    """
+    Limitation de débit par Raspberry (INGEST_RATE_LIMIT), avant toute écriture, puis refus
+    d'un lot dont tous les relevés sont invalides (après settle_rejected).
+    """
+    _throttle(submission, request_id)
+    if submission.batch and not submission.readings:
+        logger.error(f"[{request_id}] Every reading of the batch was rejected: {submission.results}")
+        settle_rejected(submission)
+        summary = {"accepted": 0, "rejected": len(submission.results), "readings": submission.results}
+        raise IngestRejected({"error": "Aucun relevé valide.", "summary": summary, "watermark": submission.watermark},
+                             status.HTTP_400_BAD_REQUEST, encrypted=True)
+
+
+def _throttle(submission, request_id):
+    throttle = get_throttle()
+    if throttle is None:
+        return
+    # Sans identifiant de clé, le seau est toujours celui du nom : le même avant et après
+    # la mise en cache de l'id du Raspberry.
+    key = submission.raspberry_id if submission.raspberry_id is not None else f"name:{submission.device_name}"
+    raspberry_id = submission.raspberry_id
+    if raspberry_id is None:
+        raspberry_id = registry.devices.get(submission.device_name)
+    state = device_state(raspberry_id)
+    names = [state['device_id'], state['group']] if state else [submission.device_name]
+    retry_after = throttle.check(key, names)
+    if retry_after is not None:
+        logger.warning(f"[{request_id}] Raspberry {key} throttled, retry after {retry_after}s.")
+        raise IngestRejected({"error": "Trop de requêtes.", "retry_after": retry_after},
+                             status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(retry_after)})
+
+
+def commit_submission(submission):
+    """
+    Enregistre l'envoi (INGEST_MODE = 'sync') ou le met en file (INGEST_MODE = 'queue').
+    Retourne (id du Raspberry, message, code HTTP).
+    """
+    settle_rejected(submission)
+    spool = get_spool()
+    if settings.INGEST_MODE == 'queue':
+        try:
+            raspberry_id = enqueue_submission(submission)
+        except (QueueUnavailable, OperationalError, InterfaceError) as e:
+            # Sans tampon disque, la vue répond 503 et le Raspberry renverra les relevés.
+            if spool is None:
+                raise
+            logger.error(f"Ingest queue or database unavailable, spooling {len(submission.readings)} readings: {e}")
+            return spool_submission(spool, submission)
+        return raspberry_id, "Données mises en file d'attente.", status.HTTP_202_ACCEPTED
+
+    if spool is not None:
+        spool.resume(store_spooled)
+        if spool.bypassing():
+            return spool_submission(spool, submission)
+    try:
+        raspberry_id, submission.duplicates, submission.watermark = store_readings(
+            submission.device_name, submission.readings, submission.raspberry_id,
+            latency_budget=settings.INGEST_SPOOL.get('LATENCY_BUDGET_MS') if spool else None
+        )
+    except (OperationalError, InterfaceError) as e:
+        if spool is None:
+            raise
+        logger.error(f"Database unavailable or too slow, spooling {len(submission.readings)} readings: {e}")
+        spool.mark_unavailable()
+        return spool_submission(spool, submission)
+    if len(submission.duplicates) == len(submission.readings):
+        return raspberry_id, "Données déjà enregistrées.", status.HTTP_200_OK
+    return raspberry_id, "Données enregistrées avec succès.", status.HTTP_201_CREATED
+
+
+def enqueue_submission(submission):
+    """Met l'envoi en file (INGEST_MODE = 'queue') ; retourne l'id du Raspberry."""
+    raspberry_id = submission.raspberry_id
+    if raspberry_id is None:
+        raspberry_id = registry.raspberry_id(submission.device_name)
+    get_queue().enqueue(encode_message(raspberry_id, submission.readings))
+    return raspberry_id
+
+
+def spool_submission(spool, submission):
+    """Écrit l'envoi dans le tampon disque ; il sera rejoué dès que la base répondra."""
+    spool.append(encode_record(submission.raspberry_id, submission.device_name, submission.readings))
+    spool.ensure_replayer(store_spooled)
+    raspberry_id = submission.raspberry_id
+    if raspberry_id is None:
+        # Sans la base, seul le registre peut encore identifier le Raspberry pour la réponse.
+        raspberry_id = registry.devices.get(submission.device_name)
+    return raspberry_id, "Données mises en attente (base de données indisponible).", status.HTTP_202_ACCEPTED
+
+
+def store_spooled(raspberry_id, device_name, readings):
+    store_readings(device_name, readings, raspberry_id)
+
+
+def device_state(raspberry_id):
+    """État renvoyé au Raspberry ; le dernier état connu si la base est indisponible."""
+    if raspberry_id is None:
+        return None
+    try:
+        return registry.device_state(raspberry_id)
+    except (OperationalError, InterfaceError):
+        return registry.cached_state(raspberry_id)
+
+
+async def adevice_state(raspberry_id):
+    if raspberry_id is None:
+        return None
+    try:
+        return await registry.adevice_state(raspberry_id)
+    except (OperationalError, InterfaceError):
+        return registry.cached_state(raspberry_id)
+
+
+def build_reply(submission, raspberry_id, message, state, request_id):
+    reply = {
+        "message": message,
+        "raspberry": state,
+    }
+    if submission.batch:
+        accepted_results = [result for result in submission.results if result['status'] == 'accepted']
+        for position in submission.duplicates:
+            accepted_results[position]['status'] = 'duplicate'
+        accepted = len(submission.readings)
+        rejected = len(submission.results) - accepted
+        logger.info(
+            f"[{request_id}] Batch from Raspberry {raspberry_id}: {accepted} accepted "
+            f"({len(submission.duplicates)} already stored), {rejected} rejected."
+        )
+        reply["summary"] = {
+            "accepted": accepted,
+            "duplicates": len(submission.duplicates),
+            "rejected": rejected,
+            "readings": submission.results,
+        }
+    elif submission.duplicates:
+        reply["duplicate"] = True
+    # Le Raspberry ne renvoie que les relevés de numéro de séquence supérieur.
+    watermarks = [w for w in (submission.watermark, state and state.get('last_sequence')) if w is not None]
+    reply["watermark"] = max(watermarks) if watermarks else None
+    return reply
+
+
+def encrypt_payload(aesgcm, message):
+    return base64.b64encode(encrypt_binary(aesgcm, message)).decode('utf-8')
+
+
+def encrypt_binary(aesgcm, message):
+    """Réponse au format binaire : nonce + AES-GCM(JSON), sans base64."""
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + aesgcm.encrypt(nonce, json.dumps(message).encode('utf-8'), None)
+
+
+def is_batch(data):
+    return isinstance(data, dict) and 'readings' in data
+
+
+def validate_single(data):
+    """
+    Valide l'ancien format (un seul relevé par requête).
+    Retourne (device_name, [relevé], None) ou (None, [], erreurs).
+    """
+    validated_data, errors = validate_reading(data, with_device=True)
+    if errors:
+        return None, [], errors
+    return validated_data.get('raspberry', {}).get('device_name'), [validated_data], None
+
+
+def validate_batch(data):
+    """
+    Valide un envoi groupé en une seule passe.
+    Retourne (device_name, relevés acceptés, résultats par relevé, erreurs d'enveloppe).
+    Un relevé invalide est rejeté sans bloquer les autres.
+    """
+    envelope, errors = validate_envelope(data)
+    if errors:
+        return None, [], [], errors
+
+    accepted = []
+    results = []
+    for index, reading in enumerate(envelope['readings']):
+        validated_data, errors = validate_reading(reading)
+        if errors:
+            results.append(_rejected(index, errors, reading.get('seq') if isinstance(reading, dict) else None))
+        else:
+            accepted.append(validated_data)
+            results.append({'index': index, 'status': 'accepted'})
+
+    device_name = envelope.get('raspberry', {}).get('device_name')
+    return device_name, accepted, results, None
+
+
+def _rejected(index, errors, seq):
+    result = {'index': index, 'status': 'rejected', 'errors': errors}
+    if type(seq) is int and seq >= 0:
+        result['seq'] = seq
+    return result
+
+
+def store_readings(device_name, readings, raspberry_id=None, latency_budget=None):
+    """
+    Enregistre une liste de relevés validés pour un Raspberry dans une seule transaction :
+    les identifiants sont résolus via le registre, les mesures communes (une ligne Reading
+    par relevé) et l'humidité du sol (une ligne SensorData par emplacement) insérées en bloc
+    (insert_new) et la dernière humidité du sol de chaque emplacement mise à jour avec bulk_update.
+    Si raspberry_id est fourni (Raspberry authentifié par sa clé), device_name est ignoré.
+    Une ligne déjà présente (même Raspberry ou emplacement, même timestamp) n'est pas réinsérée.
+    Les numéros de séquence (seq) des relevés font avancer le last_sequence du Raspberry.
+    Avec SENSOR_DATA_STORAGE['ENGINE'] = 'chunks', les relevés sont ajoutés aux chunks compressés
+    (Website/chunks.py) au lieu de ces lignes.
+    Les lignes insérées sont ajoutées aux agrégats horaires et journaliers (Website/rollups.py).
+    Sur PostgreSQL, latency_budget (millisecondes) borne la durée de chaque requête.
+    Retourne (id du Raspberry, indices des relevés déjà enregistrés, last_sequence ou None).
+    """
+    try:
+        return _store_readings(device_name, readings, raspberry_id, latency_budget)
+    except IntegrityError:
+        # Un autre processus a pu supprimer un Raspberry ou un emplacement encore en cache.
+        registry.clear()
+        return _store_readings(device_name, readings, raspberry_id, latency_budget)
+
+
+def _store_readings(device_name, readings, raspberry_id, latency_budget):
+    with transaction.atomic():
+        if latency_budget and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f"SET LOCAL statement_timeout = {int(latency_budget)}")
+        if raspberry_id is None:
+            raspberry_id = registry.raspberry_id(device_name)
+        location_names = {loc['location_name'] for reading in readings for loc in reading['locations']}
+        location_ids = registry.location_ids(raspberry_id, location_names)
+
+        # Deux requêtes indexées suffisent à reconnaître un renvoi après timeout.
+        timestamps = {reading['timestamp'] for reading in readings}
+        seen_readings = set(
+            Reading.objects.filter(raspberry_id=raspberry_id, timestamp__in=timestamps)
+            .values_list('timestamp', flat=True)
+        )
+        seen = set(
+            SensorData.objects.filter(
+                sensor_location_id__in=set(location_ids.values()),
+                timestamp__in=timestamps
+            ).values_list('sensor_location_id', 'timestamp')
+        )
+        if chunks.enabled():
+            seen_readings.update(timestamp for _, timestamp in chunks.existing(ReadingChunk, [raspberry_id], timestamps))
+            seen.update(chunks.existing(SoilMoistureChunk, set(location_ids.values()), timestamps))
+        if archive.enabled():
+            archived_readings, archived_soil = archive.existing(raspberry_id, timestamps)
+            seen_readings.update(archived_readings)
+            seen.update(archived_soil)
+
+        reading_rows = []
+        rows = []
+        duplicates = set()
+        latest_soil = {}
+        for index, reading in enumerate(readings):
+            timestamp = reading['timestamp']
+            new_rows = 0
+            if timestamp not in seen_readings:
+                seen_readings.add(timestamp)
+                new_rows += 1
+                reading_rows.append(Reading(
+                    raspberry_id=raspberry_id,
+                    timestamp=timestamp,
+                    temperature=reading['temperature'],
+                    air_humidity=reading['air_humidity'],
+                    water_level=reading.get('water_level')
+                ))
+            for loc in reading['locations']:
+                location_name = loc['location_name']
+                soil_val = loc.get('soil_moisture', None)
+                key = (location_ids[location_name], timestamp)
+                if key in seen:
+                    continue
+                seen.add(key)
+                new_rows += 1
+                rows.append(SensorData(
+                    sensor_location_id=location_ids[location_name],
+                    timestamp=timestamp,
+                    soil_moisture=soil_val
+                ))
+                previous = latest_soil.get(location_name)
+                if previous is None or previous[0] <= timestamp:
+                    latest_soil[location_name] = (timestamp, soil_val)
+            if not new_rows:
+                duplicates.add(index)
+
+        # Un renvoi concurrent a pu écrire les mêmes relevés après les lectures ci-dessus : seules
+        # les lignes réellement ajoutées sont agrégées.
+        if chunks.enabled():
+            reading_rows = chunks.append(ReadingChunk, reading_rows)
+            rows = chunks.append(SoilMoistureChunk, rows)
+        else:
+            reading_rows = insert_new(Reading, reading_rows, ['raspberry', 'timestamp'])
+            rows = insert_new(SensorData, rows, ['sensor_location', 'timestamp'])
+        if settings.ROLLUPS['ENABLED'] and (reading_rows or rows):
+            rollups.record(reading_rows, rows)
+        if latest_soil:
+            SensorLocation.objects.bulk_update(
+                [SensorLocation(id=location_ids[name], soil_moisture=soil_val)
+                 for name, (_, soil_val) in latest_soil.items()],
+                ['soil_moisture']
+            )
+        watermark = _advance_watermark(raspberry_id, [reading['seq'] for reading in readings if reading.get('seq') is not None])
+    return raspberry_id, duplicates, watermark
+
+
+def insert_new(model, objs, unique_fields):
+    """
+    Insère objs avec INSERT ... ON CONFLICT DO NOTHING RETURNING et retourne ceux qui ont
+    réellement été insérés (reconnus par unique_fields). Sur les autres bases, bulk_create
+    (ignore_conflicts) et tous les objets sont retournés.
+    """
+    if not objs:
+        return []
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        model.objects.bulk_create(objs, batch_size=settings.INGEST_MAX_BATCH_SIZE, ignore_conflicts=True)
+        return objs
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    keys = [model._meta.get_field(name) for name in unique_fields]
+    # Valeurs renvoyées converties comme dans un QuerySet (horodatages de SQLite rendus conscients du fuseau).
+    columns = [field.get_col(model._meta.db_table) for field in keys]
+    converters = [[*connection.ops.get_db_converters(col), *col.get_db_converters(connection)] for col in columns]
+
+    def convert(row):
+        values = []
+        for value, col, functions in zip(row, columns, converters):
+            for function in functions:
+                value = function(value, col, connection)
+            values.append(value)
+        return tuple(values)
+
+    quote = connection.ops.quote_name
+    row_sql = f"({', '.join(['%s'] * len(fields))})"
+    batch_size = settings.INGEST_MAX_BATCH_SIZE
+    if connection.features.max_query_params:
+        batch_size = min(batch_size, connection.features.max_query_params // len(fields))
+    inserted = []
+    with connection.cursor() as cursor:
+        for offset in range(0, len(objs), batch_size):
+            batch = objs[offset:offset + batch_size]
+            cursor.execute(
+                f"INSERT INTO {quote(model._meta.db_table)} ({', '.join(quote(field.column) for field in fields)}) "
+                f"VALUES {', '.join([row_sql] * len(batch))} ON CONFLICT DO NOTHING "
+                f"RETURNING {', '.join(quote(field.column) for field in keys)}",
+                [field.get_db_prep_save(field.pre_save(obj, True), connection) for obj in batch for field in fields]
+            )
+            created = {convert(row) for row in cursor.fetchall()}
+            inserted += [obj for obj in batch if tuple(getattr(obj, field.attname) for field in keys) in created]
+    return inserted
+
+
+def merge_sequences(watermark, pending, sequences):
+    """
+    Nouveau (last_sequence, pending_sequences) une fois les numéros sequences enregistrés.
+    last_sequence ne dépasse jamais un numéro manquant : les numéros reçus au-delà restent
+    dans pending (plages [début, fin] triées et disjointes) jusqu'à ce que le trou soit comblé.
+    Le premier envoi numéroté d'un Raspberry fixe le point de départ.
+    """
+    ranges = sorted([*(list(r) for r in pending), *([seq, seq] for seq in set(sequences))])
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    if watermark is None and merged:
+        watermark = merged.pop(0)[1]
+    while merged and merged[0][0] <= watermark + 1:
+        watermark = max(watermark, merged.pop(0)[1])
+    return watermark, merged
+
+
+def _advance_watermark(raspberry_id, sequences):
+    if not sequences:
+        return None
+    # Verrou de ligne : deux envois simultanés du même Raspberry ne peuvent pas faire reculer la valeur.
+    current, pending = Raspberry.objects.select_for_update().filter(id=raspberry_id).values_list(
+        'last_sequence', 'pending_sequences'
+    ).get()
+    watermark, remaining = merge_sequences(current, pending, sequences)
+    if (watermark, remaining) != (current, pending):
+        Raspberry.objects.filter(id=raspberry_id).update(last_sequence=watermark, pending_sequences=remaining)
+    if watermark != current:
+        transaction.on_commit(lambda: registry.remember_watermark(raspberry_id, watermark))
+    return watermark
+
+
+def settle_rejected(submission):
+    """
+    Compte comme réglés les numéros des relevés refusés à la validation : ils ne seront jamais
+    enregistrés et ne doivent pas bloquer le watermark. Sans effet si la base est indisponible
+    (un renvoi les refusera de nouveau).
+    """
+    if not submission.rejected_sequences:
+        return
+    try:
+        raspberry_id = submission.raspberry_id
+        if raspberry_id is None:
+            raspberry_id = registry.raspberry_id(submission.device_name)
+        with transaction.atomic():
+            submission.watermark = _advance_watermark(raspberry_id, submission.rejected_sequences)
+    except (OperationalError, InterfaceError) as e:
+        logger.warning(f"Could not settle rejected sequences of {submission.raspberry_id or submission.device_name}: {e}")
+
+
+def drain(queue, batch_size, max_age):
+    """
+    Lit jusqu'à batch_size messages (ou ce qui est arrivé en max_age secondes),
+    les regroupe par Raspberry et les écrit en bloc. Un message n'est acquitté
+    qu'après la validation de la transaction ; un message invalide part en
+    lettre morte, une base indisponible laisse le message en attente.
+    Retourne le nombre de messages traités.
+    """
+    messages = queue.read(batch_size, block_ms=int(max_age * 1000))
+    deadline = time.monotonic() + max_age
+    while messages and len(messages) < batch_size and time.monotonic() < deadline:
+        more = queue.read(batch_size - len(messages), block_ms=int((deadline - time.monotonic()) * 1000))
+        if not more:
+            break
+        messages.extend(more)
+
+    by_device = defaultdict(list)
+    for message_id, payload in messages:
+        try:
+            raspberry_id, readings = decode_message(payload)
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Dead-lettering undecodable ingest message {message_id}: {e}")
+            queue.dead_letter(message_id, payload, str(e))
+            continue
+        by_device[raspberry_id].append((message_id, payload, readings))
+
+    for raspberry_id, items in by_device.items():
+        try:
+            store_readings(None, [r for _, _, readings in items for r in readings], raspberry_id)
+            queue.ack([message_id for message_id, _, _ in items])
+        except (OperationalError, InterfaceError):
+            raise
+        except Exception:
+            # Isole le ou les messages fautifs du lot.
+            for message_id, payload, readings in items:
+                try:
+                    store_readings(None, readings, raspberry_id)
+                    queue.ack([message_id])
+                except (OperationalError, InterfaceError):
+                    raise
+                except Exception as e:
+                    logger.error(f"Dead-lettering ingest message {message_id}: {e}")
+                    queue.dead_letter(message_id, payload, str(e))
+    return len(messages)
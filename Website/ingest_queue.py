@@ -0,0 +1,221 @@
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+
+def encode_message(raspberry_id, readings):
+    """Sérialise des relevés validés (timestamps en ISO 8601) pour la file d'attente."""
+    return json.dumps({
+        'raspberry_id': raspberry_id,
+        'enqueued_at': time.time(),
+        'readings': [dict(reading, timestamp=reading['timestamp'].isoformat()) for reading in readings],
+    })
+
+
+def decode_message(payload):
+    message = json.loads(payload)
+    for reading in message['readings']:
+        reading['timestamp'] = datetime.fromisoformat(reading['timestamp'])
+    return message['raspberry_id'], message['readings']
+
+
+class QueueUnavailable(Exception):
+    """La file d'attente n'a pas pu enregistrer le message (Redis injoignable)."""
+
+
+class InMemoryQueue:
+    """
+    File d'attente en mémoire du processus, utilisée pour les tests et le développement
+    (le worker doit alors tourner dans le même processus que les vues).
+    Mêmes garanties que RedisStreamQueue : un message lu mais non acquitté est
+    redistribué après visibility_timeout secondes.
+    """
+
+    def __init__(self, visibility_timeout=60, dead_letter_size=1000):
+        self.visibility_timeout = visibility_timeout
+        self._ready = deque()
+        self._pending = OrderedDict()
+        self._dead = deque(maxlen=dead_letter_size)
+        self._lock = threading.Lock()
+
+    def enqueue(self, payload):
+        message_id = str(uuid.uuid4())
+        with self._lock:
+            self._ready.append((message_id, payload, time.time()))
+        return message_id
+
+    def read(self, count, block_ms=0):
+        deadline = time.monotonic() + block_ms / 1000
+        while True:
+            with self._lock:
+                messages = self._claim_expired(count)
+                while self._ready and len(messages) < count:
+                    message_id, payload, enqueued_at = self._ready.popleft()
+                    self._pending[message_id] = (payload, enqueued_at, time.monotonic())
+                    messages.append((message_id, payload))
+            if messages or time.monotonic() >= deadline:
+                return messages
+            time.sleep(0.01)
+
+    def _claim_expired(self, count):
+        messages = []
+        limit = time.monotonic() - self.visibility_timeout
+        for message_id, (payload, enqueued_at, delivered_at) in list(self._pending.items()):
+            if len(messages) >= count:
+                break
+            if delivered_at <= limit:
+                self._pending[message_id] = (payload, enqueued_at, time.monotonic())
+                messages.append((message_id, payload))
+        return messages
+
+    def ack(self, message_ids):
+        with self._lock:
+            for message_id in message_ids:
+                self._pending.pop(message_id, None)
+
+    def dead_letter(self, message_id, payload, error):
+        with self._lock:
+            self._pending.pop(message_id, None)
+            self._dead.append({'id': message_id, 'payload': payload, 'error': error, 'at': time.time()})
+
+    def dead_letters(self, count=100):
+        with self._lock:
+            return list(self._dead)[-count:]
+
+    def stats(self):
+        with self._lock:
+            oldest = [self._ready[0][2]] if self._ready else []
+            oldest += [enqueued_at for _, enqueued_at, _ in self._pending.values()]
+            return {
+                'depth': len(self._ready) + len(self._pending),
+                'pending': len(self._pending),
+                'dead_letters': len(self._dead),
+                'lag_seconds': time.time() - min(oldest) if oldest else 0.0,
+            }
+
+
+class RedisStreamQueue:
+    """
+    File d'attente sur un stream Redis avec un groupe de consommateurs.
+    Les messages ne sont supprimés qu'après acquittement (livraison au moins une fois) ;
+    ceux d'un worker arrêté sont repris après visibility_timeout secondes.
+    """
+
+    GROUP = 'ingest-workers'
+
+    def __init__(self, url, stream='eden:ingest', visibility_timeout=60, dead_letter_size=1000):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.stream = stream
+        self.dead_key = f"{stream}:dead"
+        self.visibility_timeout = visibility_timeout
+        self.dead_letter_size = dead_letter_size
+        self.consumer = f"worker-{uuid.uuid4().hex[:8]}"
+        self._group_ready = False
+
+    def _ensure_group(self):
+        if self._group_ready:
+            return
+        import redis
+        try:
+            self.client.xgroup_create(self.stream, self.GROUP, id='0', mkstream=True)
+        except redis.ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self._group_ready = True
+
+    def enqueue(self, payload):
+        import redis
+
+        try:
+            return self.client.xadd(self.stream, {'payload': payload}).decode()
+        except redis.RedisError as e:
+            raise QueueUnavailable(str(e)) from e
+
+    def read(self, count, block_ms=0):
+        self._ensure_group()
+        _, claimed, *_ = self.client.xautoclaim(
+            self.stream, self.GROUP, self.consumer,
+            min_idle_time=int(self.visibility_timeout * 1000), start_id='0-0', count=count
+        )
+        entries = list(claimed)
+        if len(entries) < count:
+            response = self.client.xreadgroup(
+                self.GROUP, self.consumer, {self.stream: '>'},
+                count=count - len(entries), block=block_ms or None
+            )
+            for _, stream_entries in response or []:
+                entries.extend(stream_entries)
+        return [
+            (message_id.decode(), fields[b'payload'].decode())
+            for message_id, fields in entries if fields
+        ]
+
+    def ack(self, message_ids):
+        if not message_ids:
+            return
+        pipe = self.client.pipeline()
+        pipe.xack(self.stream, self.GROUP, *message_ids)
+        pipe.xdel(self.stream, *message_ids)
+        pipe.execute()
+
+    def dead_letter(self, message_id, payload, error):
+        entry = json.dumps({'id': message_id, 'payload': payload, 'error': error, 'at': time.time()})
+        pipe = self.client.pipeline()
+        pipe.lpush(self.dead_key, entry)
+        pipe.ltrim(self.dead_key, 0, self.dead_letter_size - 1)
+        pipe.xack(self.stream, self.GROUP, message_id)
+        pipe.xdel(self.stream, message_id)
+        pipe.execute()
+
+    def dead_letters(self, count=100):
+        return [json.loads(entry) for entry in self.client.lrange(self.dead_key, 0, count - 1)]
+
+    def stats(self):
+        self._ensure_group()
+        pipe = self.client.pipeline()
+        pipe.xlen(self.stream)
+        pipe.xpending(self.stream, self.GROUP)
+        pipe.xrange(self.stream, count=1)
+        pipe.llen(self.dead_key)
+        depth, pending, oldest, dead = pipe.execute()
+        lag = 0.0
+        if oldest:
+            oldest_ms = int(oldest[0][0].decode().split('-')[0])
+            lag = max(time.time() - oldest_ms / 1000, 0.0)
+        return {
+            'depth': depth,
+            'pending': pending['pending'],
+            'dead_letters': dead,
+            'lag_seconds': lag,
+        }
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Instance unique (par processus) de la file configurée dans settings.INGEST_QUEUE."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                backend = import_string(settings.INGEST_QUEUE['BACKEND'])
+                _queue = backend(**settings.INGEST_QUEUE.get('OPTIONS', {}))
+    return _queue
+
+
+if settings.INGEST_MODE == 'queue':
+    # Profondeur et retard sont lus dans la file elle-même : ils sont communs à tous les processus.
+    metrics.register('ingest_queue', lambda: get_queue().stats())
+
@@ -0,0 +1,123 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.timezone import now, timedelta
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from .models import Raspberry
+from .registry import LRUCache
+
+
+class UnknownKeyError(Exception):
+    pass
+
+
+def derive_device_key(api_token):
+    """Clé AES-256 propre à un Raspberry, dérivée de la clé maître et de son jeton."""
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b'eden-device-key:' + api_token.bytes,
+    ).derive(settings.AES_SECRET_KEY)
+
+
+def rotate_device_key(raspberry):
+    """
+    Génère un nouveau jeton (donc une nouvelle clé) pour un Raspberry.
+    L'ancien jeton reste accepté pendant DEVICE_KEY_GRACE_HOURS.
+    """
+    raspberry.previous_api_token = raspberry.api_token
+    raspberry.api_token = uuid.uuid4()
+    raspberry.api_token_rotated_at = now()
+    raspberry.save(update_fields=['previous_api_token', 'api_token', 'api_token_rotated_at'])
+    return raspberry
+
+
+class KeyRing:
+    """
+    Résout l'identifiant de clé d'une enveloppe (le jeton du Raspberry) en
+    (raspberry_id, AESGCM), avant tout déchiffrement. Les chiffreurs sont
+    gardés en cache et réutilisés d'une requête à l'autre pendant
+    DEVICE_KEY_CACHE_TTL secondes, puis le jeton est vérifié de nouveau en base.
+    """
+
+    def __init__(self, maxsize):
+        self.ciphers = LRUCache(maxsize)
+        self._legacy_cipher = None
+        self._lock = threading.Lock()
+
+    def resolve(self, key_id):
+        """Retourne (raspberry_id, aesgcm) ou (None, None) si la clé est inconnue ou expirée."""
+        try:
+            api_token = uuid.UUID(str(key_id))
+        except ValueError:
+            return None, None
+
+        entry = self.ciphers.get(api_token)
+        if entry is None or entry[3] <= time.monotonic():
+            entry = self._remember(api_token, self._queryset(api_token).first())
+        return self._check(entry)
+
+    async def aresolve(self, key_id):
+        """Version asynchrone de resolve() pour la vue ASGI."""
+        try:
+            api_token = uuid.UUID(str(key_id))
+        except ValueError:
+            return None, None
+
+        entry = self.ciphers.get(api_token)
+        if entry is None or entry[3] <= time.monotonic():
+            entry = self._remember(api_token, await self._queryset(api_token).afirst())
+        return self._check(entry)
+
+    def _check(self, entry):
+        if entry is None:
+            return None, None
+        raspberry_id, aesgcm, expires_at, _ = entry
+        if expires_at is not None and expires_at < now():
+            return None, None
+        return raspberry_id, aesgcm
+
+    def _queryset(self, api_token):
+        grace_start = now() - timedelta(hours=settings.DEVICE_KEY_GRACE_HOURS)
+        return Raspberry.objects.filter(
+            Q(api_token=api_token) |
+            Q(previous_api_token=api_token, api_token_rotated_at__gte=grace_start)
+        ).only('id', 'api_token', 'api_token_rotated_at')
+
+    def _remember(self, api_token, raspberry):
+        if raspberry is None:
+            self.ciphers.discard(api_token)
+            return None
+
+        expires_at = None
+        if raspberry.api_token != api_token:
+            expires_at = raspberry.api_token_rotated_at + timedelta(hours=settings.DEVICE_KEY_GRACE_HOURS)
+        # Le TTL borne le délai de prise en compte d'une rotation faite par un autre processus.
+        entry = (raspberry.id, AESGCM(derive_device_key(api_token)), expires_at,
+                 time.monotonic() + settings.DEVICE_KEY_CACHE_TTL)
+        self.ciphers.set(api_token, entry)
+        return entry
+
+    def legacy_cipher(self):
+        """Chiffreur de la clé globale, pour les Raspberry qui n'envoient pas d'identifiant de clé."""
+        if self._legacy_cipher is None:
+            with self._lock:
+                if self._legacy_cipher is None:
+                    self._legacy_cipher = AESGCM(settings.AES_SECRET_KEY)
+        return self._legacy_cipher
+
+    def forget_raspberry(self, raspberry_id):
+        self.ciphers.discard_where(lambda key, value: value[0] == raspberry_id)
+
+    def clear(self):
+        self.ciphers.clear()
+
+
+keyring = KeyRing(settings.INGEST_REGISTRY_SIZE)
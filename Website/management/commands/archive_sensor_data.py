@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
+
+from Website.archive import ArchiveError, archive_cutoff, archive_month, months_to_archive
+from Website.models import Raspberry
+
+
+class Command(BaseCommand):
+    help = (
+        "Archive froide : déplace les mois entiers (UTC) plus anciens que AFTER_DAYS jours de Reading et "
+        "SensorData vers des fichiers Parquet par Raspberry et par mois (SENSOR_DATA_ARCHIVE['ROOT']). "
+        "Chaque fichier est relu et comparé aux lignes de la base avant leur suppression ; une "
+        "interruption est sans perte, il suffit de relancer la commande."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than-days', type=int, default=settings.SENSOR_DATA_ARCHIVE['AFTER_DAYS'],
+            help="Âge minimal des relevés archivés (SENSOR_DATA_ARCHIVE['AFTER_DAYS'] par défaut)."
+        )
+        parser.add_argument('--raspberry', type=int, action='append', dest='raspberries', help="Limite à ce Raspberry (id, répétable).")
+        parser.add_argument('--dry-run', action='store_true', help="Affiche les mois concernés sans rien archiver.")
+
+    def handle(self, *args, **options):
+        if not settings.SENSOR_DATA_ARCHIVE['ENABLED']:
+            raise CommandError("L'archive est désactivée (SENSOR_DATA_ARCHIVE['ENABLED']).")
+        if options['older_than_days'] < 1:
+            raise CommandError("--older-than-days doit être positif.")
+
+        cutoff = archive_cutoff(now(), options['older_than_days'])
+        raspberries = Raspberry.objects.order_by('id')
+        if options['raspberries']:
+            raspberries = raspberries.filter(id__in=options['raspberries'])
+
+        totals = {'readings': 0, 'soil': 0}
+        for raspberry in raspberries:
+            for month in months_to_archive(raspberry.id, cutoff):
+                if options['dry_run']:
+                    self.stdout.write(f"{raspberry.device_id} : {month:%Y-%m} à archiver.")
+                    continue
+                try:
+                    counts = archive_month(raspberry.id, month)
+                except ArchiveError as e:
+                    raise CommandError(str(e))
+                if counts:
+                    for kind, count in counts.items():
+                        totals[kind] += count
+                    self.stdout.write(
+                        f"{raspberry.device_id} : {month:%Y-%m} archivé "
+                        f"({counts.get('readings', 0)} relevés, {counts.get('soil', 0)} mesures d'humidité du sol)."
+                    )
+        if not options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f"{totals['readings']} relevés et {totals['soil']} mesures d'humidité du sol antérieurs au "
+                f"{cutoff:%Y-%m-%d} archivés."
+            ))
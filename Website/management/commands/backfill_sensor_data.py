@@ -0,0 +1,252 @@
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from Website.models import Reading, SensorData
+from Website.registry import registry
+from Website.rollups import rebuild
+
+COLUMNS = ['device', 'location', 'timestamp', 'temperature', 'air_humidity', 'soil_moisture', 'water_level']
+FLOAT_COLUMNS = ['temperature', 'air_humidity', 'water_level']
+READING_FIELDS = ['raspberry', 'timestamp', 'temperature', 'air_humidity', 'water_level']
+SENSOR_DATA_FIELDS = ['sensor_location', 'timestamp', 'soil_moisture', 'soil_moisture_probes']
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe un historique de relevés (CSV ou JSON lines, éventuellement .gz) dans Reading et SensorData. "
+        "Utilise COPY FROM STDIN sur PostgreSQL et bulk_create ailleurs. "
+        f"Colonnes attendues : {', '.join(COLUMNS)}. "
+        "Reprise possible après interruption avec --offset ou --checkpoint. Les agrégats horaires et "
+        "journaliers de la période importée sont recalculés à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier à importer (.csv, .jsonl, éventuellement suffixé .gz).")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Format du fichier (déduit de l'extension par défaut).")
+        parser.add_argument('--chunk-size', type=int, default=50000, help="Nombre de lignes écrites par transaction.")
+        parser.add_argument('--offset', type=int, help="Position (octets, fichier décompressé) à partir de laquelle reprendre.")
+        parser.add_argument('--checkpoint', help="Fichier où enregistrer la position après chaque lot validé (et d'où la reprendre).")
+        parser.add_argument('--skip-rollups', action='store_true', help="Ne recalcule pas les agrégats (rebuild_rollups à lancer ensuite).")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"Fichier introuvable : {path}")
+
+        compressed = path.endswith('.gz')
+        fmt = options['format'] or ('csv' if path.removesuffix('.gz').endswith('.csv') else 'jsonl')
+        checkpoint = options['checkpoint']
+
+        offset = options['offset']
+        if offset is None and checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                offset = int(f.read().strip() or 0)
+        offset = offset or 0
+
+        total_size = None if compressed else os.path.getsize(path)
+        opener = gzip.open if compressed else open
+        use_copy = connection.vendor == 'postgresql'
+        self.stdout.write(
+            f"Import de {path} ({fmt}, {'COPY' if use_copy else 'bulk_create'}) à partir de l'octet {offset}."
+        )
+
+        stored = skipped = 0
+        self.periods = {}
+        started = time.monotonic()
+        with opener(path, 'rb') as f:
+            header = None
+            if fmt == 'csv':
+                first_line = f.readline()
+                header = next(csv.reader([first_line.decode('utf-8')]))
+                missing = set(COLUMNS) - set(header)
+                if missing:
+                    raise CommandError(f"Colonnes manquantes : {', '.join(sorted(missing))}")
+                offset = max(offset, len(first_line))
+            f.seek(offset)
+
+            chunk = []
+            for line in f:
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    chunk.append(self._parse(line, fmt, header))
+                except (ValueError, KeyError, TypeError) as e:
+                    skipped += 1
+                    self.stderr.write(f"Ligne ignorée avant l'octet {offset} : {type(e).__name__}: {e}")
+                    continue
+
+                if len(chunk) >= options['chunk_size']:
+                    stored += self._flush(chunk, use_copy)
+                    self._save_checkpoint(checkpoint, offset)
+                    self._report(stored, skipped, started, offset, total_size)
+                    chunk = []
+
+            if chunk:
+                stored += self._flush(chunk, use_copy)
+                self._save_checkpoint(checkpoint, offset)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{stored} relevés importés, {skipped} lignes ignorées en {elapsed:.1f} s "
+            f"({stored / elapsed if elapsed else 0:.0f} lignes/s). Position finale : {offset}."
+        ))
+
+        if settings.ROLLUPS['ENABLED'] and not options['skip_rollups']:
+            for raspberry_id, (first, last) in self.periods.items():
+                written = rebuild(first, last + timedelta(microseconds=1), raspberry_ids=[raspberry_id])
+                self.stdout.write(f"Raspberry {raspberry_id} : {written} créneaux d'agrégats recalculés.")
+
+    def _parse(self, line, fmt, header):
+        if fmt == 'csv':
+            row = dict(zip(header, next(csv.reader([line.decode('utf-8')]))))
+        else:
+            row = json.loads(line)
+
+        timestamp = row['timestamp']
+        if not isinstance(timestamp, datetime):
+            timestamp = parse_datetime(timestamp) or datetime.strptime(timestamp, '%d/%m/%Y %H:%M:%S')
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+
+        soil_moisture = row.get('soil_moisture')
+        if isinstance(soil_moisture, str):
+            soil_moisture = json.loads(soil_moisture) if soil_moisture.strip() else None
+        # Une liste correspond à un emplacement à plusieurs sondes ; la première est la valeur principale.
+        if isinstance(soil_moisture, list):
+            probes = [float(value) for value in soil_moisture]
+            soil_moisture = (probes[0] if probes else None, probes if len(probes) > 1 else None)
+        else:
+            soil_moisture = (None if soil_moisture is None else float(soil_moisture), None)
+
+        values = {
+            column: float(row[column]) if row.get(column) not in (None, '') else None
+            for column in FLOAT_COLUMNS
+        }
+        return str(row['device']), str(row['location']), timestamp, values, soil_moisture
+
+    def _flush(self, chunk, use_copy):
+        """
+        Résout les noms en identifiants pour tout le lot puis l'écrit dans une transaction.
+        Les relevés déjà présents sont ignorés. Retourne le nombre de lignes insérées
+        (avec bulk_create, le nombre de lignes traitées).
+        """
+        with transaction.atomic():
+            names_by_device = {}
+            for device, location, *_ in chunk:
+                names_by_device.setdefault(device, set()).add(location)
+            location_ids = {}
+            raspberry_ids = {}
+            for device, names in names_by_device.items():
+                raspberry_ids[device] = raspberry_id = registry.raspberry_id(device)
+                for name, location_id in registry.location_ids(raspberry_id, names).items():
+                    location_ids[(device, name)] = location_id
+
+            # Une ligne Reading par (Raspberry, timestamp) : les mesures communes sont répétées sur chaque emplacement du fichier.
+            readings = {}
+            for device, location, timestamp, values, soil_moisture in chunk:
+                readings.setdefault((raspberry_ids[device], timestamp), values)
+            for raspberry_id, timestamp in readings:
+                first, last = self.periods.get(raspberry_id, (timestamp, timestamp))
+                self.periods[raspberry_id] = (min(first, timestamp), max(last, timestamp))
+            reading_rows = [
+                (raspberry_id, timestamp, values['temperature'], values['air_humidity'], values['water_level'])
+                for (raspberry_id, timestamp), values in readings.items()
+            ]
+            rows = [
+                (location_ids[(device, location)], timestamp, *soil_moisture)
+                for device, location, timestamp, values, soil_moisture in chunk
+            ]
+            if use_copy:
+                self._copy(Reading, READING_FIELDS, reading_rows)
+                return self._copy(SensorData, SENSOR_DATA_FIELDS, rows)
+            Reading.objects.bulk_create(
+                [Reading(raspberry_id=raspberry_id, timestamp=timestamp, temperature=temperature,
+                         air_humidity=air_humidity, water_level=water_level)
+                 for raspberry_id, timestamp, temperature, air_humidity, water_level in reading_rows],
+                batch_size=settings.INGEST_MAX_BATCH_SIZE,
+                ignore_conflicts=True
+            )
+            SensorData.objects.bulk_create(
+                [SensorData(sensor_location_id=location_id, timestamp=timestamp, soil_moisture=soil_moisture,
+                            soil_moisture_probes=probes)
+                 for location_id, timestamp, soil_moisture, probes in rows],
+                batch_size=settings.INGEST_MAX_BATCH_SIZE,
+                ignore_conflicts=True
+            )
+        return len(rows)
+
+    def _copy(self, model, fields, rows):
+        """
+        COPY dans une table temporaire puis INSERT ... ON CONFLICT DO NOTHING :
+        les relevés déjà présents (reprise après incident, recouvrement avec l'API) sont ignorés.
+        Retourne le nombre de lignes réellement insérées.
+        """
+        opts = model._meta
+        columns = [opts.get_field(name).column for name in fields]
+        quoted_columns = ', '.join(connection.ops.quote_name(column) for column in columns)
+        table = connection.ops.quote_name(opts.db_table)
+        staging = connection.ops.quote_name(f"backfill_staging_{opts.model_name}")
+        sql = f"COPY {staging} ({quoted_columns}) FROM STDIN"
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging} ON COMMIT DELETE ROWS "
+                f"AS SELECT {quoted_columns} FROM {table} WITH NO DATA"
+            )
+            raw_cursor = cursor.cursor
+            if hasattr(raw_cursor, 'copy'):
+                # psycopg 3
+                with raw_cursor.copy(sql) as copy:
+                    for row in rows:
+                        copy.write_row(row)
+            else:
+                # psycopg2
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row in rows:
+                    writer.writerow([self._csv_value(value) for value in row])
+                buffer.seek(0)
+                raw_cursor.copy_expert(f"{sql} WITH (FORMAT csv)", buffer)
+
+            cursor.execute(
+                f"INSERT INTO {table} ({quoted_columns}) SELECT {quoted_columns} FROM {staging} "
+                f"ON CONFLICT DO NOTHING"
+            )
+            return cursor.rowcount
+
+    def _csv_value(self, value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        if isinstance(value, list):
+            return '{' + ','.join(repr(item) for item in value) + '}'
+        return value
+
+    def _save_checkpoint(self, checkpoint, offset):
+        if not checkpoint:
+            return
+        tmp = f"{checkpoint}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, checkpoint)
+
+    def _report(self, stored, skipped, started, offset, total_size):
+        elapsed = time.monotonic() - started
+        progress = f" ({offset * 100 / total_size:.1f} %)" if total_size else ""
+        self.stdout.write(
+            f"{stored} relevés importés, {skipped} ignorés, {stored / elapsed if elapsed else 0:.0f} lignes/s, "
+            f"octet {offset}{progress}"
+        )
@@ -0,0 +1,173 @@
+import json
+import logging
+import random
+import statistics
+import time
+import tracemalloc
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now, timedelta
+
+from Website import charts, rollups
+from Website.chunks import latest_reading
+from Website.models import Raspberry, Reading, SensorData, SensorLocation
+from Website.timeseries import bucket_seconds
+
+logger = logging.getLogger('Website')
+
+BENCH_PREFIX = 'bench-chart-'
+
+
+def legacy_envelope(rows, field):
+    """Série d'un champ comme les vues avant Website/charts.py : un parcours des lignes par liste."""
+    return (
+        charts.time_labels(np.array([row['bucket_start'].timestamp() for row in rows])),
+        [row[f"{field}_avg"] for row in rows],
+        [row[f"{field}_min"] for row in rows],
+        [row[f"{field}_max"] for row in rows],
+    )
+
+
+def legacy_payload(raspberry, hours, theme):
+    """
+    Jauges et graphiques construits comme dans graph_page et guest_graph_page avant
+    Website/charts.py : instances de SensorLocation, une série à la fois, spécifications
+    complètes construites puis sérialisées à chaque requête.
+    """
+    gauge, chart, temperature_range = charts.THEMES[theme]
+    end_time = now()
+    start_time = end_time - timedelta(hours=hours)
+    sensor_locations = SensorLocation.objects.filter(raspberry=raspberry)
+    if settings.CHARTS['SERIES'] == 'lttb':
+        reading_series, soil_series = charts.chart_series(raspberry, sensor_locations, start_time, end_time)
+    else:
+        seconds = bucket_seconds(start_time, end_time, settings.CHARTS['MAX_POINTS'])
+        rows = rollups.reading_series(raspberry, start_time, end_time, seconds)
+        reading_series = {metric: legacy_envelope(rows, metric) for metric in rollups.READING_METRICS}
+        by_location = {}
+        for row in rollups.soil_series(sensor_locations, start_time, end_time, seconds):
+            by_location.setdefault(row['sensor_location_id'], []).append(row)
+        soil_series = {
+            location_id: legacy_envelope(location_rows, 'soil_moisture')
+            for location_id, location_rows in by_location.items()
+        }
+    latest = latest_reading(raspberry, start_time)
+
+    soil_moisture_traces = []
+    for idx, loc in enumerate(sensor_locations):
+        series = soil_series.get(loc.id)
+        if series is None or not series[0]:
+            continue
+        soil_moisture_traces += charts.traces(series, charts.SOIL_COLORS[idx % len(charts.SOIL_COLORS)], loc.location_name)
+    logger.debug(f"Soil moisture traces: {soil_moisture_traces}")
+    soil = [location.soil_moisture for location in sensor_locations if location.soil_moisture is not None]
+    current = {metric: getattr(latest, metric, None) or 0 for metric in rollups.READING_METRICS}
+    current['soil_moisture'] = sum(soil) / len(soil) if soil else 0
+
+    ranges = {'temperature': temperature_range}
+    gauges = []
+    for gauge_id, title, metric, color in charts.GAUGES:
+        spec = gauge(color, ranges.get(metric, [0, 100]))
+        spec['data'][0]['value'] = current[metric]
+        gauges.append({'id': gauge_id, 'title': title, 'json': json.dumps(spec)})
+    result = []
+    for chart_id, title, metric in charts.TIME_CHARTS:
+        spec = chart(ranges.get(metric, [0, 100]))
+        if metric == 'soil_moisture':
+            spec['data'] = soil_moisture_traces
+        else:
+            spec['data'] = charts.traces(reading_series[metric], charts.METRIC_COLORS[metric])
+        result.append({'id': chart_id, 'title': title, 'json': json.dumps(spec)})
+    return {'gauges': gauges, 'charts': result}
+
+
+VARIANTS = {'avant': legacy_payload, 'après': charts.payload}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare par requête la construction des jauges et graphiques de graph.html avant et après "
+        "Website/charts.py (mêmes données, même résultat) : durée, temps CPU du processus Django, pic "
+        "d'allocation mémoire (tracemalloc) et nombre de requêtes SQL. Les données de test sont "
+        "supprimées à la fin sauf avec --keep."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locations', type=int, default=4, help="Nombre d'emplacements.")
+        parser.add_argument('--days', type=int, default=30, help="Profondeur de l'historique (jours).")
+        parser.add_argument('--interval', type=int, default=60, help="Intervalle entre deux relevés (secondes).")
+        parser.add_argument('--hours', type=int, nargs='+', default=[24, 168, 720], help="Périodes affichées.")
+        parser.add_argument('--theme', choices=sorted(charts.THEMES), default='dashboard', help="Thème des graphiques.")
+        parser.add_argument('--repeat', type=int, default=20, help="Nombre de requêtes mesurées par variante.")
+        parser.add_argument('--keep', action='store_true', help="Garde les données de test.")
+
+    def handle(self, *args, **options):
+        Raspberry.objects.filter(device_id__startswith=BENCH_PREFIX).delete()
+        try:
+            raspberry = self._seed(options)
+            self.stdout.write(
+                f"Séries '{settings.CHARTS['SERIES']}', thème '{options['theme']}', {options['locations']} emplacements."
+            )
+            self.stdout.write(f"{'période':>8}  {'variante':<9}{'ms':>9}{'CPU ms':>9}{'pic Kio':>10}{'requêtes':>10}")
+            for hours in options['hours']:
+                results = {name: build(raspberry, hours, options['theme']) for name, build in VARIANTS.items()}
+                for name, build in VARIANTS.items():
+                    wall, cpu, peak, queries = self._measure(lambda: build(raspberry, hours, options['theme']), options)
+                    self.stdout.write(f"{hours:>6} h  {name:<9}{wall:>9.2f}{cpu:>9.2f}{peak / 1024:>10.1f}{queries:>10}")
+                if results['avant'] != results['après']:
+                    self.stderr.write(f"Résultats différents pour {hours} h.")
+            self.stdout.write(f"Médianes sur {options['repeat']} requêtes ; construction seule, sans le rendu du gabarit.")
+        finally:
+            if not options['keep']:
+                Raspberry.objects.filter(device_id__startswith=BENCH_PREFIX).delete()
+
+    def _seed(self, options):
+        rng = random.Random(0)
+        step = timedelta(seconds=options['interval'])
+        end = now()
+        count = options['days'] * 86400 // options['interval']
+        raspberry = Raspberry.objects.create(device_id=f"{BENCH_PREFIX}{options['locations']}")
+        locations = [
+            SensorLocation.objects.create(raspberry=raspberry, location_name=f"bench-{i}", soil_moisture=40.0)
+            for i in range(options['locations'])
+        ]
+        for offset in range(0, count, 5000):
+            timestamps = [end - step * i for i in range(offset, min(count, offset + 5000))]
+            with transaction.atomic():
+                Reading.objects.bulk_create([
+                    Reading(raspberry=raspberry, timestamp=timestamp, temperature=round(rng.uniform(10, 35), 1),
+                            air_humidity=round(rng.uniform(30, 90), 1), water_level=round(rng.uniform(0, 100), 1))
+                    for timestamp in timestamps
+                ])
+                SensorData.objects.bulk_create([
+                    SensorData(sensor_location=location, timestamp=timestamp, soil_moisture=round(rng.uniform(0, 100), 1))
+                    for timestamp in timestamps for location in locations
+                ])
+        rollups.rebuild(end - step * count, end + step, raspberry_ids=[raspberry.id])
+        return raspberry
+
+    def _measure(self, build, options):
+        build()  # cache chaud
+        walls, cpus, peaks = [], [], []
+        for _ in range(options['repeat']):
+            started, cpu_started = time.perf_counter(), time.thread_time()
+            build()
+            cpus.append((time.thread_time() - cpu_started) * 1000)
+            walls.append((time.perf_counter() - started) * 1000)
+        # Mesure séparée : tracemalloc ralentit chaque allocation.
+        tracemalloc.start()
+        try:
+            for _ in range(options['repeat']):
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                build()
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        finally:
+            tracemalloc.stop()
+        with CaptureQueriesContext(connection) as queries:
+            build()
+        return statistics.median(walls), statistics.median(cpus), statistics.median(peaks), len(queries)
@@ -0,0 +1,157 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import Length
+from django.utils.timezone import now, timedelta
+
+from Website import chunks
+from Website.models import Raspberry, Reading, ReadingChunk, SensorData, SensorLocation, SoilMoistureChunk
+
+BENCH_PREFIX = 'bench-chunk-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le stockage en lignes (Reading/SensorData) et le moteur 'chunks' (Website/chunks.py) "
+        "sur le même historique généré : octets par relevé et latence de lecture d'une période pour un "
+        "emplacement. Sous PostgreSQL, la taille sur disque (tables, index et TOAST) est mesurée en plus "
+        "des octets utiles. Les données de test sont supprimées à la fin sauf avec --keep."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locations', type=int, default=4, help="Nombre d'emplacements.")
+        parser.add_argument('--days', type=int, default=7, help="Profondeur de l'historique (jours).")
+        parser.add_argument('--interval', type=int, default=60, help="Intervalle entre deux relevés (secondes).")
+        parser.add_argument('--hours', type=int, default=24, help="Période lue par la mesure de latence.")
+        parser.add_argument('--repeat', type=int, default=5, help="Nombre d'exécutions mesurées par lecture.")
+        parser.add_argument('--keep', action='store_true', help="Garde les données de test.")
+
+    def handle(self, *args, **options):
+        Raspberry.objects.filter(device_id__startswith=BENCH_PREFIX).delete()
+        try:
+            sizes_before = self._disk_sizes()
+            rows_raspberry, rows_location = self._seed(options, 'rows')
+            sizes_rows = self._disk_sizes()
+            chunks_raspberry, chunks_location = self._seed(options, 'chunks')
+            sizes_chunks = self._disk_sizes()
+
+            count = options['days'] * 86400 // options['interval']
+            values = count * (1 + options['locations'])
+            self.stdout.write(f"{count} relevés, {options['locations']} emplacements ({values} valeurs de lignes).")
+            self.stdout.write(f"{'Stockage':<10}{'octets utiles/relevé':>24}{'octets sur disque/relevé':>28}")
+            payload = {
+                'rows': self._row_payload(rows_raspberry),
+                'chunks': self._chunk_payload(chunks_raspberry),
+            }
+            disk = {'rows': None, 'chunks': None}
+            if sizes_before is not None:
+                disk['rows'] = sum(sizes_rows[table] - sizes_before[table] for table in sizes_before)
+                disk['chunks'] = sum(sizes_chunks[table] - sizes_rows[table] for table in sizes_before)
+            for engine in ('rows', 'chunks'):
+                on_disk = f"{disk[engine] / count:.1f}" if disk[engine] is not None else 'n/a'
+                self.stdout.write(f"{engine:<10}{payload[engine] / count:>24.1f}{on_disk:>28}")
+
+            end = now()
+            start = end - timedelta(hours=options['hours'])
+            timings = {
+                'rows': self._time(options, lambda: self._read_rows(rows_raspberry, rows_location, start, end)),
+                'chunks': self._time(options, lambda: self._read_chunks(chunks_raspberry, chunks_location, start, end)),
+            }
+            self.stdout.write(f"Lecture de {options['hours']} h (mesures communes et humidité du sol d'un emplacement) :")
+            for engine, (median, best, read) in timings.items():
+                self.stdout.write(f"{engine:<10}{median:>10.2f} ms (meilleure {best:.2f} ms), {read} relevés")
+        finally:
+            if not options['keep']:
+                Raspberry.objects.filter(device_id__startswith=BENCH_PREFIX).delete()
+
+    def _seed(self, options, engine):
+        rng = random.Random(0)
+        step = timedelta(seconds=options['interval'])
+        end = now()
+        count = options['days'] * 86400 // options['interval']
+        raspberry = Raspberry.objects.create(device_id=f"{BENCH_PREFIX}{engine}")
+        locations = [
+            SensorLocation.objects.create(raspberry=raspberry, location_name=f"bench-{i}")
+            for i in range(options['locations'])
+        ]
+        for offset in range(0, count, 5000):
+            timestamps = [end - step * i for i in range(offset, min(count, offset + 5000))]
+            readings = [
+                Reading(raspberry=raspberry, timestamp=timestamp, temperature=round(rng.uniform(10, 35), 1),
+                        air_humidity=round(rng.uniform(30, 90), 1), water_level=round(rng.uniform(0, 100), 1))
+                for timestamp in timestamps
+            ]
+            soil = [
+                SensorData(sensor_location=location, timestamp=timestamp, soil_moisture=round(rng.uniform(0, 100), 1))
+                for timestamp in timestamps for location in locations
+            ]
+            with transaction.atomic():
+                if engine == 'rows':
+                    Reading.objects.bulk_create(readings)
+                    SensorData.objects.bulk_create(soil)
+                else:
+                    chunks.append(ReadingChunk, readings)
+                    chunks.append(SoilMoistureChunk, soil)
+        return raspberry, locations[0]
+
+    def _row_payload(self, raspberry):
+        # id, clé étrangère et timestamp sur 8 octets, mesures en double precision.
+        readings = Reading.objects.filter(raspberry=raspberry).count() * 8 * (3 + 3)
+        soil = SensorData.objects.filter(sensor_location__raspberry=raspberry).count() * 8 * (3 + 1)
+        return readings + soil
+
+    def _chunk_payload(self, raspberry):
+        total = 0
+        for model, owner in ((ReadingChunk, {'raspberry': raspberry}), (SoilMoistureChunk, {'sensor_location__raspberry': raspberry})):
+            blobs = model.objects.filter(**owner).aggregate(
+                timestamps=Sum(Length('timestamps')), data=Sum(Length('data'))
+            )
+            # id, clé étrangère, chunk_start, count et last_timestamp en plus des deux tableaux compressés.
+            total += (blobs['timestamps'] or 0) + (blobs['data'] or 0) + model.objects.filter(**owner).count() * 8 * 5
+        return total
+
+    def _disk_sizes(self):
+        """Taille sur disque (octets) de chaque table concernée, partitions comprises ; None hors PostgreSQL."""
+        if connection.vendor != 'postgresql':
+            return None
+        sizes = {}
+        with connection.cursor() as cursor:
+            for model in (Reading, SensorData, ReadingChunk, SoilMoistureChunk):
+                table = connection.ops.quote_name(model._meta.db_table)
+                cursor.execute(
+                    "SELECT pg_total_relation_size(to_regclass(%s)) + COALESCE(("
+                    "SELECT sum(pg_total_relation_size(inhrelid)) FROM pg_inherits WHERE inhparent = to_regclass(%s)"
+                    "), 0)",
+                    [table, table]
+                )
+                sizes[model._meta.db_table] = cursor.fetchone()[0]
+        return sizes
+
+    def _read_rows(self, raspberry, location, start, end):
+        readings = list(
+            Reading.objects.filter(raspberry=raspberry, timestamp__gte=start, timestamp__lt=end)
+            .values_list('timestamp', 'temperature', 'air_humidity', 'water_level')
+        )
+        soil = list(
+            SensorData.objects.filter(sensor_location=location, timestamp__gte=start, timestamp__lt=end)
+            .values_list('timestamp', 'soil_moisture')
+        )
+        return len(readings)
+
+    def _read_chunks(self, raspberry, location, start, end):
+        readings = chunks.read(ReadingChunk, [raspberry.id], start, end)
+        chunks.read(SoilMoistureChunk, [location.id], start, end)
+        return len(readings[raspberry.id][0]) if readings else 0
+
+    def _time(self, options, read):
+        read()  # cache chaud
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            count = read()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), min(timings), count
@@ -0,0 +1,123 @@
+import copy
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.utils.timezone import now, timedelta
+
+from Website.db_pool import pool_stats
+from Website.ingest import store_readings
+from Website.models import Raspberry
+
+BENCH_PREFIX = 'bench-conn-'
+MODES = ['close', 'persistent', 'pool']
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure la latence d'une réception de relevés (store_readings dans le cycle d'une requête : "
+        "connexions fermées ou rendues à la fin) pour chaque mode de connexion : 'close' (nouvelle "
+        "connexion et authentification à chaque requête), 'persistent' (CONN_MAX_AGE) et 'pool' "
+        "(pool psycopg, DB_POOL). PostgreSQL uniquement. Les Raspberry de test sont supprimés à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES, help="Modes mesurés.")
+        parser.add_argument('--requests', type=int, default=500, help="Nombre de réceptions par mode.")
+        parser.add_argument('--threads', type=int, default=1, help="Réceptions simultanées (threads).")
+        parser.add_argument('--locations', type=int, default=3, help="Nombre d'emplacements par relevé.")
+
+    def handle(self, *args, **options):
+        if connections[DEFAULT_DB_ALIAS].vendor != 'postgresql':
+            raise CommandError("Le pool de connexions nécessite PostgreSQL (psycopg 3).")
+
+        original = connections.settings[DEFAULT_DB_ALIAS]
+        connections[DEFAULT_DB_ALIAS].close()
+        connections[DEFAULT_DB_ALIAS].close_pool()
+        self.stdout.write(f"{'mode':<12}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  pool")
+        try:
+            for mode in options['modes']:
+                self._use(self._settings(original, mode))
+                try:
+                    self._measure(mode, options)
+                finally:
+                    connections[DEFAULT_DB_ALIAS].close()
+                    connections[DEFAULT_DB_ALIAS].close_pool()
+        finally:
+            self._use(original)
+            Raspberry.objects.filter(device_id__startswith=BENCH_PREFIX).delete()
+
+    def _settings(self, original, mode):
+        database = copy.deepcopy(original)
+        database['OPTIONS'].pop('pool', None)
+        database.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+        if mode == 'persistent':
+            database.update(CONN_MAX_AGE=settings.DB_CONN_MAX_AGE, CONN_HEALTH_CHECKS=True)
+        elif mode == 'pool':
+            from psycopg_pool import ConnectionPool
+
+            database['OPTIONS']['pool'] = {
+                'min_size': min(settings.DB_POOL['MIN_SIZE'], settings.DB_POOL['MAX_SIZE']),
+                'max_size': settings.DB_POOL['MAX_SIZE'],
+                'timeout': settings.DB_POOL['TIMEOUT'],
+                'check': ConnectionPool.check_connection,
+            }
+        return database
+
+    def _use(self, database):
+        # Les threads créent leur connexion depuis connections.settings ; le thread courant la remplace ici.
+        connections.settings[DEFAULT_DB_ALIAS] = database
+        connections[DEFAULT_DB_ALIAS] = connections.create_connection(DEFAULT_DB_ALIAS)
+
+    def _measure(self, mode, options):
+        locations = [{'location_name': f"bench-{i}", 'soil_moisture': 40.0} for i in range(options['locations'])]
+        counter = iter(range(options['requests']))
+        lock = threading.Lock()
+
+        def request(n):
+            # Comme une requête HTTP : close_old_connections() sur request_started puis request_finished.
+            close_old_connections()
+            started = time.perf_counter()
+            store_readings(f"{BENCH_PREFIX}{n % 10}", [{
+                'timestamp': now() - timedelta(microseconds=n),
+                'locations': locations,
+                'temperature': 21.0,
+                'air_humidity': 55.0,
+                'water_level': 80.0,
+            }])
+            close_old_connections()
+            return time.perf_counter() - started
+
+        def worker():
+            latencies = []
+            try:
+                while True:
+                    with lock:
+                        n = next(counter, None)
+                    if n is None:
+                        return latencies
+                    latencies.append(request(n))
+            finally:
+                connections.close_all()
+
+        for n in range(10):
+            request(options['requests'] + n)  # crée les Raspberry et emplacements de test hors mesure
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            results = [executor.submit(worker) for _ in range(options['threads'])]
+            latencies = sorted(latency for result in results for latency in result.result())
+        elapsed = time.perf_counter() - started
+
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        line = (
+            f"{mode:<12}{len(latencies) / elapsed:>8.1f}{quantiles[49] * 1000:>9.2f}"
+            f"{quantiles[94] * 1000:>9.2f}{quantiles[98] * 1000:>9.2f}"
+        )
+        if mode == 'pool':
+            stats = pool_stats(connections[DEFAULT_DB_ALIAS].pool)
+            line += f"  {stats['size']}/{stats['max_size']} connexions, attente moyenne {stats['avg_wait_ms']:.2f} ms"
+        self.stdout.write(line)
@@ -0,0 +1,61 @@
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from Website.timeseries import downsample
+
+
+def stride(x, y, max_points):
+    """Ancienne réduction des graphiques : un point sur step (ids[::step])."""
+    step = max(1, len(x) // max_points)
+    return x[::step], y[::step]
+
+
+def bucket_means(x, y, max_points):
+    """Moyenne de chaque créneau de durée fixe, comme bucketed() (Website/timeseries.py)."""
+    buckets = np.minimum(((x - x[0]) / (x[-1] - x[0]) * max_points).astype(np.int64), max_points - 1)
+    counts = np.bincount(buckets, minlength=max_points)
+    sums = np.bincount(buckets, weights=y, minlength=max_points)
+    present = counts > 0
+    edges = np.arange(max_points) * (x[-1] - x[0]) / max_points + x[0]
+    return edges[present], sums[present] / counts[present]
+
+
+METHODS = {'lttb': downsample, 'stride': stride, 'moyennes': bucket_means}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare la réduction LTTB des séries des graphiques (Website/timeseries.py) à l'ancien "
+        "échantillonnage un point sur n et aux moyennes par créneau, sur des séries générées de "
+        "10 000 à 10 millions de points contenant des pics isolés : durée et pics conservés."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 10_000_000],
+                            help="Nombre de points des séries générées.")
+        parser.add_argument('--points', type=int, default=200, help="Nombre de points gardés.")
+        parser.add_argument('--spikes', type=int, default=20, help="Nombre de pics isolés par série.")
+        parser.add_argument('--repeat', type=int, default=3, help="Nombre d'exécutions mesurées.")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        self.stdout.write(f"{'points':>10}  " + ''.join(f"{name:>26}" for name in METHODS))
+        for size in options['sizes']:
+            x = 1.7e9 + np.arange(size, dtype=np.float64) * 60
+            y = 20 + 5 * np.sin(np.arange(size) / (size / 7)) + rng.normal(0, 0.3, size)
+            spikes = rng.choice(size, options['spikes'], replace=False)
+            y[spikes] += 15
+            line = f"{size:>10}  "
+            for method in METHODS.values():
+                timings = []
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    _, values = method(x, y, options['points'])
+                    timings.append((time.perf_counter() - started) * 1000)
+                kept = int(np.sum(values > 30))
+                line += f"{statistics.median(timings):>12.2f} ms {kept:>3}/{len(spikes)} pics"
+            self.stdout.write(line)
+        self.stdout.write(f"Médiane sur {options['repeat']} exécutions ; pic conservé = valeur > 30 dans la série réduite.")
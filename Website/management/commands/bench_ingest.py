@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now, timedelta
+
+from Website.ingest import store_readings
+from Website.models import Raspberry
+from Website.registry import registry
+
+BENCH_DEVICE = 'bench-device'
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le nombre de requêtes SQL par réception de données, registre d'identifiants "
+        "vide puis chaud. Le Raspberry de test et ses données sont supprimés à la fin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locations', type=int, default=5, help="Nombre d'emplacements par relevé.")
+        parser.add_argument('--iterations', type=int, default=20, help="Nombre de réceptions mesurées.")
+
+    def handle(self, *args, **options):
+        locations = [{'location_name': f"bench-{i}", 'soil_moisture': 40.0} for i in range(options['locations'])]
+        iterations = options['iterations']
+
+        try:
+            store_readings(BENCH_DEVICE, [self._reading(locations, 0)])
+            cold = self._count_queries(locations, iterations, clear=True)
+            warm = self._count_queries(locations, iterations, clear=False)
+        finally:
+            Raspberry.objects.filter(device_id=BENCH_DEVICE).delete()
+
+        self.stdout.write(f"Emplacements par relevé : {len(locations)}")
+        self.stdout.write(f"Requêtes par réception (registre vide)  : {cold:.1f}")
+        self.stdout.write(f"Requêtes par réception (registre chaud) : {warm:.1f}")
+
+    def _count_queries(self, locations, iterations, clear):
+        total = 0
+        for i in range(iterations):
+            if clear:
+                registry.clear()
+            with CaptureQueriesContext(connection) as queries:
+                store_readings(BENCH_DEVICE, [self._reading(locations, i + 1)])
+            total += len(queries)
+        return total / iterations
+
+    def _reading(self, locations, offset):
+        return {
+            'timestamp': now() - timedelta(seconds=offset),
+            'locations': locations,
+            'temperature': 21.0,
+            'air_humidity': 55.0,
+            'water_level': 80.0,
+        }
@@ -0,0 +1,87 @@
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now, timedelta
+
+from Website.ingest import encrypt_payload
+from Website.keyring import keyring
+
+
+class Command(BaseCommand):
+    help = (
+        "Envoie des relevés chiffrés en parallèle à un serveur en fonctionnement (ex. daphne Eden.asgi:application) "
+        "et mesure débit et latences pour plusieurs niveaux de concurrence. Lancer une fois avec INGEST_VIEW=sync "
+        "puis avec INGEST_VIEW=async côté serveur pour comparer les deux vues. Le serveur doit tourner avec "
+        "INGEST_RATE_LIMIT_ENABLED=0 ADMISSION_CONTROL_ENABLED=0 : sinon les refus 429 et 503 (comptés à part) "
+        "mesurent les limites et non la capacité."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/sensor-data/', help="URL de réception.")
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50, 100, 200],
+                            help="Niveaux de connexions simultanées à tester.")
+        parser.add_argument('--requests', type=int, default=1000, help="Nombre de requêtes par niveau.")
+        parser.add_argument('--devices', type=int, default=20, help="Nombre de Raspberry simulés.")
+        parser.add_argument('--timeout', type=float, default=30, help="Délai maximal d'une requête (secondes).")
+
+    def handle(self, *args, **options):
+        aesgcm = keyring.legacy_cipher()
+        self.stdout.write(
+            f"{'concurrence':>11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'429':>6} {'503':>6} {'erreurs':>8}"
+        )
+        limited = 0
+        for concurrency in options['concurrency']:
+            bodies = [self._body(aesgcm, i, options['devices']) for i in range(options['requests'])]
+            started = time.monotonic()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                results = list(pool.map(lambda body: self._post(options['url'], body, options['timeout']), bodies))
+            elapsed = time.monotonic() - started
+
+            latencies = sorted(latency for code, latency in results if code in (201, 202))
+            throttled = sum(1 for code, _ in results if code == 429)
+            unavailable = sum(1 for code, _ in results if code == 503)
+            errors = len(results) - len(latencies) - throttled - unavailable
+            limited += throttled + unavailable
+            if latencies:
+                quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+                p50, p95, p99 = quantiles[49], quantiles[94], quantiles[98]
+            else:
+                p50 = p95 = p99 = float('nan')
+            self.stdout.write(
+                f"{concurrency:>11} {len(latencies) / elapsed:>8.1f} {p50 * 1000:>8.1f} "
+                f"{p95 * 1000:>8.1f} {p99 * 1000:>8.1f} {throttled:>6} {unavailable:>6} {errors:>8}"
+            )
+        if limited:
+            self.stdout.write(self.style.WARNING(
+                f"{limited} envois refusés (429/503) : relancer le serveur avec "
+                "INGEST_RATE_LIMIT_ENABLED=0 ADMISSION_CONTROL_ENABLED=0 pour mesurer sa capacité."
+            ))
+
+    def _body(self, aesgcm, i, devices):
+        reading = {
+            'timestamp': (now() - timedelta(milliseconds=i)).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            'raspberry': {'device_name': f"bench-http-{i % devices}"},
+            'locations': [{'location_name': f"loc-{n}", 'soil_moisture': 40.0} for n in range(3)],
+            'temperature': 21.0,
+            'air_humidity': 55.0,
+            'water_level': 80.0,
+        }
+        return json.dumps({'encrypted': encrypt_payload(aesgcm, reading)}).encode('utf-8')
+
+    def _post(self, url, body, timeout):
+        request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+        started = time.monotonic()
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+                code = response.status
+        except urllib.error.HTTPError as e:
+            code = e.code
+        except (urllib.error.URLError, OSError):
+            code = None
+        return code, time.monotonic() - started
@@ -0,0 +1,165 @@
+import os
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils.timezone import now, timedelta
+
+from Website.models import Raspberry, Reading, SensorData, SensorLocation
+from Website.rollups import READING_METRICS
+from Website.timeseries import Epoch, bucket_queryset, bucket_seconds
+
+BENCH_PREFIX = 'bench-query-'
+
+
+def view_queries(raspberry, hours):
+    """Les requêtes des vues, construites comme dans Website/views."""
+    end_time = now()
+    start_time = end_time - timedelta(hours=hours)
+    sensor_locations = SensorLocation.objects.filter(raspberry=raspberry)
+    readings = Reading.objects.filter(raspberry=raspberry, timestamp__gte=start_time)
+    period_readings = readings.filter(timestamp__lte=end_time)
+    period_soil = SensorData.objects.filter(sensor_location__in=sensor_locations, timestamp__range=(start_time, end_time))
+    chart_seconds = bucket_seconds(start_time, end_time, settings.CHARTS['MAX_POINTS'])
+    api_seconds = bucket_seconds(start_time, end_time, settings.SENSOR_DATA_API['DEFAULT_POINTS'])
+    return {
+        'graph_readings': bucket_queryset(period_readings, READING_METRICS, chart_seconds),
+        'graph_soil': bucket_queryset(period_soil, ['soil_moisture'], chart_seconds, group_by=['sensor_location_id']),
+        'graph_readings_lttb': (
+            period_readings.annotate(epoch=Epoch('timestamp')).order_by('timestamp')
+            .values_list('epoch', 'temperature', 'air_humidity', 'water_level')
+        ),
+        'graph_soil_lttb': (
+            period_soil.annotate(epoch=Epoch('timestamp')).order_by('timestamp')
+            .values_list('sensor_location_id', 'epoch', 'soil_moisture')
+        ),
+        'graph_latest': readings.order_by('-timestamp')[:1],
+        'api_readings': bucket_queryset(period_readings, READING_METRICS, api_seconds),
+        'api_soil': bucket_queryset(period_soil, ['soil_moisture'], api_seconds, group_by=['sensor_location_id']),
+        'statuses': Raspberry.objects.filter(active=True).annotate(last_data=Max('readings__timestamp')),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Insère un volume réaliste de relevés pour des Raspberry de test puis mesure les requêtes de "
+        "lecture des pages (graphiques, API des dernières données, page des statuts) : plan EXPLAIN ANALYZE "
+        "et latence, sans puis avec les index de séries temporelles (contraintes uniques "
+        "(emplacement|Raspberry, timestamp) et index BRIN). PostgreSQL uniquement ; à lancer sur une base "
+        "de test : la mesure « sans index » les supprime dans une transaction annulée ensuite, ce qui "
+        "verrouille les tables pendant la mesure. Les Raspberry de test sont supprimés à la fin sauf avec --keep."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--raspberries', type=int, default=10, help="Nombre de Raspberry de test.")
+        parser.add_argument('--locations', type=int, default=4, help="Nombre d'emplacements par Raspberry.")
+        parser.add_argument('--days', type=int, default=30, help="Profondeur de l'historique inséré (jours).")
+        parser.add_argument('--interval', type=int, default=60, help="Intervalle entre deux relevés (secondes).")
+        parser.add_argument('--hours', type=int, default=24, help="Période affichée par les graphiques mesurés.")
+        parser.add_argument('--repeat', type=int, default=5, help="Nombre d'exécutions mesurées par requête.")
+        parser.add_argument('--plans-dir', help="Répertoire où écrire les plans (<requête>-<variante>.txt).")
+        parser.add_argument('--skip-before', action='store_true', help="Ne mesure que la variante avec index.")
+        parser.add_argument('--keep', action='store_true', help="Garde les données de test (réutilisées au prochain lancement).")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("EXPLAIN ANALYZE et les index BRIN nécessitent PostgreSQL.")
+
+        try:
+            raspberry = self._seed(options)
+            with connection.cursor() as cursor:
+                for model in (Reading, SensorData):
+                    cursor.execute(f"ANALYZE {connection.ops.quote_name(model._meta.db_table)}")
+
+            results = {}
+            if not options['skip_before']:
+                with transaction.atomic():
+                    self._drop_time_series_indexes()
+                    results['sans index'] = self._measure(raspberry, options, 'before')
+                    transaction.set_rollback(True)
+            results['avec index'] = self._measure(raspberry, options, 'after')
+        finally:
+            if not options['keep']:
+                Raspberry.objects.filter(device_id__startswith=BENCH_PREFIX).delete()
+
+        variants = list(results)
+        self.stdout.write(f"{'Requête':<24}" + ''.join(f"{variant:>22}" for variant in variants))
+        for name in results[variants[-1]]:
+            line = f"{name:<24}"
+            for variant in variants:
+                median, best = results[variant][name]
+                line += f"{median:>12.2f} ms ({best:.2f})"
+            self.stdout.write(line)
+        self.stdout.write(f"Médiane (meilleure) sur {options['repeat']} exécutions.")
+
+    def _seed(self, options):
+        """Crée les Raspberry de test et leur historique, sauf s'ils existent déjà (--keep précédent)."""
+        rng = random.Random(0)
+        step = timedelta(seconds=options['interval'])
+        end = now()
+        count = options['days'] * 86400 // options['interval']
+        started = time.monotonic()
+        inserted = 0
+        first = None
+        for n in range(options['raspberries']):
+            raspberry, created = Raspberry.objects.get_or_create(device_id=f"{BENCH_PREFIX}{n}")
+            first = first or raspberry
+            if not created:
+                continue
+            locations = [
+                SensorLocation.objects.create(raspberry=raspberry, location_name=f"bench-{i}")
+                for i in range(options['locations'])
+            ]
+            for offset in range(0, count, 5000):
+                timestamps = [end - step * i for i in range(offset, min(count, offset + 5000))]
+                with transaction.atomic():
+                    Reading.objects.bulk_create([
+                        Reading(raspberry=raspberry, timestamp=timestamp, temperature=rng.uniform(10, 35),
+                                air_humidity=rng.uniform(30, 90), water_level=rng.uniform(0, 100))
+                        for timestamp in timestamps
+                    ], ignore_conflicts=True)
+                    SensorData.objects.bulk_create([
+                        SensorData(sensor_location=location, timestamp=timestamp, soil_moisture=rng.uniform(0, 100))
+                        for timestamp in timestamps for location in locations
+                    ], ignore_conflicts=True)
+                inserted += len(timestamps)
+        if inserted:
+            self.stdout.write(
+                f"{inserted} relevés ({inserted * (1 + options['locations'])} lignes) insérés "
+                f"en {time.monotonic() - started:.1f} s."
+            )
+        return first
+
+    def _drop_time_series_indexes(self):
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for model in (Reading, SensorData):
+                table = quote(model._meta.db_table)
+                for constraint in model._meta.constraints:
+                    cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {quote(constraint.name)}")
+                for index in model._meta.indexes:
+                    cursor.execute(f"DROP INDEX IF EXISTS {quote(index.name)}")
+
+    def _measure(self, raspberry, options, variant):
+        results = {}
+        for name, queryset in view_queries(raspberry, options['hours']).items():
+            list(queryset.all())  # cache chaud
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = (statistics.median(timings), min(timings))
+
+            plan = queryset.explain(analyze=True, buffers=True)
+            if options['plans_dir']:
+                os.makedirs(options['plans_dir'], exist_ok=True)
+                with open(os.path.join(options['plans_dir'], f"{name}-{variant}.txt"), 'w') as f:
+                    f.write(plan + '\n')
+            if options['verbosity'] > 1:
+                self.stdout.write(f"--- {name} ({variant})\n{plan}\n")
+        return results
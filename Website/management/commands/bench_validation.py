@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now, timedelta
+
+from Website.serializers import IncomingDataSerializer
+from Website.validation import validate_reading
+
+TIMESTAMP_FORMATS = [
+    '%d/%m/%Y %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%fZ',
+    '%Y-%m-%dT%H:%M:%S.%f%z',
+    '%Y-%m-%dT%H:%M:%S%z',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le temps par relevé du validateur rapide (Website/validation.py) et des serializers DRF. "
+        "L'équivalence des deux (données validées et erreurs, sur des relevés aléatoires) est vérifiée "
+        "par les tests (python manage.py test Website)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000, help="Nombre de relevés validés par mesure.")
+        parser.add_argument('--locations', type=int, default=3, help="Nombre d'emplacements par relevé.")
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        base = now()
+        readings = [
+            {
+                'timestamp': (base - timedelta(seconds=i)).strftime(TIMESTAMP_FORMATS[i % len(TIMESTAMP_FORMATS)]),
+                'raspberry': {'device_name': 'bench'},
+                'locations': [{'location_name': f"loc-{n}", 'soil_moisture': 40.5} for n in range(options['locations'])],
+                'temperature': 21.5,
+                'air_humidity': 55,
+                'water_level': 80.25,
+                'seq': i,
+            }
+            for i in range(iterations)
+        ]
+
+        drf = self._measure(readings, lambda reading: IncomingDataSerializer(data=reading).is_valid())
+        fast = self._measure(readings, lambda reading: validate_reading(reading, with_device=True))
+        self.stdout.write(f"Serializer DRF      : {drf * 1e6:8.1f} µs/relevé")
+        self.stdout.write(f"Validateur rapide   : {fast * 1e6:8.1f} µs/relevé  (x{drf / fast:.1f})")
+
+    def _measure(self, readings, validate):
+        started = time.process_time()
+        for reading in readings:
+            validate(reading)
+        return (time.process_time() - started) / len(readings)
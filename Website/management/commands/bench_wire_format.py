@@ -0,0 +1,69 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now, timedelta
+
+from Website.ingest import NONCE_SIZE, encrypt_payload, open_binary_envelope, open_envelope
+from Website.keyring import keyring
+from Website.telemetry import encode_readings
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare l'enveloppe JSON/base64 et le format binaire (Website/telemetry.py) : "
+        "octets transmis et temps CPU serveur (déchiffrement, décodage, validation) par relevé. "
+        "N'écrit rien en base."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 500],
+                            help="Nombre de relevés par envoi.")
+        parser.add_argument('--locations', type=int, default=3, help="Nombre d'emplacements par relevé.")
+        parser.add_argument('--iterations', type=int, default=200, help="Nombre de décodages mesurés par format.")
+
+    def handle(self, *args, **options):
+        aesgcm = keyring.legacy_cipher()
+        iterations = options['iterations']
+        self.stdout.write(
+            f"{'relevés':>8} {'JSON o/relevé':>14} {'bin o/relevé':>13} {'JSON µs/relevé':>15} {'bin µs/relevé':>14}"
+        )
+        for size in options['batch_sizes']:
+            readings = [self._reading(i, options['locations']) for i in range(size)]
+            batch = size > 1
+            json_body = json.dumps({'encrypted': encrypt_payload(aesgcm, self._json_payload(readings, batch))}).encode('utf-8')
+            binary_body = self._binary_body(aesgcm, readings, batch)
+
+            json_cpu = self._measure(iterations, lambda: open_envelope(
+                aesgcm, None, json.loads(json_body)['encrypted'], 'bench'))
+            binary_cpu = self._measure(iterations, lambda: open_binary_envelope(aesgcm, None, binary_body, 'bench'))
+            self.stdout.write(
+                f"{size:>8} {len(json_body) / size:>14.1f} {len(binary_body) / size:>13.1f} "
+                f"{json_cpu * 1e6 / size:>15.1f} {binary_cpu * 1e6 / size:>14.1f}"
+            )
+
+    def _measure(self, iterations, decode):
+        started = time.process_time()
+        for _ in range(iterations):
+            decode()
+        return (time.process_time() - started) / iterations
+
+    def _json_payload(self, readings, batch):
+        serialized = [dict(r, timestamp=r['timestamp'].strftime('%Y-%m-%dT%H:%M:%S.%fZ')) for r in readings]
+        if batch:
+            return {'raspberry': {'device_name': 'bench-wire'}, 'readings': serialized}
+        return dict(serialized[0], raspberry={'device_name': 'bench-wire'})
+
+    def _binary_body(self, aesgcm, readings, batch):
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + aesgcm.encrypt(nonce, encode_readings(readings, 'bench-wire', batch=batch), None)
+
+    def _reading(self, i, locations):
+        return {
+            'timestamp': now() - timedelta(seconds=i),
+            'locations': [{'location_name': f"loc-{n}", 'soil_moisture': 40.5} for n in range(locations)],
+            'temperature': 21.25,
+            'air_humidity': 55.5,
+            'water_level': 80.0,
+        }
@@ -0,0 +1,77 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now, timedelta
+
+from Website.management.commands.bench_sensor_queries import view_queries
+from Website.models import Raspberry
+from Website.partitions import PARTITIONED_MODELS, add_months, is_partitioned, month_start, partitions
+
+# Requêtes bornées par timestamp : seules les partitions de la période doivent être lues.
+TIME_BOUNDED = (
+    'graph_readings', 'graph_soil', 'graph_readings_lttb', 'graph_soil_lttb', 'graph_latest', 'api_readings', 'api_soil',
+)
+
+
+def scanned_partitions(queryset):
+    """Tables lues par queryset d'après EXPLAIN (ANALYZE, FORMAT JSON), sans celles jamais exécutées."""
+    plan = json.loads(queryset.explain(format='json', analyze=True))
+    return sorted(set(_relations(plan[0]['Plan'])))
+
+
+def _relations(node):
+    if node.get('Relation Name') and node.get('Actual Loops', 1) > 0:
+        yield node['Relation Name']
+    for child in node.get('Plans', []):
+        yield from _relations(child)
+
+
+def expired_partitions(first_month):
+    """Partitions mensuelles entièrement antérieures à first_month."""
+    return {
+        name for model in PARTITIONED_MODELS
+        for month, name in partitions(model._meta.db_table).items() if add_months(month, 1) <= first_month
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie l'élagage des partitions : exécute avec EXPLAIN (ANALYZE, FORMAT JSON) les requêtes des "
+        "graphiques et de l'API sur --hours heures et échoue si une partition entièrement antérieure à la "
+        "période est lue. Les partitions écartées à l'exécution (« never executed ») ne comptent pas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--raspberry', type=int, help="Raspberry utilisé (premier Raspberry actif par défaut).")
+        parser.add_argument('--hours', type=int, default=24, help="Période affichée par les graphiques vérifiés.")
+
+    def handle(self, *args, **options):
+        if not all(is_partitioned(model._meta.db_table) for model in PARTITIONED_MODELS):
+            raise CommandError("SensorData et Reading ne sont pas partitionnées (PostgreSQL, migration 0021).")
+
+        raspberries = Raspberry.objects.filter(active=True)
+        if options['raspberry']:
+            raspberries = Raspberry.objects.filter(id=options['raspberry'])
+        raspberry = raspberries.order_by('id').first()
+        if raspberry is None:
+            raise CommandError("Aucun Raspberry à utiliser.")
+
+        first_month = month_start(now() - timedelta(hours=options['hours']))
+        expired = expired_partitions(first_month)
+        failures = 0
+        queries = view_queries(raspberry, options['hours'])
+        for name in TIME_BOUNDED:
+            scanned = scanned_partitions(queries[name])
+            pruned = [relation for relation in scanned if relation in expired]
+            self.stdout.write(f"{name:<24} partitions lues : {', '.join(scanned) or '-'}")
+            if pruned:
+                failures += 1
+                self.stderr.write(f"{name} lit des partitions hors période : {', '.join(pruned)}")
+
+        if failures:
+            raise CommandError(f"{failures} requêtes sur {len(TIME_BOUNDED)} ne sont pas élaguées.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Élagage vérifié : aucune partition antérieure au {first_month:%Y-%m-%d} n'est lue "
+            f"({len(expired)} partitions plus anciennes)."
+        ))
+
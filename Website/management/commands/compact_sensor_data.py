@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils.timezone import now, timedelta
+
+from Website.chunks import chunk_start, compact
+from Website.models import Raspberry, Reading, SensorData
+
+
+class Command(BaseCommand):
+    help = (
+        "Moteur de stockage 'chunks' : déplace les lignes Reading et SensorData plus anciennes que "
+        "--older-than-hours dans les chunks compressés (Website/chunks.py), par tranches d'un jour. "
+        "À lancer après le passage de SENSOR_DATA_STORAGE['ENGINE'] à 'chunks' pour convertir l'historique. "
+        "Les chunks ne conservent pas soil_moisture_probes : les lignes SensorData qui en ont restent dans la table, "
+        "sauf avec --discard-probes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-hours', type=int, default=1, help="Âge minimal des lignes converties.")
+        parser.add_argument('--raspberry', type=int, action='append', dest='raspberries', help="Limite à ce Raspberry (id, répétable).")
+        parser.add_argument(
+            '--discard-probes', action='store_true',
+            help="Convertit aussi les lignes SensorData avec soil_moisture_probes ; les valeurs par sonde sont perdues.",
+        )
+
+    def handle(self, *args, **options):
+        if settings.SENSOR_DATA_STORAGE['ENGINE'] != 'chunks':
+            raise CommandError("Le moteur de stockage n'est pas 'chunks' (SENSOR_DATA_STORAGE['ENGINE']).")
+
+        # Borne alignée sur un chunk : celui en cours d'écriture n'est pas concerné.
+        cutoff = chunk_start(now() - timedelta(hours=options['older_than_hours']))
+        raspberries = Raspberry.objects.order_by('id')
+        if options['raspberries']:
+            raspberries = raspberries.filter(id__in=options['raspberries'])
+
+        keep_probes = not options['discard_probes']
+        total = 0
+        for raspberry in raspberries:
+            soil = SensorData.objects.filter(sensor_location__raspberry=raspberry, timestamp__lt=cutoff)
+            firsts = [
+                Reading.objects.filter(raspberry=raspberry, timestamp__lt=cutoff).aggregate(first=Min('timestamp'))['first'],
+                (soil.filter(soil_moisture_probes__isnull=True) if keep_probes else soil)
+                .aggregate(first=Min('timestamp'))['first'],
+            ]
+            firsts = [first for first in firsts if first is not None]
+            if not firsts:
+                continue
+            moved = 0
+            start = chunk_start(min(firsts))
+            while start < cutoff:
+                end = min(start + timedelta(days=1), cutoff)
+                moved += compact(raspberry.id, start, end, keep_probes)
+                start = end
+            total += moved
+            kept = soil.filter(soil_moisture_probes__isnull=False).count() if keep_probes else 0
+            self.stdout.write(
+                f"{raspberry.device_id} : {moved} lignes converties"
+                + (f", {kept} lignes avec valeurs par sonde conservées." if kept else ".")
+            )
+        self.stdout.write(self.style.SUCCESS(f"{total} lignes antérieures au {cutoff:%Y-%m-%d %H:%M} converties en chunks."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Website.keyring import derive_device_key, rotate_device_key
+from Website.models import Raspberry
+
+
+class Command(BaseCommand):
+    help = (
+        "Affiche l'identifiant de clé et la clé AES à installer sur un Raspberry. "
+        "Avec --rotate, génère d'abord une nouvelle clé (l'ancienne reste valide pendant DEVICE_KEY_GRACE_HOURS)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('device_id', help="device_id du Raspberry.")
+        parser.add_argument('--rotate', action='store_true', help="Génère une nouvelle clé pour ce Raspberry.")
+
+    def handle(self, *args, **options):
+        try:
+            raspberry = Raspberry.objects.get(device_id=options['device_id'])
+        except Raspberry.DoesNotExist:
+            raise CommandError(f"Raspberry inconnu : {options['device_id']}")
+
+        if options['rotate']:
+            rotate_device_key(raspberry)
+            self.stdout.write(self.style.WARNING(
+                f"Nouvelle clé générée. L'ancienne ({raspberry.previous_api_token}) reste valide pendant la période de grâce."
+            ))
+
+        self.stdout.write(f"key_id : {raspberry.api_token}")
+        self.stdout.write(f"clé    : {derive_device_key(raspberry.api_token).hex()}")
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now
+
+from Website.partitions import add_months, drop_partitions_before, month_start
+
+
+class Command(BaseCommand):
+    help = (
+        "Rétention de l'historique : supprime les partitions mensuelles de SensorData et Reading "
+        "antérieures aux RETENTION_MONTHS derniers mois (mois courant compris), sans DELETE ligne à ligne."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-months', type=int, default=settings.SENSOR_DATA_PARTITIONS['RETENTION_MONTHS'],
+            help="Nombre de mois conservés, mois courant compris (SENSOR_DATA_PARTITIONS['RETENTION_MONTHS'] par défaut)."
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Affiche les partitions concernées sans les supprimer.")
+
+    def handle(self, *args, **options):
+        months = options['retention_months']
+        if not months or months < 1:
+            raise CommandError("Aucune durée de rétention : utilisez --retention-months ou SENSOR_DATA_PARTITIONS['RETENTION_MONTHS'].")
+
+        cutoff = add_months(month_start(now()), 1 - months)
+        dropped = drop_partitions_before(cutoff, dry_run=options['dry_run'])
+        for name in dropped:
+            self.stdout.write(f"Partition {'à supprimer' if options['dry_run'] else 'supprimée'} : {name}")
+        summary = f"{len(dropped)} partitions antérieures au {cutoff:%Y-%m-%d}"
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary} à supprimer." if options['dry_run'] else f"{summary} supprimées."
+        ))
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from Website.partitions import ensure_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Crée les partitions mensuelles de SensorData et Reading pour le mois courant et les "
+        "MONTHS_AHEAD mois suivants (SENSOR_DATA_PARTITIONS). À lancer au démarrage et chaque jour (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead', type=int, default=settings.SENSOR_DATA_PARTITIONS['MONTHS_AHEAD'],
+            help="Nombre de mois à venir couverts par une partition."
+        )
+
+    def handle(self, *args, **options):
+        created = ensure_partitions(options['months_ahead'])
+        for name in created:
+            self.stdout.write(f"Partition créée : {name}")
+        self.stdout.write(self.style.SUCCESS(f"{len(created)} partitions créées."))
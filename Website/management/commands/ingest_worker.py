@@ -0,0 +1,44 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import InterfaceError, OperationalError, close_old_connections
+
+from Website.ingest import drain
+from Website.ingest_queue import get_queue
+
+logger = logging.getLogger('Website')
+
+
+class Command(BaseCommand):
+    help = "Vide la file d'attente de réception (INGEST_MODE = 'queue') par lots et les écrit en base."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.INGEST_WORKER_BATCH_SIZE,
+                            help="Nombre maximal de messages écrits par lot.")
+        parser.add_argument('--max-age', type=float, default=settings.INGEST_WORKER_MAX_AGE,
+                            help="Attente maximale (secondes) pour compléter un lot.")
+        parser.add_argument('--stats-interval', type=float, default=60,
+                            help="Intervalle (secondes) entre deux journalisations des métriques de la file.")
+        parser.add_argument('--once', action='store_true', help="Traite un seul lot puis s'arrête.")
+
+    def handle(self, *args, **options):
+        queue = get_queue()
+        next_stats = 0
+        while True:
+            close_old_connections()
+            try:
+                processed = drain(queue, options['batch_size'], options['max_age'])
+            except (OperationalError, InterfaceError) as e:
+                logger.error(f"Database unavailable in ingest worker, retrying: {e}")
+                time.sleep(options['max_age'])
+                continue
+
+            if processed:
+                logger.debug(f"Ingest worker stored {processed} messages.")
+            if time.monotonic() >= next_stats:
+                logger.info(f"Ingest queue stats: {queue.stats()}")
+                next_stats = time.monotonic() + options['stats_interval']
+            if options['once']:
+                return
@@ -0,0 +1,50 @@
+from datetime import datetime, time as dt_time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.timezone import now
+
+from Website.models import Reading, SensorData
+from Website.rollups import rebuild
+
+
+def local_date(value):
+    try:
+        return timezone.make_aware(datetime.combine(datetime.strptime(value, '%Y-%m-%d').date(), dt_time.min))
+    except ValueError:
+        raise CommandError(f"Date invalide (AAAA-MM-JJ attendu) : {value}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les agrégats horaires et journaliers depuis les données brutes : tout l'historique "
+        "après la mise en place des agrégats ou un backfill, ou une période précise avec --since/--until "
+        "(jours entiers, heure locale). Les agrégats de la période sont remplacés."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=local_date, help="Premier jour recalculé (AAAA-MM-JJ, défaut : plus ancien relevé).")
+        parser.add_argument('--until', type=local_date, help="Jour suivant le dernier jour recalculé (AAAA-MM-JJ, défaut : maintenant).")
+        parser.add_argument('--raspberry', type=int, action='append', dest='raspberries', help="Limite à ce Raspberry (id, répétable).")
+
+    def handle(self, *args, **options):
+        start, end = options['since'], options['until'] or now()
+        if start is None:
+            bounds = [
+                model.objects.aggregate(first=Min('timestamp'), last=Max('timestamp'))
+                for model in (Reading, SensorData)
+            ]
+            firsts = [bound['first'] for bound in bounds if bound['first']]
+            if not firsts:
+                self.stdout.write("Aucune donnée brute : rien à recalculer.")
+                return
+            start = min(firsts)
+            end = max([end] + [bound['last'] + timedelta(microseconds=1) for bound in bounds if bound['last']])
+        if start >= end:
+            raise CommandError("--since doit précéder --until.")
+
+        written = rebuild(start, end, raspberry_ids=options['raspberries'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{written} créneaux recalculés du {timezone.localtime(start):%Y-%m-%d} au {timezone.localtime(end):%Y-%m-%d}."
+        ))
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.timezone import now, timedelta
+
+from Website.rollups import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les agrégats horaires des dernières heures aux données brutes et recalcule les jours qui "
+        "diffèrent (relevés écrits hors de l'ingestion, par exemple par backfill_sensor_data). À lancer "
+        "périodiquement (cron) ; la fenêtre doit rester plus courte que la rétention des données brutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=48, help="Période vérifiée, en heures avant maintenant.")
+
+    def handle(self, *args, **options):
+        if not settings.ROLLUPS['ENABLED']:
+            raise CommandError("Les agrégats sont désactivés (ROLLUPS['ENABLED']).")
+        if options['hours'] < 1:
+            raise CommandError("--hours doit être positif.")
+
+        end = now()
+        days = reconcile(end - timedelta(hours=options['hours']), end)
+        for raspberry_id, day in days:
+            self.stdout.write(f"Raspberry {raspberry_id} : agrégats du {day:%Y-%m-%d} recalculés.")
+        self.stdout.write(self.style.SUCCESS(f"{len(days)} jours recalculés."))
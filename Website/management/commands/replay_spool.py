@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Website.ingest import store_spooled
+from Website.spool import get_spool
+
+
+class Command(BaseCommand):
+    help = (
+        "Rejoue en base les relevés du tampon disque (INGEST_SPOOL). Avec --recover, reprend aussi les "
+        "segments laissés ouverts par un processus arrêté : à lancer avant le démarrage du serveur."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recover', action='store_true',
+                            help="Rejoue aussi les segments .open et .replaying (aucun autre processus ne doit écrire).")
+
+    def handle(self, *args, **options):
+        spool = get_spool()
+        if spool is None:
+            raise CommandError("Le tampon disque est désactivé (INGEST_SPOOL['ENABLED']).")
+        if options['recover']:
+            spool.recover()
+        replayed = spool.replay(store_spooled)
+        self.stdout.write(self.style.SUCCESS(f"{replayed} relevés rejoués."))
+        self.stdout.write(f"État du tampon : {spool.stats()}")
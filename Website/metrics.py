@@ -0,0 +1,22 @@
+import logging
+
+logger = logging.getLogger('Website')
+
+_providers = {}
+
+
+def register(name, provider):
+    """Enregistre une fonction sans argument qui retourne un dictionnaire de métriques."""
+    _providers[name] = provider
+
+
+def collect():
+    """Métriques de tous les fournisseurs enregistrés (valeurs propres au processus courant, sauf indication contraire)."""
+    result = {}
+    for name, provider in _providers.items():
+        try:
+            result[name] = provider()
+        except Exception as e:
+            logger.exception(f"Error collecting metrics '{name}': {e}")
+            result[name] = {'error': str(e)}
+    return result
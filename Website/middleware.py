@@ -1,24 +1,81 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 
+from .admission import get_controller
+from .replicas import PIN_COOKIE, replica_alias
+
 import logging
 logger = logging.getLogger(__name__)
 
-class DisableCSRFForAPI:
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
+# MiddlewareMixin gère les vues synchrones et asynchrones : un middleware
+# uniquement synchrone forcerait Django à exécuter les vues async dans un thread.
+class DisableCSRFForAPI(MiddlewareMixin):
+    def process_request(self, request):
         if request.path.startswith('/api/'):
             setattr(request, '_dont_enforce_csrf_checks', True)
-        return self.get_response(request)
 
 
-class SkipLoginForAPI:
+class SkipLoginForAPI(MiddlewareMixin):
+    def process_request(self, request):
+        if request.path.startswith('/api/'):
+            request.user = None
+
+
+class ReplicaPinMiddleware(MiddlewareMixin):
+    """
+    Après une modification envoyée par le navigateur (POST d'un formulaire, toggle_device), garde
+    ses lectures sur la base principale pendant READ_REPLICA['PIN_SECONDS'] secondes (voir Website/replicas.py).
+    """
+    def process_response(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and replica_alias() and not request.path_info.startswith('/api/'):
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.READ_REPLICA['PIN_SECONDS'], httponly=True, samesite='Lax')
+        return response
+
+
+class AdmissionControlMiddleware:
+    """
+    Limite les requêtes simultanées par classe de route (voir Website/admission.py) pour
+    que la réception des données reste servie quand le tableau de bord est surchargé.
+    """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.enabled = settings.ADMISSION_CONTROL.get('ENABLED')
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        if request.path.startswith('/api/'):
-            request.user = None
-        return self.get_response(request)
+        if self.async_mode:
+            return self.__acall__(request)
+        admission_class = self.enabled and get_controller().classify(request)
+        if not admission_class:
+            return self.get_response(request)
+        if not admission_class.acquire():
+            return self._reject(admission_class, request)
+        try:
+            response = self.get_response(request)
+        finally:
+            admission_class.release()
+        get_controller().remember(admission_class, request, response)
+        return response
+
+    async def __acall__(self, request):
+        admission_class = self.enabled and get_controller().classify(request)
+        if not admission_class:
+            return await self.get_response(request)
+        if not await admission_class.aacquire():
+            return self._reject(admission_class, request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            admission_class.release()
+        get_controller().remember(admission_class, request, response)
+        return response
 
+    def _reject(self, admission_class, request):
+        logger.warning(f"Admission refused for {request.method} {request.path} ({admission_class.name} class saturated).")
+        return get_controller().reject(admission_class, request)
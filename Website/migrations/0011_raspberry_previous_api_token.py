@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Website', '0010_alter_sensorlocation_plant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='raspberry',
+            name='api_token_rotated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='raspberry',
+            name='previous_api_token',
+            field=models.UUIDField(blank=True, editable=False, help_text='Ancien jeton, encore accepté pendant la période de grâce', null=True),
+        ),
+    ]
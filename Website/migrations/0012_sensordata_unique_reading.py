@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:18
+
+from django.db import migrations, models
+
+CHUNK_SIZE = 5000
+
+
+def remove_duplicate_readings(apps, schema_editor):
+    """
+    Garde, pour chaque (sensor_location, timestamp), la ligne la plus ancienne.
+    Les lignes à supprimer sont repérées en un seul parcours par emplacement, puis
+    supprimées par paquets de CHUNK_SIZE, chacun dans sa propre transaction (migration
+    non atomique). La réception doit être arrêtée pendant la migration : un doublon
+    arrivé après le parcours ferait échouer AddConstraint (relancer migrate suffit).
+    """
+    SensorData = apps.get_model('Website', 'SensorData')
+    location_ids = list(SensorData.objects.order_by().values_list('sensor_location_id', flat=True).distinct())
+    for location_id in location_ids:
+        rows = SensorData.objects.filter(sensor_location_id=location_id).order_by('timestamp', 'id')
+        ids = []
+        previous = None
+        for row_id, timestamp in rows.values_list('id', 'timestamp').iterator(chunk_size=CHUNK_SIZE):
+            if timestamp == previous:
+                ids.append(row_id)
+            previous = timestamp
+        for offset in range(0, len(ids), CHUNK_SIZE):
+            SensorData.objects.filter(id__in=ids[offset:offset + CHUNK_SIZE]).delete()
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('Website', '0011_raspberry_previous_api_token'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_readings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='sensordata',
+            constraint=models.UniqueConstraint(fields=('sensor_location', 'timestamp'), name='unique_reading_per_location'),
+        ),
+    ]
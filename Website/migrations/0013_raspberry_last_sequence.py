@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Website', '0012_sensordata_unique_reading'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='raspberry',
+            name='last_sequence',
+            field=models.BigIntegerField(blank=True, editable=False, help_text="Plus grand numéro de séquence enregistré (reprise d'envoi)", null=True),
+        ),
+    ]
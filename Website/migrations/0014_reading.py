@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Website', '0013_raspberry_last_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reading',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('temperature', models.FloatField(blank=True, null=True)),
+                ('air_humidity', models.FloatField(blank=True, null=True)),
+                ('water_level', models.FloatField(blank=True, null=True)),
+                ('raspberry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='readings', to='Website.raspberry')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('raspberry', 'timestamp'), name='unique_reading_per_raspberry')],
+            },
+        ),
+    ]
@@ -0,0 +1,66 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+CHUNK_SIZE = 10000
+
+
+def copy_device_metrics(apps, schema_editor):
+    """
+    Crée une ligne Reading par (Raspberry, timestamp) à partir des copies présentes sur
+    chaque ligne SensorData. Parcours par paquets de CHUNK_SIZE identifiants, chacun dans
+    sa propre transaction (migration non atomique) : la table reste utilisable pendant la copie.
+    """
+    SensorData = apps.get_model('Website', 'SensorData')
+    Reading = apps.get_model('Website', 'Reading')
+    last_id = 0
+    while True:
+        rows = list(
+            SensorData.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'sensor_location__raspberry_id', 'timestamp', 'temperature', 'air_humidity', 'water_level')
+            [:CHUNK_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        readings = {}
+        for _, raspberry_id, timestamp, temperature, air_humidity, water_level in rows:
+            readings.setdefault((raspberry_id, timestamp), Reading(
+                raspberry_id=raspberry_id, timestamp=timestamp, temperature=temperature,
+                air_humidity=air_humidity, water_level=water_level
+            ))
+        Reading.objects.bulk_create(readings.values(), ignore_conflicts=True)
+
+
+def restore_device_metrics(apps, schema_editor):
+    SensorData = apps.get_model('Website', 'SensorData')
+    SensorLocation = apps.get_model('Website', 'SensorLocation')
+    Reading = apps.get_model('Website', 'Reading')
+    for location_id, raspberry_id in SensorLocation.objects.values_list('id', 'raspberry_id'):
+        reading = Reading.objects.filter(raspberry_id=raspberry_id, timestamp=OuterRef('timestamp'))
+        last_id = 0
+        while True:
+            ids = list(
+                SensorData.objects.filter(sensor_location_id=location_id, id__gt=last_id)
+                .order_by('id').values_list('id', flat=True)[:CHUNK_SIZE]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            SensorData.objects.filter(id__in=ids).update(
+                temperature=Subquery(reading.values('temperature')[:1]),
+                air_humidity=Subquery(reading.values('air_humidity')[:1]),
+                water_level=Subquery(reading.values('water_level')[:1]),
+            )
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('Website', '0014_reading'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_device_metrics, restore_device_metrics),
+    ]
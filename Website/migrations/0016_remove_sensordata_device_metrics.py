@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:36
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Website', '0015_copy_device_metrics_to_reading'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='sensordata',
+            name='air_humidity',
+        ),
+        migrations.RemoveField(
+            model_name='sensordata',
+            name='temperature',
+        ),
+        migrations.RemoveField(
+            model_name='sensordata',
+            name='water_level',
+        ),
+    ]
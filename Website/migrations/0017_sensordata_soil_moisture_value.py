@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+import Website.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Website', '0016_remove_sensordata_device_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sensordata',
+            name='soil_moisture_value',
+            field=models.FloatField(blank=True, null=True, help_text="Humidité du sol (première sonde)"),
+        ),
+        migrations.AddField(
+            model_name='sensordata',
+            name='soil_moisture_probes',
+            field=Website.fields.FloatArrayField(blank=True, null=True, help_text="Valeurs de chaque sonde, pour les emplacements à plusieurs sondes"),
+        ),
+    ]
@@ -0,0 +1,70 @@
+from django.db import migrations
+
+CHUNK_SIZE = 10000
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value == value else None
+
+
+def convert_soil_moisture(apps, schema_editor):
+    """
+    Convertit les valeurs JSON (nombre, ou liste pour un emplacement à plusieurs sondes)
+    en soil_moisture_value (première sonde) et soil_moisture_probes (toutes les sondes).
+    Parcours par paquets de CHUNK_SIZE identifiants, chacun dans sa propre transaction.
+    """
+    SensorData = apps.get_model('Website', 'SensorData')
+    last_id = 0
+    while True:
+        rows = list(
+            SensorData.objects.filter(id__gt=last_id).order_by('id')
+            .only('id', 'soil_moisture')[:CHUNK_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+        for row in rows:
+            value = row.soil_moisture
+            if isinstance(value, list):
+                probes = [number for number in map(_number, value) if number is not None]
+                row.soil_moisture_value = probes[0] if probes else None
+                row.soil_moisture_probes = probes if len(probes) > 1 else None
+            else:
+                row.soil_moisture_value = _number(value)
+                row.soil_moisture_probes = None
+        SensorData.objects.bulk_update(rows, ['soil_moisture_value', 'soil_moisture_probes'])
+
+
+def restore_soil_moisture(apps, schema_editor):
+    SensorData = apps.get_model('Website', 'SensorData')
+    last_id = 0
+    while True:
+        rows = list(
+            SensorData.objects.filter(id__gt=last_id).order_by('id')
+            .only('id', 'soil_moisture_value', 'soil_moisture_probes')[:CHUNK_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+        for row in rows:
+            row.soil_moisture = row.soil_moisture_probes or row.soil_moisture_value
+        SensorData.objects.bulk_update(rows, ['soil_moisture'])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('Website', '0017_sensordata_soil_moisture_value'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_soil_moisture, restore_soil_moisture),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Website', '0018_convert_soil_moisture'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='sensordata',
+            name='soil_moisture',
+        ),
+        migrations.RenameField(
+            model_name='sensordata',
+            old_name='soil_moisture_value',
+            new_name='soil_moisture',
+        ),
+    ]
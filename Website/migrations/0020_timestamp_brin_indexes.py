@@ -0,0 +1,29 @@
+from django.contrib.postgres.indexes import BrinIndex
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Index BRIN sur timestamp, créés avec CREATE INDEX CONCURRENTLY : les tables restent
+    accessibles en écriture pendant la construction (d'où atomic = False).
+    L'index B-tree (sensor_location, timestamp) existe déjà : c'est celui de la contrainte
+    unique_reading_per_location (0012), de même que (raspberry, timestamp) pour Reading.
+    """
+
+    atomic = False
+
+    dependencies = [
+        ('Website', '0019_sensordata_soil_moisture_float'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='sensordata',
+            index=BrinIndex(fields=['timestamp'], name='sensordata_timestamp_brin'),
+        ),
+        AddIndexConcurrently(
+            model_name='reading',
+            index=BrinIndex(fields=['timestamp'], name='reading_timestamp_brin'),
+        ),
+    ]
@@ -0,0 +1,142 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations, transaction
+
+CHUNK_SIZE = 50000
+MONTHS_AHEAD = 3
+
+# Table : (contrainte unique, colonnes), index BRIN, (colonne de clé étrangère, table référencée)
+TABLES = {
+    'Website_sensordata': (
+        ('unique_reading_per_location', ['sensor_location_id', 'timestamp']),
+        'sensordata_timestamp_brin',
+        ('sensor_location_id', 'Website_sensorlocation'),
+    ),
+    'Website_reading': (
+        ('unique_reading_per_raspberry', ['raspberry_id', 'timestamp']),
+        'reading_timestamp_brin',
+        ('raspberry_id', 'Website_raspberry'),
+    ),
+}
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def _rename_structures(cursor, quote, table, suffix):
+    """Libère les noms de la clé primaire, de la contrainte unique et de l'index BRIN de table."""
+    (unique, _), brin, _ = TABLES[table]
+    renamed = quote(f"{table}{suffix}")
+    cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {renamed}")
+    cursor.execute(f"ALTER TABLE {renamed} RENAME CONSTRAINT {quote(f'{table}_pkey')} TO {quote(f'{table}{suffix}_pkey')}")
+    cursor.execute(f"ALTER TABLE {renamed} RENAME CONSTRAINT {quote(unique)} TO {quote(f'{unique}{suffix}')}")
+    cursor.execute(f"ALTER INDEX {quote(brin)} RENAME TO {quote(f'{brin}{suffix}')}")
+
+
+def _add_structures(cursor, quote, table, primary_key):
+    (unique, unique_columns), brin, (fk_column, referenced) = TABLES[table]
+    parent = quote(table)
+    cursor.execute(f"ALTER TABLE {parent} ADD CONSTRAINT {quote(f'{table}_pkey')} PRIMARY KEY ({primary_key})")
+    cursor.execute(
+        f"ALTER TABLE {parent} ADD CONSTRAINT {quote(unique)} "
+        f"UNIQUE ({', '.join(quote(column) for column in unique_columns)})"
+    )
+    cursor.execute(
+        f"ALTER TABLE {parent} ADD CONSTRAINT {quote(f'{table}_{fk_column}_fk')} FOREIGN KEY ({quote(fk_column)}) "
+        f"REFERENCES {quote(referenced)} (id) DEFERRABLE INITIALLY DEFERRED"
+    )
+    cursor.execute(f'CREATE INDEX {quote(brin)} ON {parent} USING brin ("timestamp")')
+
+
+def _copy_rows(connection, source, target):
+    """Copie source dans target par paquets de CHUNK_SIZE identifiants, chacun dans sa propre transaction."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN(id), MAX(id) FROM {source}")
+        low, high = cursor.fetchone()
+    if low is None:
+        return
+    for start in range(low - 1, high, CHUNK_SIZE):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {target} SELECT * FROM {source} WHERE id > %s AND id <= %s ON CONFLICT DO NOTHING",
+                [start, start + CHUNK_SIZE]
+            )
+
+
+def partition_tables(apps, schema_editor):
+    """
+    Remplace SensorData et Reading par des tables partitionnées par mois sur timestamp.
+    L'échange des tables est atomique (verrou bref) ; les relevés existants sont ensuite
+    recopiés par paquets pendant que les nouveaux relevés arrivent dans la nouvelle table.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    quote = connection.ops.quote_name
+    for table in TABLES:
+        legacy, parent = quote(f"{table}_legacy"), quote(table)
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            _rename_structures(cursor, quote, table, '_legacy')
+            cursor.execute(f"SELECT MIN(\"timestamp\"), COALESCE(MAX(id), 0) FROM {legacy}")
+            oldest, last_id = cursor.fetchone()
+            cursor.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+            cursor.execute(f"ALTER TABLE {legacy} ALTER COLUMN id DROP DEFAULT")
+            cursor.execute(f"DROP SEQUENCE IF EXISTS {quote(f'{table}_id_seq')}")
+
+            cursor.execute(f'CREATE TABLE {parent} (LIKE {legacy}) PARTITION BY RANGE ("timestamp")')
+            sequence = quote(f"{table}_id_seq")
+            cursor.execute(f"CREATE SEQUENCE {sequence} OWNED BY {parent}.id")
+            cursor.execute("SELECT setval(%s, %s, false)", [sequence, last_id + 1])
+            cursor.execute(f"ALTER TABLE {parent} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+            # La clé d'une table partitionnée doit contenir la colonne de partitionnement.
+            _add_structures(cursor, quote, table, 'id, "timestamp"')
+
+            cursor.execute(f"CREATE TABLE {quote(f'{table}_default')} PARTITION OF {parent} DEFAULT")
+            now = datetime.now(dt_timezone.utc)
+            month = datetime(now.year, now.month, 1, tzinfo=dt_timezone.utc)
+            if oldest is not None:
+                oldest = oldest.astimezone(dt_timezone.utc)
+                month = min(month, datetime(oldest.year, oldest.month, 1, tzinfo=dt_timezone.utc))
+            while month <= _add_months(now, MONTHS_AHEAD):
+                end = _add_months(month, 1)
+                cursor.execute(
+                    f"CREATE TABLE {quote(f'{table}_p{month:%Y%m}')} PARTITION OF {parent} "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+                )
+                month = end
+
+        _copy_rows(connection, legacy, parent)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {legacy}")
+
+
+def unpartition_tables(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    quote = connection.ops.quote_name
+    for table in TABLES:
+        partitioned, parent = quote(f"{table}_partitioned"), quote(table)
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            _rename_structures(cursor, quote, table, '_partitioned')
+            cursor.execute(f"CREATE TABLE {parent} (LIKE {partitioned} INCLUDING DEFAULTS)")
+            cursor.execute(f"ALTER SEQUENCE {quote(f'{table}_id_seq')} OWNED BY {parent}.id")
+            _add_structures(cursor, quote, table, 'id')
+        _copy_rows(connection, partitioned, parent)
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {partitioned}")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('Website', '0020_timestamp_brin_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Website', '0021_partition_sensor_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(choices=[('hour', 'Heure'), ('day', 'Jour')], max_length=4)),
+                ('bucket', models.DateTimeField(help_text='Début du créneau')),
+                ('value_count', models.IntegerField()),
+                ('value_sum', models.FloatField()),
+                ('value_min', models.FloatField()),
+                ('value_max', models.FloatField()),
+                ('last_value', models.FloatField(help_text='Valeur du relevé le plus récent du créneau')),
+                ('last_timestamp', models.DateTimeField()),
+                ('metric', models.CharField(choices=[('temperature', 'Température'), ('air_humidity', "Humidité de l'air"), ('water_level', "Niveau d'eau")], max_length=16)),
+                ('raspberry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='Website.raspberry')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('raspberry', 'metric', 'grain', 'bucket'), name='unique_reading_rollup')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SoilMoistureRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grain', models.CharField(choices=[('hour', 'Heure'), ('day', 'Jour')], max_length=4)),
+                ('bucket', models.DateTimeField(help_text='Début du créneau')),
+                ('value_count', models.IntegerField()),
+                ('value_sum', models.FloatField()),
+                ('value_min', models.FloatField()),
+                ('value_max', models.FloatField()),
+                ('last_value', models.FloatField(help_text='Valeur du relevé le plus récent du créneau')),
+                ('last_timestamp', models.DateTimeField()),
+                ('sensor_location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='Website.sensorlocation')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('sensor_location', 'grain', 'bucket'), name='unique_soil_moisture_rollup')],
+            },
+        ),
+    ]
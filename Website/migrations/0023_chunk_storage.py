@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Website', '0022_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadingChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_start', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('last_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('timestamps', models.BinaryField(default=b'')),
+                ('data', models.BinaryField(default=b'')),
+                ('raspberry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reading_chunks', to='Website.raspberry')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('raspberry', 'chunk_start'), name='unique_reading_chunk')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SoilMoistureChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chunk_start', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+                ('last_timestamp', models.DateTimeField(blank=True, null=True)),
+                ('timestamps', models.BinaryField(default=b'')),
+                ('data', models.BinaryField(default=b'')),
+                ('sensor_location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='Website.sensorlocation')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('sensor_location', 'chunk_start'), name='unique_soil_moisture_chunk')],
+            },
+        ),
+    ]
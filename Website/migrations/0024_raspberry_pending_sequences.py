@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Website', '0023_chunk_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='raspberry',
+            name='pending_sequences',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Plages [début, fin] de numéros de séquence enregistrés au-delà de last_sequence'),
+        ),
+        migrations.AlterField(
+            model_name='raspberry',
+            name='last_sequence',
+            field=models.BigIntegerField(blank=True, editable=False, help_text="Plus grand numéro de séquence n tel que tous les relevés jusqu'à n sont enregistrés (reprise d'envoi)", null=True),
+        ),
+    ]
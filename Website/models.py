@@ -1,7 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import BrinIndex
 import uuid
 
+from .fields import FloatArrayField
+
 DEFAULT_GROUP_NAME = "Non Assigné"
 
 class Group(models.Model):
@@ -26,6 +29,10 @@ class UserGroup(models.Model):
 class Raspberry(models.Model):
     device_id = models.CharField(max_length=100, unique=True)
     api_token = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    previous_api_token = models.UUIDField(blank=True, null=True, editable=False, help_text="Ancien jeton, encore accepté pendant la période de grâce")
+    api_token_rotated_at = models.DateTimeField(blank=True, null=True, editable=False)
+    last_sequence = models.BigIntegerField(blank=True, null=True, editable=False, help_text="Plus grand numéro de séquence n tel que tous les relevés jusqu'à n sont enregistrés (reprise d'envoi)")
+    pending_sequences = models.JSONField(default=list, blank=True, editable=False, help_text="Plages [début, fin] de numéros de séquence enregistrés au-delà de last_sequence")
     group = models.ForeignKey(Group, on_delete=models.SET_NULL, null=True, related_name='raspberries')
     location_description = models.TextField(blank=True, null=True)
     active = models.BooleanField(default=True)
@@ -64,13 +71,130 @@ class SensorLocation(models.Model):
         plant_name = self.plant.name if self.plant else "Pas de plante assignée"
         return f"{self.location_name} ({plant_name})"
 
-class SensorData(models.Model):
-    sensor_location = models.ForeignKey(SensorLocation, on_delete=models.CASCADE, related_name='sensor_data')
+class Reading(models.Model):
+    """Mesures communes à tout le Raspberry, une ligne par relevé."""
+    raspberry = models.ForeignKey(Raspberry, on_delete=models.CASCADE, related_name='readings')
     timestamp = models.DateTimeField()
     temperature = models.FloatField(blank=True, null=True)
     air_humidity = models.FloatField(blank=True, null=True)
-    soil_moisture = models.JSONField(blank=True, null=True, help_text="Ensemble des valeurs d'humidité du sol")
     water_level = models.FloatField(blank=True, null=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['raspberry', 'timestamp'], name='unique_reading_per_raspberry'),
+        ]
+        indexes = [
+            BrinIndex(fields=['timestamp'], name='reading_timestamp_brin'),
+        ]
+
+    def __str__(self):
+        return f"Reading of {self.raspberry} on {self.timestamp}"
+
+class SensorData(models.Model):
+    """Humidité du sol d'un emplacement ; les mesures communes sont dans Reading (même timestamp)."""
+    sensor_location = models.ForeignKey(SensorLocation, on_delete=models.CASCADE, related_name='sensor_data')
+    timestamp = models.DateTimeField()
+    soil_moisture = models.FloatField(blank=True, null=True, help_text="Humidité du sol (première sonde)")
+    soil_moisture_probes = FloatArrayField(blank=True, null=True, help_text="Valeurs de chaque sonde, pour les emplacements à plusieurs sondes")
+
+    class Meta:
+        constraints = [
+            # Index B-tree (sensor_location, timestamp) utilisé par toutes les lectures des graphiques.
+            models.UniqueConstraint(fields=['sensor_location', 'timestamp'], name='unique_reading_per_location'),
+        ]
+        indexes = [
+            # Un résumé par plage de blocs : index minuscule pour les requêtes par période sur toute la table.
+            BrinIndex(fields=['timestamp'], name='sensordata_timestamp_brin'),
+        ]
+
     def __str__(self):
         return f"Data at {self.sensor_location} on {self.timestamp}"
+
+class Rollup(models.Model):
+    """Agrégats d'une mesure sur un créneau d'une heure ou d'un jour (heure locale) ; moyenne = value_sum / value_count."""
+    HOUR = 'hour'
+    DAY = 'day'
+    GRAIN_CHOICES = [(HOUR, 'Heure'), (DAY, 'Jour')]
+
+    grain = models.CharField(max_length=4, choices=GRAIN_CHOICES)
+    bucket = models.DateTimeField(help_text="Début du créneau")
+    value_count = models.IntegerField()
+    value_sum = models.FloatField()
+    value_min = models.FloatField()
+    value_max = models.FloatField()
+    last_value = models.FloatField(help_text="Valeur du relevé le plus récent du créneau")
+    last_timestamp = models.DateTimeField()
+
+    class Meta:
+        abstract = True
+
+class ReadingRollup(Rollup):
+    """Agrégats horaires et journaliers des mesures communes d'un Raspberry (une ligne par mesure)."""
+    METRIC_CHOICES = [('temperature', 'Température'), ('air_humidity', "Humidité de l'air"), ('water_level', "Niveau d'eau")]
+
+    raspberry = models.ForeignKey(Raspberry, on_delete=models.CASCADE, related_name='rollups')
+    metric = models.CharField(max_length=16, choices=METRIC_CHOICES)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['raspberry', 'metric', 'grain', 'bucket'], name='unique_reading_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} of {self.raspberry} ({self.grain} {self.bucket})"
+
+class SoilMoistureRollup(Rollup):
+    """Agrégats horaires et journaliers de l'humidité du sol d'un emplacement."""
+    sensor_location = models.ForeignKey(SensorLocation, on_delete=models.CASCADE, related_name='rollups')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['sensor_location', 'grain', 'bucket'], name='unique_soil_moisture_rollup'),
+        ]
+
+    def __str__(self):
+        return f"Soil moisture at {self.sensor_location} ({self.grain} {self.bucket})"
+
+class Chunk(models.Model):
+    """
+    Relevés d'un créneau fixe (SENSOR_DATA_STORAGE['CHUNK_SECONDS']) compressés, voir Website/chunks.py :
+    horodatages en deltas de microsecondes, valeurs en tableaux float32 (NaN pour une valeur absente).
+    """
+    chunk_start = models.DateTimeField()
+    count = models.IntegerField(default=0)
+    last_timestamp = models.DateTimeField(blank=True, null=True)
+    timestamps = models.BinaryField(default=b'')
+    data = models.BinaryField(default=b'')
+
+    class Meta:
+        abstract = True
+
+class ReadingChunk(Chunk):
+    """Mesures communes d'un Raspberry (moteur de stockage 'chunks')."""
+    METRICS = ['temperature', 'air_humidity', 'water_level']
+    OWNER = 'raspberry_id'
+
+    raspberry = models.ForeignKey(Raspberry, on_delete=models.CASCADE, related_name='reading_chunks')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['raspberry', 'chunk_start'], name='unique_reading_chunk'),
+        ]
+
+    def __str__(self):
+        return f"Readings of {self.raspberry} from {self.chunk_start}"
+
+class SoilMoistureChunk(Chunk):
+    """Humidité du sol (première sonde) d'un emplacement (moteur de stockage 'chunks')."""
+    METRICS = ['soil_moisture']
+    OWNER = 'sensor_location_id'
+
+    sensor_location = models.ForeignKey(SensorLocation, on_delete=models.CASCADE, related_name='chunks')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['sensor_location', 'chunk_start'], name='unique_soil_moisture_chunk'),
+        ]
+
+    def __str__(self):
+        return f"Soil moisture at {self.sensor_location} from {self.chunk_start}"
@@ -0,0 +1,136 @@
+"""
+Partitions mensuelles de SensorData et Reading (PostgreSQL, SENSOR_DATA_PARTITIONS).
+
+Chaque table est partitionnée par plage sur timestamp : une partition par mois (bornes
+en UTC) nommée <table>_pAAAAMM, et une partition par défaut <table>_default qui reçoit
+les relevés hors des partitions existantes (horloge d'un Raspberry déréglée). Les
+partitions des mois à venir sont créées à l'avance par ensure_partitions() ; la rétention
+supprime des partitions entières (drop_partitions_before) au lieu d'exécuter DELETE.
+"""
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from .models import Reading, SensorData
+
+PARTITIONED_MODELS = (SensorData, Reading)
+
+
+def month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def is_partitioned(table):
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [connection.ops.quote_name(table)]
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions(table):
+    """Partitions mensuelles de table : {premier jour du mois (UTC): nom}, la partition par défaut exclue."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s)",
+            [connection.ops.quote_name(table)]
+        )
+        names = [name for (name,) in cursor.fetchall()]
+    months = {}
+    for name in names:
+        match = re.fullmatch(re.escape(table) + r'_p(\d{4})(\d{2})', name)
+        if match:
+            months[datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)] = name
+    return months
+
+
+def create_partition(table, month):
+    """
+    Crée la partition du mois. Les relevés du mois déjà rangés dans la partition par
+    défaut y sont déplacés (la partition par défaut est détachée le temps du déplacement).
+    """
+    quote = connection.ops.quote_name
+    start, end = month, add_months(month, 1)
+    parent, partition, default = quote(table), quote(partition_name(table, month)), quote(default_partition_name(table))
+    # Bornes en littéraux : une instruction DDL n'accepte pas de paramètres.
+    create = (
+        f"CREATE TABLE {partition} PARTITION OF {parent} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    in_range = '"timestamp" >= %s AND "timestamp" < %s'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_range})", [start, end])
+        if not cursor.fetchone()[0]:
+            cursor.execute(create)
+            return
+        cursor.execute(f"ALTER TABLE {parent} DETACH PARTITION {default}")
+        cursor.execute(create)
+        cursor.execute(f"INSERT INTO {parent} SELECT * FROM {default} WHERE {in_range}", [start, end])
+        cursor.execute(f"DELETE FROM {default} WHERE {in_range}", [start, end])
+        cursor.execute(f"ALTER TABLE {parent} ATTACH PARTITION {default} DEFAULT")
+
+
+def ensure_partitions(months_ahead, now=None):
+    """Crée les partitions manquantes du mois courant et des months_ahead mois suivants ; retourne leurs noms."""
+    current = month_start(now or datetime.now(dt_timezone.utc))
+    created = []
+    for model in PARTITIONED_MODELS:
+        table = model._meta.db_table
+        if not is_partitioned(table):
+            continue
+        existing = partitions(table)
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if month not in existing:
+                create_partition(table, month)
+                created.append(partition_name(table, month))
+    return created
+
+
+def drop_partitions_before(cutoff, dry_run=False):
+    """
+    Supprime les partitions dont tous les relevés sont antérieurs au mois de cutoff, et
+    les relevés correspondants de la partition par défaut. Retourne les partitions supprimées.
+    """
+    quote = connection.ops.quote_name
+    limit = month_start(cutoff)
+    dropped = []
+    for model in PARTITIONED_MODELS:
+        table = model._meta.db_table
+        if not is_partitioned(table):
+            continue
+        for month, name in sorted(partitions(table).items()):
+            if add_months(month, 1) > limit:
+                continue
+            dropped.append(name)
+            if dry_run:
+                continue
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}")
+                cursor.execute(f"DROP TABLE {quote(name)}")
+        if not dry_run:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {quote(default_partition_name(table))} WHERE "timestamp" < %s', [limit]
+                )
+    return dropped
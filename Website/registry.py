@@ -0,0 +1,199 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from . import metrics
+from .models import Group, Raspberry, SensorLocation, DEFAULT_GROUP_NAME
+
+
+class LRUCache:
+    """Cache borné, thread-safe, qui évince l'entrée la moins récemment utilisée."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._data[key]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def discard_where(self, predicate):
+        with self._lock:
+            for key in [k for k, v in self._data.items() if predicate(k, v)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class IdentityRegistry:
+    """
+    Résout les identifiants utilisés à chaque réception de données sans aller en base :
+    device_name -> id du Raspberry, (raspberry_id, location_name) -> id du SensorLocation.
+    En cas d'absence, la base est interrogée (et les lignes créées si besoin).
+    L'état renvoyé au Raspberry (pompe, ventilateur) est aussi gardé DEVICE_STATE_TTL secondes.
+    Les entrées sont invalidées par les signaux de Website/signals.py.
+    """
+
+    def __init__(self, maxsize):
+        self.devices = LRUCache(maxsize)
+        self.locations = LRUCache(maxsize)
+        self.states = LRUCache(maxsize)
+
+    def raspberry_id(self, device_name):
+        raspberry_id = self.devices.get(device_name)
+        if raspberry_id is not None:
+            return raspberry_id
+
+        raspberry_id = Raspberry.objects.filter(device_id=device_name).values_list('id', flat=True).first()
+        if raspberry_id is None:
+            group, _ = Group.objects.get_or_create(
+                name=DEFAULT_GROUP_NAME,
+                defaults={'description': "Default group for unassigned Raspberries."}
+            )
+            raspberry, _ = Raspberry.objects.get_or_create(
+                device_id=device_name,
+                defaults={'group': group, 'active': True, 'status': 'unassigned'}
+            )
+            raspberry_id = raspberry.id
+
+        # Une ligne créée dans une transaction annulée ne doit pas rester en cache.
+        transaction.on_commit(lambda: self.devices.set(device_name, raspberry_id))
+        return raspberry_id
+
+    def location_ids(self, raspberry_id, location_names):
+        """Retourne {location_name: id}, en créant en bloc les emplacements inconnus."""
+        ids = {}
+        missing = set()
+        for name in location_names:
+            location_id = self.locations.get((raspberry_id, name))
+            if location_id is None:
+                missing.add(name)
+            else:
+                ids[name] = location_id
+        if not missing:
+            return ids
+
+        found = dict(
+            SensorLocation.objects.filter(raspberry_id=raspberry_id, location_name__in=missing)
+            .values_list('location_name', 'id')
+        )
+        created = missing - found.keys()
+        if created:
+            SensorLocation.objects.bulk_create(
+                [SensorLocation(raspberry_id=raspberry_id, location_name=name) for name in created],
+                ignore_conflicts=True
+            )
+            found.update(
+                SensorLocation.objects.filter(raspberry_id=raspberry_id, location_name__in=created)
+                .values_list('location_name', 'id')
+            )
+
+        def remember():
+            for name, location_id in found.items():
+                self.locations.set((raspberry_id, name), location_id)
+        transaction.on_commit(remember)
+
+        ids.update(found)
+        return ids
+
+    def device_state(self, raspberry_id):
+        """État renvoyé au Raspberry après réception de ses données."""
+        entry = self.states.get(raspberry_id)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+
+        raspberry = Raspberry.objects.select_related('group').get(id=raspberry_id)
+        return self._remember_state(raspberry)
+
+    async def adevice_state(self, raspberry_id):
+        """Version asynchrone de device_state() pour la vue ASGI."""
+        entry = self.states.get(raspberry_id)
+        if entry is not None and entry[1] > time.monotonic():
+            return entry[0]
+
+        raspberry = await Raspberry.objects.select_related('group').aget(id=raspberry_id)
+        return self._remember_state(raspberry)
+
+    def cached_state(self, raspberry_id):
+        """Dernier état connu, même expiré (base indisponible)."""
+        entry = self.states.get(raspberry_id)
+        return entry[0] if entry is not None else None
+
+    def _remember_state(self, raspberry):
+        state = {
+            'id': raspberry.id,
+            'device_id': raspberry.device_id,
+            'group': raspberry.group.name if raspberry.group else "Non Assigné",
+            'active': raspberry.active,
+            'pump': raspberry.pump_state,
+            'fan': raspberry.fan_state,
+            'last_sequence': raspberry.last_sequence,
+        }
+        # Le TTL borne le délai de prise en compte d'une modification faite par un autre processus.
+        self.states.set(raspberry.id, (state, time.monotonic() + settings.DEVICE_STATE_TTL))
+        return state
+
+    def remember_watermark(self, raspberry_id, watermark):
+        """Reporte dans l'état en cache un last_sequence qui vient d'avancer."""
+        entry = self.states.get(raspberry_id)
+        if entry is None:
+            return
+        state, expires_at = entry
+        if state['last_sequence'] is None or state['last_sequence'] < watermark:
+            self.states.set(raspberry_id, (dict(state, last_sequence=watermark), expires_at))
+
+    def forget_raspberry(self, raspberry_id):
+        self.devices.discard_where(lambda key, value: value == raspberry_id)
+        self.locations.discard_where(lambda key, value: key[0] == raspberry_id)
+        self.states.discard_where(lambda key, value: key == raspberry_id)
+
+    def forget_states(self):
+        self.states.clear()
+
+    def forget_location(self, location_id):
+        self.locations.discard_where(lambda key, value: value == location_id)
+
+    def clear(self):
+        self.devices.clear()
+        self.locations.clear()
+        self.states.clear()
+
+    def stats(self):
+        return {
+            name: {'size': len(cache), 'hits': cache.hits, 'misses': cache.misses}
+            for name, cache in (('devices', self.devices), ('locations', self.locations), ('states', self.states))
+        }
+
+
+registry = IdentityRegistry(settings.INGEST_REGISTRY_SIZE)
+metrics.register('identity_registry', registry.stats)
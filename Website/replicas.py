@@ -0,0 +1,138 @@
+"""
+Lectures sur réplique (READ_REPLICA, routeur ReplicaRouter).
+
+Seules les vues décorées par @use_replica (graphiques, API des dernières données) lisent sur
+l'alias READ_REPLICA['ALIAS'] ; toute autre lecture, et toute écriture, va sur la base
+principale. Pendant une vue décorée, les lectures restent sur la principale si :
+
+- la réplique est en retard de plus de MAX_LAG_SECONDS secondes ou injoignable (retard mesuré
+  au plus toutes les CHECK_INTERVAL secondes par processus) ;
+- une transaction est ouverte sur la principale ;
+- le navigateur vient d'envoyer une modification (formulaire, toggle_device) : ReplicaPinMiddleware
+  pose alors un cookie qui garde ses lectures sur la principale pendant PIN_SECONDS secondes,
+  le temps que la réplique rattrape l'écriture.
+"""
+import functools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from . import metrics
+
+logger = logging.getLogger('Website')
+
+PIN_COOKIE = 'eden_primary'
+
+_reading_from_replica = ContextVar('reading_from_replica', default=False)
+
+
+def replica_alias():
+    """Alias de la réplique, None si elle n'est pas configurée."""
+    alias = settings.READ_REPLICA['ALIAS']
+    return alias if alias in settings.DATABASES else None
+
+
+class ReplicaLag:
+    """Retard de la réplique, mesuré au plus toutes les CHECK_INTERVAL secondes par processus."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked_at = None
+        self.lag = None
+        self.replica_reads = 0
+        self.fallbacks = 0
+
+    def measure(self, alias):
+        """Retard en secondes (0 hors PostgreSQL), None si la réplique est injoignable ou n'a encore rien rejoué."""
+        connection = connections[alias]
+        if connection.vendor != 'postgresql':
+            return 0.0
+        try:
+            with connection.cursor() as cursor:
+                # Réplique à jour (tout le WAL reçu est rejoué, réception en cours) : retard nul même si
+                # la principale n'écrit rien. Réception coupée (ou statut illisible sans pg_read_all_stats) :
+                # le WAL reçu peut être ancien, le retard est mesuré depuis la dernière transaction rejouée.
+                cursor.execute(
+                    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+                    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() "
+                    "AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 0 "
+                    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+                )
+                lag = cursor.fetchone()[0]
+        except DatabaseError as e:
+            logger.warning(f"Read replica '{alias}' unavailable, reading from primary: {e}")
+            connection.close()
+            return None
+        return None if lag is None else float(lag)
+
+    def healthy(self, alias):
+        now = time.monotonic()
+        if self.checked_at is None or now - self.checked_at >= settings.READ_REPLICA['CHECK_INTERVAL']:
+            with self.lock:
+                if self.checked_at is None or now - self.checked_at >= settings.READ_REPLICA['CHECK_INTERVAL']:
+                    self.lag = self.measure(alias)
+                    self.checked_at = now
+                    if self.lag is not None and self.lag > settings.READ_REPLICA['MAX_LAG_SECONDS']:
+                        logger.warning(f"Read replica '{alias}' lagging by {self.lag:.1f} s, reading from primary")
+        return self.lag is not None and self.lag <= settings.READ_REPLICA['MAX_LAG_SECONDS']
+
+    def stats(self):
+        return {
+            'alias': replica_alias(),
+            'lag_seconds': self.lag,
+            'replica_reads': self.replica_reads,
+            'fallbacks': self.fallbacks,
+        }
+
+
+replica_lag = ReplicaLag()
+metrics.register('read_replica', replica_lag.stats)
+
+
+class ReplicaRouter:
+    """Routeur de DATABASE_ROUTERS : lectures des vues @use_replica sur la réplique, le reste sur la principale."""
+
+    def db_for_read(self, model, **hints):
+        if not _reading_from_replica.get():
+            return None
+        alias = replica_alias()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if not replica_lag.healthy(alias):
+            replica_lag.fallbacks += 1
+            return DEFAULT_DB_ALIAS
+        replica_lag.replica_reads += 1
+        return alias
+
+    def db_for_write(self, model, **hints):
+        # Explicite : sans routeur, un objet lu sur la réplique y serait enregistré.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == replica_alias():
+            return False
+        return None
+
+
+def use_replica(view):
+    """Décorateur d'une vue en lecture seule : ses requêtes peuvent être servies par la réplique."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.COOKIES.get(PIN_COOKIE):
+            return view(request, *args, **kwargs)
+        token = _reading_from_replica.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _reading_from_replica.reset(token)
+    return wrapper
@@ -0,0 +1,489 @@
+"""
+Agrégats horaires et journaliers (ReadingRollup, SoilMoistureRollup ; réglages ROLLUPS).
+
+Chaque relevé enregistré par store_readings() est ajouté aux créneaux qui le contiennent
+(record) par un INSERT ... ON CONFLICT DO UPDATE additif : un relevé arrivé en retard met
+à jour le créneau passé auquel il appartient. Les écritures qui ne passent pas par
+store_readings() (backfill_sensor_data, SQL manuel) sont rattrapées par reconcile(), qui
+compare les effectifs horaires aux données brutes et recalcule (rebuild) les jours qui
+diffèrent. Les créneaux suivent l'heure locale (TIME_ZONE), comme Trunc. Les relevés
+archivés (Website/archive.py) ou stockés en chunks (Website/chunks.py) sont inclus dans les
+recalculs et les lectures brutes.
+
+Les graphiques et l'API lisent les agrégats au lieu des données brutes au-delà de
+ROLLUPS['HOURLY_FROM_HOURS'] heures (grain horaire) et ROLLUPS['DAILY_FROM_HOURS'] heures
+(grain journalier).
+"""
+from datetime import timedelta
+from itertools import islice
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, ExpressionWrapper, F, FloatField
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from . import archive, chunks
+from .models import (
+    Raspberry, Reading, ReadingChunk, ReadingRollup, Rollup, SensorData, SensorLocation, SoilMoistureChunk,
+    SoilMoistureRollup,
+)
+from .timeseries import Epoch, bucketed, downsample, merge_bucketed, rollup_bucketed
+
+GRAINS = (Rollup.HOUR, Rollup.DAY)
+READING_METRICS = [metric for metric, _ in ReadingRollup.METRIC_CHOICES]
+STAT_FIELDS = ['value_count', 'value_sum', 'value_min', 'value_max', 'last_value', 'last_timestamp']
+UPSERT_BATCH_SIZE = 500
+REBUILD_WINDOW_DAYS = 31
+POINTS_CHUNK_SIZE = 10000
+
+
+def bucket_start(timestamp, grain):
+    """Début (heure locale) du créneau horaire ou journalier contenant timestamp."""
+    local = timezone.localtime(timestamp)
+    if grain == Rollup.DAY:
+        local = local.replace(hour=0)
+    return local.replace(minute=0, second=0, microsecond=0)
+
+
+def next_day(day):
+    # 26 h tombent toujours le lendemain, y compris les jours de 23 et 25 h (changement d'heure).
+    return bucket_start(day + timedelta(hours=26), Rollup.DAY)
+
+
+def day_bounds(start, end):
+    """Jours entiers (heure locale) qui recouvrent [start, end[."""
+    first = bucket_start(start, Rollup.DAY)
+    last = bucket_start(end, Rollup.DAY)
+    return first, (last if last == end else next_day(last))
+
+
+class Accumulator:
+    """Agrégats en mémoire, par (clé, grain, créneau), avant leur fusion dans une table Rollup."""
+
+    def __init__(self):
+        self.stats = {}
+
+    def add(self, key, timestamp, value):
+        if value is None:
+            return
+        for grain in GRAINS:
+            bucket_key = (*key, grain, bucket_start(timestamp, grain))
+            stats = self.stats.get(bucket_key)
+            if stats is None:
+                self.stats[bucket_key] = [1, value, value, value, value, timestamp]
+                continue
+            stats[0] += 1
+            stats[1] += value
+            stats[2] = min(stats[2], value)
+            stats[3] = max(stats[3], value)
+            if timestamp >= stats[5]:
+                stats[4], stats[5] = value, timestamp
+
+
+def _upsert(model, key_columns, stats):
+    """Fusionne stats dans la table : effectifs et sommes additionnés, extrêmes et dernière valeur comparés."""
+    if not stats:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = [*key_columns, 'grain', 'bucket', *STAT_FIELDS]
+    least, greatest = ('LEAST', 'GREATEST') if connection.vendor == 'postgresql' else ('MIN', 'MAX')
+
+    def current(column):
+        return f"{table}.{quote(column)}"
+
+    update = ', '.join([
+        f"{quote('value_count')} = {current('value_count')} + EXCLUDED.{quote('value_count')}",
+        f"{quote('value_sum')} = {current('value_sum')} + EXCLUDED.{quote('value_sum')}",
+        f"{quote('value_min')} = {least}({current('value_min')}, EXCLUDED.{quote('value_min')})",
+        f"{quote('value_max')} = {greatest}({current('value_max')}, EXCLUDED.{quote('value_max')})",
+        f"{quote('last_value')} = CASE WHEN EXCLUDED.{quote('last_timestamp')} >= {current('last_timestamp')} "
+        f"THEN EXCLUDED.{quote('last_value')} ELSE {current('last_value')} END",
+        f"{quote('last_timestamp')} = {greatest}({current('last_timestamp')}, EXCLUDED.{quote('last_timestamp')})",
+    ])
+    conflict = ', '.join(quote(column) for column in [*key_columns, 'grain', 'bucket'])
+    row_sql = f"({', '.join(['%s'] * len(columns))})"
+    adapt = connection.ops.adapt_datetimefield_value
+    rows = [
+        [*key[:-1], adapt(key[-1]), *values[:5], adapt(values[5])]
+        for key, values in sorted(stats.items(), key=lambda item: item[0])
+    ]
+    batch_size = UPSERT_BATCH_SIZE
+    if connection.features.max_query_params:
+        batch_size = min(batch_size, connection.features.max_query_params // len(columns))
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), batch_size):
+            batch = rows[offset:offset + batch_size]
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(quote(column) for column in columns)}) "
+                f"VALUES {', '.join([row_sql] * len(batch))} "
+                f"ON CONFLICT ({conflict}) DO UPDATE SET {update}",
+                [param for row in batch for param in row]
+            )
+
+
+def record(readings, soil_rows):
+    """Ajoute aux agrégats des Reading et SensorData qui viennent d'être insérés (dans la même transaction)."""
+    reading_stats = Accumulator()
+    for reading in readings:
+        for metric in READING_METRICS:
+            reading_stats.add((reading.raspberry_id, metric), reading.timestamp, getattr(reading, metric))
+    soil_stats = Accumulator()
+    for row in soil_rows:
+        soil_stats.add((row.sensor_location_id,), row.timestamp, row.soil_moisture)
+    _upsert(ReadingRollup, ['raspberry_id', 'metric'], reading_stats.stats)
+    _upsert(SoilMoistureRollup, ['sensor_location_id'], soil_stats.stats)
+
+
+def rebuild(start, end, raspberry_ids=None):
+    """
+    Recalcule depuis les données brutes les agrégats des jours qui recouvrent [start, end[,
+    Raspberry par Raspberry et par fenêtres de REBUILD_WINDOW_DAYS jours (une transaction
+    chacune). Retourne le nombre de créneaux écrits.
+    """
+    start, end = day_bounds(start, end)
+    raspberries = Raspberry.objects.order_by('id').values_list('id', flat=True)
+    if raspberry_ids is not None:
+        raspberries = raspberries.filter(id__in=raspberry_ids)
+    written = 0
+    for raspberry_id in raspberries:
+        window_start = start
+        while window_start < end:
+            window_end = window_start
+            for _ in range(REBUILD_WINDOW_DAYS):
+                window_end = next_day(window_end)
+                if window_end >= end:
+                    window_end = end
+                    break
+            written += _rebuild_window(raspberry_id, window_start, window_end)
+            window_start = window_end
+    return written
+
+
+def _rebuild_window(raspberry_id, start, end):
+    reading_stats = Accumulator()
+    readings = (
+        Reading.objects.filter(raspberry_id=raspberry_id, timestamp__gte=start, timestamp__lt=end)
+        .values_list('timestamp', *READING_METRICS)
+    )
+    for timestamp, *values in readings.iterator(chunk_size=10000):
+        for metric, value in zip(READING_METRICS, values):
+            reading_stats.add((raspberry_id, metric), timestamp, value)
+    if archive.enabled():
+        for timestamp, *values in archive.iter_rows('readings', raspberry_id, start, end):
+            for metric, value in zip(READING_METRICS, values):
+                reading_stats.add((raspberry_id, metric), timestamp, value)
+    if chunks.enabled():
+        for _, timestamp, values in chunks.iter_rows(ReadingChunk, [raspberry_id], start, end):
+            for metric, value in zip(READING_METRICS, values):
+                reading_stats.add((raspberry_id, metric), timestamp, value)
+    soil_stats = Accumulator()
+    soil = (
+        SensorData.objects.filter(sensor_location__raspberry_id=raspberry_id, timestamp__gte=start, timestamp__lt=end)
+        .values_list('sensor_location_id', 'timestamp', 'soil_moisture')
+    )
+    for location_id, timestamp, value in soil.iterator(chunk_size=10000):
+        soil_stats.add((location_id,), timestamp, value)
+    if archive.enabled():
+        for location_id, timestamp, value, _ in archive.iter_rows('soil', raspberry_id, start, end):
+            soil_stats.add((location_id,), timestamp, value)
+    if chunks.enabled():
+        location_ids = SensorLocation.objects.filter(raspberry_id=raspberry_id).values_list('id', flat=True)
+        for location_id, timestamp, (value,) in chunks.iter_rows(SoilMoistureChunk, list(location_ids), start, end):
+            soil_stats.add((location_id,), timestamp, value)
+
+    with transaction.atomic():
+        ReadingRollup.objects.filter(raspberry_id=raspberry_id, bucket__gte=start, bucket__lt=end).delete()
+        SoilMoistureRollup.objects.filter(
+            sensor_location__raspberry_id=raspberry_id, bucket__gte=start, bucket__lt=end
+        ).delete()
+        _upsert(ReadingRollup, ['raspberry_id', 'metric'], reading_stats.stats)
+        _upsert(SoilMoistureRollup, ['sensor_location_id'], soil_stats.stats)
+    return len(reading_stats.stats) + len(soil_stats.stats)
+
+
+def stale_days(start, end):
+    """
+    Jours de [start, end[ dont un agrégat horaire ne compte pas autant de valeurs que les
+    données brutes (écriture hors store_readings, doublon concurrent) : {(raspberry_id, jour)}.
+    """
+    start, end = day_bounds(start, end)
+    expected = {}
+    hour = Trunc('timestamp', 'hour')
+    readings = (
+        Reading.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        .annotate(hour=hour).values('raspberry_id', 'hour')
+        .annotate(**{f"{metric}_count": Count(metric) for metric in READING_METRICS})
+    )
+    for row in readings:
+        for metric in READING_METRICS:
+            if row[f"{metric}_count"]:
+                expected[(row['raspberry_id'], metric, row['hour'])] = row[f"{metric}_count"]
+    soil = (
+        SensorData.objects.filter(timestamp__gte=start, timestamp__lt=end)
+        .annotate(hour=hour).values('sensor_location__raspberry_id', 'sensor_location_id', 'hour')
+        .annotate(soil_count=Count('soil_moisture'))
+    )
+    for row in soil:
+        if row['soil_count']:
+            expected[(row['sensor_location__raspberry_id'], row['sensor_location_id'], row['hour'])] = row['soil_count']
+    if chunks.enabled():
+        for raspberry_id, timestamp, values in chunks.iter_rows(ReadingChunk, None, start, end):
+            for metric, value in zip(READING_METRICS, values):
+                if value is not None:
+                    key = (raspberry_id, metric, bucket_start(timestamp, Rollup.HOUR))
+                    expected[key] = expected.get(key, 0) + 1
+        raspberries = dict(SensorLocation.objects.values_list('id', 'raspberry_id'))
+        for location_id, timestamp, (value,) in chunks.iter_rows(SoilMoistureChunk, None, start, end):
+            if value is not None:
+                key = (raspberries[location_id], location_id, bucket_start(timestamp, Rollup.HOUR))
+                expected[key] = expected.get(key, 0) + 1
+    if archive.enabled():
+        for raspberry_id in Raspberry.objects.values_list('id', flat=True):
+            for timestamp, *values in archive.iter_rows('readings', raspberry_id, start, end):
+                for metric, value in zip(READING_METRICS, values):
+                    if value is not None:
+                        key = (raspberry_id, metric, bucket_start(timestamp, Rollup.HOUR))
+                        expected[key] = expected.get(key, 0) + 1
+            for location_id, timestamp, value, _ in archive.iter_rows('soil', raspberry_id, start, end):
+                if value is not None:
+                    key = (raspberry_id, location_id, bucket_start(timestamp, Rollup.HOUR))
+                    expected[key] = expected.get(key, 0) + 1
+
+    actual = {}
+    hourly = {'grain': Rollup.HOUR, 'bucket__gte': start, 'bucket__lt': end}
+    for raspberry_id, metric, bucket, count in (
+        ReadingRollup.objects.filter(**hourly).values_list('raspberry_id', 'metric', 'bucket', 'value_count')
+    ):
+        actual[(raspberry_id, metric, bucket)] = count
+    for raspberry_id, location_id, bucket, count in (
+        SoilMoistureRollup.objects.filter(**hourly)
+        .values_list('sensor_location__raspberry_id', 'sensor_location_id', 'bucket', 'value_count')
+    ):
+        actual[(raspberry_id, location_id, bucket)] = count
+
+    return {
+        (key[0], bucket_start(key[2], Rollup.DAY))
+        for key in expected.keys() | actual.keys()
+        if expected.get(key) != actual.get(key)
+    }
+
+
+def reconcile(start, end):
+    """Recalcule les jours de [start, end[ dont les agrégats ne correspondent plus aux données brutes ; les retourne."""
+    days = sorted(stale_days(start, end))
+    for raspberry_id, day in days:
+        rebuild(day, next_day(day), raspberry_ids=[raspberry_id])
+    return days
+
+
+def grain_for(start_time, end_time):
+    """Grain des agrégats à lire pour la période, ou None pour lire les données brutes."""
+    config = settings.ROLLUPS
+    if not config['ENABLED']:
+        return None
+    hours = (end_time - start_time).total_seconds() / 3600
+    if hours >= config['DAILY_FROM_HOURS']:
+        return Rollup.DAY
+    if hours >= config['HOURLY_FROM_HOURS']:
+        return Rollup.HOUR
+    return None
+
+
+def reading_series(raspberry, start_time, end_time, seconds):
+    """
+    bucketed() des mesures communes (température, humidité de l'air, niveau d'eau) du Raspberry
+    sur [start_time, end_time], calculé depuis les agrégats pour les longues périodes.
+    """
+    grain = grain_for(start_time, end_time)
+    if grain is None:
+        rows = bucketed(
+            Reading.objects.filter(raspberry=raspberry, timestamp__range=(start_time, end_time)),
+            READING_METRICS, seconds
+        )
+        if archive.enabled():
+            archived = archive.bucketed('readings', raspberry.id, READING_METRICS, start_time, end_time, seconds)
+            rows = merge_bucketed(rows, archived, READING_METRICS)
+        if chunks.enabled():
+            packed = chunks.bucketed(ReadingChunk, [raspberry.id], start_time, end_time, seconds)
+            rows = merge_bucketed(rows, packed, READING_METRICS)
+        return rows
+    rows = rollup_bucketed(
+        ReadingRollup.objects.filter(
+            raspberry=raspberry, grain=grain, bucket__range=(bucket_start(start_time, grain), end_time)
+        ),
+        seconds, group_by=['metric']
+    )
+    series = {}
+    for row in rows:
+        bucket = series.get(row['bucket_start'])
+        if bucket is None:
+            bucket = series[row['bucket_start']] = {'bucket_start': row['bucket_start']}
+            for metric in READING_METRICS:
+                bucket.update({f"{metric}_avg": None, f"{metric}_min": None, f"{metric}_max": None, f"{metric}_count": 0})
+        metric = row['metric']
+        bucket.update({f"{metric}_{stat}": row[stat] for stat in ('avg', 'min', 'max', 'count')})
+    return list(series.values())
+
+
+def soil_series(sensor_locations, start_time, end_time, seconds):
+    """bucketed() de l'humidité du sol par emplacement, calculé depuis les agrégats pour les longues périodes."""
+    grain = grain_for(start_time, end_time)
+    if grain is None:
+        rows = bucketed(
+            SensorData.objects.filter(sensor_location__in=sensor_locations, timestamp__range=(start_time, end_time)),
+            ['soil_moisture'], seconds, group_by=['sensor_location_id']
+        )
+        if archive.enabled():
+            by_raspberry = {}
+            for location_id, raspberry_id in sensor_locations.values_list('id', 'raspberry_id'):
+                by_raspberry.setdefault(raspberry_id, []).append(location_id)
+            for raspberry_id, location_ids in by_raspberry.items():
+                archived = archive.bucketed(
+                    'soil', raspberry_id, ['soil_moisture'], start_time, end_time, seconds,
+                    group_by=['sensor_location_id'], location_ids=location_ids
+                )
+                rows = merge_bucketed(rows, archived, ['soil_moisture'], group_by=['sensor_location_id'])
+        if chunks.enabled():
+            packed = chunks.bucketed(
+                SoilMoistureChunk, list(sensor_locations.values_list('id', flat=True)), start_time, end_time, seconds,
+                group_by_owner=True
+            )
+            rows = merge_bucketed(rows, packed, ['soil_moisture'], group_by=['sensor_location_id'])
+        return rows
+    rows = rollup_bucketed(
+        SoilMoistureRollup.objects.filter(
+            sensor_location__in=sensor_locations, grain=grain,
+            bucket__range=(bucket_start(start_time, grain), end_time)
+        ),
+        seconds, group_by=['sensor_location_id']
+    )
+    return [
+        {
+            'sensor_location_id': row['sensor_location_id'],
+            'bucket_start': row['bucket_start'],
+            'soil_moisture_avg': row['avg'],
+            'soil_moisture_min': row['min'],
+            'soil_moisture_max': row['max'],
+            'soil_moisture_count': row['count'],
+        }
+        for row in rows
+    ]
+
+
+def _columns(rows, width):
+    """Tuples numériques lus par lots (une requête itérée) dans un tableau float64 (lignes, width), None en NaN."""
+    rows = iter(rows)
+    parts = []
+    while batch := list(islice(rows, POINTS_CHUNK_SIZE)):
+        parts.append(np.array(batch, dtype=np.float64))
+    return np.concatenate(parts) if parts else np.empty((0, width))
+
+
+def _by_time(table, others, column):
+    """Ajoute à table (lignes de la base) les tableaux others (archive, chunks ; None si vides), trié sur column."""
+    others = [other for other in others if other is not None and len(other)]
+    if not others:
+        return table
+    table = np.concatenate([table, *others])
+    return table[np.argsort(table[:, column], kind='stable')]
+
+
+def _rollup_averages(queryset, key):
+    """(clé, secondes depuis l'epoch, moyenne) des créneaux d'une table d'agrégats, triés par créneau."""
+    return (
+        queryset.annotate(
+            epoch=Epoch('bucket'),
+            average=ExpressionWrapper(F('value_sum') / F('value_count'), output_field=FloatField()),
+        )
+        .order_by('bucket')
+        .values_list(key, 'epoch', 'average')
+    )
+
+
+def reading_points(raspberry, start_time, end_time, max_points):
+    """
+    Mesures communes du Raspberry sur [start_time, end_time] réduites par lttb() à max_points points
+    par mesure : {mesure: (secondes depuis l'epoch, valeurs)} en tableaux NumPy. Les relevés sont lus
+    en une requête itérée (plus l'archive et les chunks) ; les longues périodes partent des
+    moyennes des agrégats horaires ou journaliers.
+    """
+    grain = grain_for(start_time, end_time)
+    if grain is not None:
+        series = {metric: ([], []) for metric in READING_METRICS}
+        for metric, epoch, average in _rollup_averages(
+            ReadingRollup.objects.filter(
+                raspberry=raspberry, grain=grain, bucket__range=(bucket_start(start_time, grain), end_time)
+            ),
+            'metric'
+        ):
+            series[metric][0].append(epoch)
+            series[metric][1].append(average)
+        return {
+            metric: downsample(np.array(x, dtype=np.float64), np.array(y, dtype=np.float64), max_points)
+            for metric, (x, y) in series.items()
+        }
+
+    table = _columns(
+        Reading.objects.filter(raspberry=raspberry, timestamp__range=(start_time, end_time))
+        .annotate(epoch=Epoch('timestamp')).order_by('timestamp')
+        .values_list('epoch', *READING_METRICS).iterator(chunk_size=POINTS_CHUNK_SIZE),
+        1 + len(READING_METRICS)
+    )
+    others = []
+    if archive.enabled():
+        others.append(archive.points('readings', raspberry.id, start_time, end_time, READING_METRICS))
+    if chunks.enabled():
+        packed = chunks.points(ReadingChunk, [raspberry.id], start_time, end_time)
+        others.append(None if packed is None else packed[:, 1:])
+    table = _by_time(table, others, 0)
+    return {
+        metric: downsample(table[:, 0], table[:, index + 1], max_points)
+        for index, metric in enumerate(READING_METRICS)
+    }
+
+
+def soil_points(sensor_locations, start_time, end_time, max_points):
+    """
+    Humidité du sol sur [start_time, end_time] réduite par lttb() à max_points points par emplacement :
+    {id de l'emplacement: (secondes depuis l'epoch, valeurs)}, comme reading_points().
+    """
+    grain = grain_for(start_time, end_time)
+    if grain is not None:
+        table = _columns(_rollup_averages(
+            SoilMoistureRollup.objects.filter(
+                sensor_location__in=sensor_locations, grain=grain,
+                bucket__range=(bucket_start(start_time, grain), end_time)
+            ),
+            'sensor_location_id'
+        ).iterator(chunk_size=POINTS_CHUNK_SIZE), 3)
+    else:
+        table = _columns(
+            SensorData.objects.filter(sensor_location__in=sensor_locations, timestamp__range=(start_time, end_time))
+            .annotate(epoch=Epoch('timestamp')).order_by('timestamp')
+            .values_list('sensor_location_id', 'epoch', 'soil_moisture').iterator(chunk_size=POINTS_CHUNK_SIZE),
+            3
+        )
+        others = []
+        if archive.enabled():
+            by_raspberry = {}
+            for location_id, raspberry_id in sensor_locations.values_list('id', 'raspberry_id'):
+                by_raspberry.setdefault(raspberry_id, []).append(location_id)
+            for raspberry_id, location_ids in by_raspberry.items():
+                archived = archive.points(
+                    'soil', raspberry_id, start_time, end_time, ['sensor_location_id', 'soil_moisture'], location_ids
+                )
+                # points() place l'horodatage en tête : colonnes remises dans l'ordre (emplacement, epoch, valeur).
+                others.append(None if archived is None else archived[:, [1, 0, 2]])
+        if chunks.enabled():
+            others.append(chunks.points(
+                SoilMoistureChunk, list(sensor_locations.values_list('id', flat=True)), start_time, end_time
+            ))
+        table = _by_time(table, others, 1)
+    series = {}
+    for location_id in np.unique(table[:, 0]).tolist():
+        rows = table[table[:, 0] == location_id]
+        series[int(location_id)] = downsample(rows[:, 1], rows[:, 2], max_points)
+    return series
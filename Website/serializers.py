@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from datetime import timezone
+from django.conf import settings
 from .models import Group, Raspberry, Plant, SensorLocation, SensorData
 
 class GroupSerializer(serializers.ModelSerializer):
@@ -28,11 +29,33 @@ class SensorLocationSerializer(serializers.ModelSerializer):
 
 class SensorDataSerializer(serializers.ModelSerializer):
     sensor_location = SensorLocationSerializer(read_only=True)
+    # Annotés depuis Reading.
+    temperature = serializers.FloatField(read_only=True, allow_null=True)
+    air_humidity = serializers.FloatField(read_only=True, allow_null=True)
 
     class Meta:
         model = SensorData
         fields = ['sensor_location', 'timestamp', 'temperature', 'air_humidity', 'soil_moisture']
 
+class SensorDataBucketSerializer(serializers.Serializer):
+    """
+    Un créneau d'un emplacement (get_latest_sensor_data) : champs de SensorDataSerializer avec
+    timestamp = début du créneau et les moyennes du créneau, plus leurs minimum et maximum et
+    le nombre de relevés d'humidité du sol (count).
+    """
+    sensor_location = SensorLocationSerializer(read_only=True)
+    timestamp = serializers.DateTimeField(read_only=True)
+    count = serializers.IntegerField(read_only=True)
+    temperature = serializers.FloatField(read_only=True, allow_null=True)
+    temperature_min = serializers.FloatField(read_only=True, allow_null=True)
+    temperature_max = serializers.FloatField(read_only=True, allow_null=True)
+    air_humidity = serializers.FloatField(read_only=True, allow_null=True)
+    air_humidity_min = serializers.FloatField(read_only=True, allow_null=True)
+    air_humidity_max = serializers.FloatField(read_only=True, allow_null=True)
+    soil_moisture = serializers.FloatField(read_only=True, allow_null=True)
+    soil_moisture_min = serializers.FloatField(read_only=True, allow_null=True)
+    soil_moisture_max = serializers.FloatField(read_only=True, allow_null=True)
+
 class IncomingLocationSerializer(serializers.Serializer):
     location_name = serializers.CharField()
     soil_moisture = serializers.FloatField(
@@ -40,7 +63,7 @@ class IncomingLocationSerializer(serializers.Serializer):
         allow_null=True
     )
 
-class IncomingDataSerializer(serializers.Serializer):
+class IncomingReadingSerializer(serializers.Serializer):
     timestamp = serializers.DateTimeField(
         input_formats=[
             '%d/%m/%Y %H:%M:%S',
@@ -49,8 +72,19 @@ class IncomingDataSerializer(serializers.Serializer):
             '%Y-%m-%dT%H:%M:%S%z',
         ],
     )
-    raspberry = serializers.DictField()
     locations = IncomingLocationSerializer(many=True)
     temperature = serializers.FloatField()
     air_humidity = serializers.FloatField()
-    water_level = serializers.FloatField()
\ No newline at end of file
+    water_level = serializers.FloatField()
+    seq = serializers.IntegerField(min_value=0, required=False)
+
+class IncomingDataSerializer(IncomingReadingSerializer):
+    raspberry = serializers.DictField(required=False)
+
+class IncomingBatchSerializer(serializers.Serializer):
+    raspberry = serializers.DictField(required=False)
+    readings = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.INGEST_MAX_BATCH_SIZE
+    )
@@ -1,7 +1,9 @@
 # signals.py
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_migrate, post_save, post_delete
 from django.dispatch import receiver
-from .models import Group, DEFAULT_GROUP_NAME
+from .models import Group, Raspberry, SensorLocation, DEFAULT_GROUP_NAME
+from .registry import registry
+from .keyring import keyring
 
 @receiver(post_migrate)
 def create_default_group(sender, **kwargs):
@@ -10,3 +12,16 @@ def create_default_group(sender, **kwargs):
             name=DEFAULT_GROUP_NAME,
             defaults={'description': 'Group par défaut pour les Raspberries non assignés.'}
         )
+
+@receiver([post_save, post_delete], sender=Raspberry)
+def invalidate_raspberry(sender, instance, **kwargs):
+    registry.forget_raspberry(instance.id)
+    keyring.forget_raspberry(instance.id)
+
+@receiver([post_save, post_delete], sender=SensorLocation)
+def invalidate_sensor_location(sender, instance, **kwargs):
+    registry.forget_location(instance.id)
+
+@receiver([post_save, post_delete], sender=Group)
+def invalidate_group(sender, instance, **kwargs):
+    registry.forget_states()
@@ -0,0 +1,339 @@
+"""
+Tampon disque de la réception des données (INGEST_SPOOL).
+
+Quand la base est indisponible ou dépasse le budget de latence, les relevés validés
+sont ajoutés à un journal local découpé en segments au lieu d'être perdus. Un thread
+de rejeu les réécrit par lots dès que la base répond ; les relevés déjà présents sont
+ignorés par store_readings().
+
+Chaque processus écrit dans son propre segment « .open » ; un segment plein (ou scellé
+avant un rejeu) est renommé « .log », puis « .replaying » le temps de son rejeu, et
+supprimé une fois rejoué. Un enregistrement est : longueur u32, crc32 u32, JSON.
+"""
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError, connections
+
+from . import metrics
+
+logger = logging.getLogger('Website')
+
+OPEN_SUFFIX = '.open'
+SEALED_SUFFIX = '.log'
+REPLAYING_SUFFIX = '.replaying'
+CORRUPT_SUFFIX = '.corrupt'
+
+_RECORD = struct.Struct('<II')
+
+
+def encode_record(raspberry_id, device_name, readings):
+    return json.dumps({
+        'raspberry_id': raspberry_id,
+        'device_name': device_name,
+        'spooled_at': time.time(),
+        'readings': [dict(reading, timestamp=reading['timestamp'].isoformat()) for reading in readings],
+    }).encode('utf-8')
+
+
+def decode_record(payload):
+    record = json.loads(payload)
+    for reading in record['readings']:
+        reading['timestamp'] = datetime.fromisoformat(reading['timestamp'])
+    return record['raspberry_id'], record['device_name'], record['readings']
+
+
+class DiskSpool:
+    def __init__(self, directory, segment_size=16 * 1024 * 1024, fsync=True, retry_interval=5, replay_batch_size=500):
+        self.directory = str(directory)
+        self.segment_size = segment_size
+        self.fsync = fsync
+        self.retry_interval = retry_interval
+        self.replay_batch_size = replay_batch_size
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._fd = None
+        self._path = None
+        self._size = 0
+        self._segments = 0
+        self._retired = []
+        self._written = 0
+        self._synced = 0
+
+        self._bypass_until = 0
+        self._replayer = None
+        self._resumed = False
+        self.appended = 0
+        self.replayed = 0
+        self.last_replay = None
+
+    # Écriture
+
+    def append(self, payload):
+        record = _RECORD.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._fd is None or self._size >= self.segment_size:
+                self._seal_current()
+                self._open_segment()
+            os.write(self._fd, record)
+            self._size += len(record)
+            self._written += 1
+            self.appended += 1
+            ticket = self._written
+        if self.fsync:
+            self._sync(ticket)
+
+    def _sync(self, ticket):
+        # Commit groupé : un seul fsync couvre toutes les écritures faites pendant le précédent.
+        with self._sync_lock:
+            if self._synced >= ticket:
+                return
+            with self._lock:
+                target = self._written
+                retired, self._retired = self._retired, []
+                fds = retired + ([self._fd] if self._fd is not None else [])
+            for fd in fds:
+                os.fsync(fd)
+            for fd in retired:
+                os.close(fd)
+            self._synced = target
+
+    def _open_segment(self):
+        self._segments += 1
+        name = f"{time.time_ns():020d}-{os.getpid()}-{self._segments:06d}"
+        self._path = os.path.join(self.directory, name + OPEN_SUFFIX)
+        self._fd = os.open(self._path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        self._size = 0
+
+    def _seal_current(self):
+        if self._fd is None:
+            return
+        os.rename(self._path, self._path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+        if self.fsync:
+            # Fermé par le prochain fsync, qu'un autre thread attend peut-être encore.
+            self._retired.append(self._fd)
+        else:
+            os.close(self._fd)
+        self._fd = None
+        self._path = None
+        self._size = 0
+
+    def seal(self):
+        """Ferme le segment en cours pour qu'il puisse être rejoué."""
+        with self._lock:
+            if self._fd is not None and self._size:
+                self._seal_current()
+            ticket = self._written
+        if self.fsync:
+            self._sync(ticket)
+
+    # Disponibilité de la base
+
+    def mark_unavailable(self):
+        """Les envois suivants vont directement au tampon pendant retry_interval secondes."""
+        self._bypass_until = time.monotonic() + self.retry_interval
+
+    def bypassing(self):
+        return time.monotonic() < self._bypass_until
+
+    # Rejeu
+
+    def resume(self, store):
+        """Au premier envoi du processus, relance le rejeu des segments scellés restés sur disque."""
+        if self._resumed:
+            return
+        self._resumed = True
+        if self._pending_segments():
+            self.ensure_replayer(store)
+
+    def ensure_replayer(self, store):
+        with self._lock:
+            if self._replayer is not None and self._replayer.is_alive():
+                return
+            self._replayer = threading.Thread(
+                target=self._replay_loop, args=(store,), name='ingest-spool-replayer', daemon=True
+            )
+            self._replayer.start()
+
+    def _replay_loop(self, store):
+        while True:
+            time.sleep(self.retry_interval)
+            try:
+                self.replay(store)
+            except (OperationalError, InterfaceError) as e:
+                logger.warning(f"Database still unavailable, spool replay postponed: {e}")
+                self.mark_unavailable()
+                continue
+            finally:
+                connections.close_all()
+            self._bypass_until = 0
+            with self._lock:
+                if self._fd is None and not self._pending_segments():
+                    self._replayer = None
+                    return
+
+    def recover(self):
+        """
+        Rend rejouables les segments laissés par un processus arrêté (« .open » et
+        « .replaying »). À n'utiliser que lorsqu'aucun autre processus n'écrit dans le tampon.
+        """
+        for name in os.listdir(self.directory):
+            for suffix in (OPEN_SUFFIX, REPLAYING_SUFFIX):
+                path = os.path.join(self.directory, name)
+                if name.endswith(suffix) and path != self._path:
+                    os.rename(path, path[:-len(suffix)] + SEALED_SUFFIX)
+
+    def replay(self, store):
+        """
+        Rejoue tous les segments scellés, le plus ancien d'abord. store(raspberry_id, device_name, readings)
+        écrit un groupe de relevés. En cas d'erreur de base, le segment en cours reste à rejouer.
+        Retourne le nombre de relevés rejoués.
+        """
+        self.seal()
+        started = time.monotonic()
+        total = 0
+        for name in self._pending_segments():
+            path = os.path.join(self.directory, name)
+            claimed = path[:-len(SEALED_SUFFIX)] + REPLAYING_SUFFIX
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # pris par le rejeu d'un autre processus
+            try:
+                count, intact = self._replay_segment(claimed, store)
+            except Exception:
+                os.rename(claimed, path)
+                raise
+            total += count
+            if intact:
+                os.remove(claimed)
+            else:
+                os.rename(claimed, path[:-len(SEALED_SUFFIX)] + CORRUPT_SUFFIX)
+
+        if total:
+            elapsed = time.monotonic() - started
+            self.replayed += total
+            self.last_replay = {
+                'at': time.time(),
+                'readings': total,
+                'seconds': round(elapsed, 3),
+                'readings_per_second': round(total / elapsed, 1) if elapsed else None,
+            }
+            logger.info(f"Replayed {total} spooled readings in {elapsed:.1f}s.")
+        return total
+
+    def _replay_segment(self, path, store):
+        count = 0
+        groups = defaultdict(list)
+        records = 0
+        intact = True
+        for payload in self._read_segment(path):
+            if payload is None:
+                logger.error(f"Corrupt record in spool segment {path}, keeping the rest for inspection.")
+                intact = False
+                break
+            raspberry_id, device_name, readings = decode_record(payload)
+            groups[(raspberry_id, device_name)].extend(readings)
+            records += 1
+            if records >= self.replay_batch_size:
+                count += self._store_groups(groups, store)
+                groups.clear()
+                records = 0
+        count += self._store_groups(groups, store)
+        return count, intact
+
+    def _store_groups(self, groups, store):
+        count = 0
+        for (raspberry_id, device_name), readings in groups.items():
+            try:
+                store(raspberry_id, device_name, readings)
+            except (OperationalError, InterfaceError):
+                raise
+            except Exception as e:
+                # Un groupe qui ne peut pas être écrit ne doit pas bloquer le rejeu du reste.
+                logger.error(f"Dropping {len(readings)} spooled readings for "
+                             f"{raspberry_id or device_name}: {type(e).__name__}: {e}")
+                continue
+            count += len(readings)
+        return count
+
+    def _read_segment(self, path):
+        """Enregistrements du segment ; None signale un enregistrement tronqué ou corrompu."""
+        with open(path, 'rb') as f:
+            data = f.read()
+        view = memoryview(data)
+        offset = 0
+        while offset < len(view):
+            if offset + _RECORD.size > len(view):
+                yield None
+                return
+            length, checksum = _RECORD.unpack_from(view, offset)
+            payload = view[offset + _RECORD.size:offset + _RECORD.size + length]
+            if len(payload) != length or zlib.crc32(payload) != checksum:
+                yield None
+                return
+            yield bytes(payload)
+            offset += _RECORD.size + length
+
+    def _pending_segments(self):
+        return sorted(name for name in os.listdir(self.directory) if name.endswith(SEALED_SUFFIX))
+
+    # Métriques
+
+    def stats(self):
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.endswith((OPEN_SUFFIX, SEALED_SUFFIX, REPLAYING_SUFFIX)):
+                try:
+                    segments.append((name, os.path.getsize(os.path.join(self.directory, name))))
+                except FileNotFoundError:
+                    continue
+        segments = [(name, size) for name, size in segments if size]
+        oldest = min((int(name.split('-', 1)[0]) for name, _ in segments), default=None)
+        return {
+            'segments': len(segments),
+            'bytes': sum(size for _, size in segments),
+            'oldest_age_seconds': round(time.time() - oldest / 1e9, 1) if oldest else None,
+            'corrupt_segments': sum(1 for name in os.listdir(self.directory) if name.endswith(CORRUPT_SUFFIX)),
+            'bypassing': self.bypassing(),
+            'appended': self.appended,
+            'replayed': self.replayed,
+            'last_replay': self.last_replay,
+        }
+
+
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def get_spool():
+    """Tampon du processus, ou None si INGEST_SPOOL['ENABLED'] est faux."""
+    global _spool
+    if not settings.INGEST_SPOOL.get('ENABLED'):
+        return None
+    if _spool is None:
+        with _spool_lock:
+            if _spool is None:
+                options = settings.INGEST_SPOOL
+                _spool = DiskSpool(
+                    options['DIRECTORY'],
+                    segment_size=options.get('SEGMENT_SIZE', 16 * 1024 * 1024),
+                    fsync=options.get('FSYNC', True),
+                    retry_interval=options.get('RETRY_INTERVAL', 5),
+                    replay_batch_size=settings.INGEST_WORKER_BATCH_SIZE,
+                )
+    return _spool
+
+
+if settings.INGEST_SPOOL.get('ENABLED'):
+    metrics.register('ingest_spool', lambda: get_spool().stats())
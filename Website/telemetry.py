@@ -0,0 +1,151 @@
+"""
+Format binaire compact des relevés (Content-Type: application/octet-stream).
+
+Corps HTTP : nonce (12 octets) + AES-GCM(contenu), sans base64 ni JSON autour.
+L'identifiant de clé est passé dans l'en-tête X-Eden-Key-Id.
+
+Contenu (little-endian) :
+    en-tête   : version u8, flags u8 (bit 0 = lot, bit 1 = numéros de séquence), nombre de relevés u16,
+                longueur du device_name u8, device_name (utf-8, vide si clé par Raspberry)
+    relevé    : [seq i64 si bit 1], timestamp i64 (microsecondes UTC depuis 1970), temperature f32,
+                air_humidity f32, water_level f32, nombre d'emplacements u8
+    emplacement : longueur du nom u8, nom (utf-8), soil_moisture f32
+
+Une valeur absente est codée NaN. Les flottants sont arrondis à 4 décimales au
+décodage pour effacer le bruit de la conversion float32. Un lot compte de 1 à
+INGEST_MAX_BATCH_SIZE relevés.
+"""
+import math
+import struct
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+BINARY_CONTENT_TYPE = 'application/octet-stream'
+KEY_ID_HEADER = 'X-Eden-Key-Id'
+FORMAT_VERSION = 1
+FLAG_BATCH = 0x01
+FLAG_SEQUENCE = 0x02
+
+_HEADER = struct.Struct('<BBHB')
+_READING = struct.Struct('<qfffB')
+_SEQUENCE = struct.Struct('<q')
+_NAME_LENGTH = struct.Struct('<B')
+_SOIL = struct.Struct('<f')
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+REQUIRED_FIELDS = ('temperature', 'air_humidity', 'water_level')
+
+
+class BinaryFormatError(ValueError):
+    """Contenu illisible ; errors : erreurs au format du serializer (taille de lot) si le contenu est lisible."""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors
+
+
+def _float(value):
+    return None if math.isnan(value) else round(value, 4)
+
+
+def _nan(value):
+    return math.nan if value is None else value
+
+
+def encode_readings(readings, device_name=None, batch=False):
+    """Encode des relevés (même structure que les données validées) au format binaire."""
+    name = (device_name or '').encode('utf-8')
+    sequenced = any(reading.get('seq') is not None for reading in readings)
+    flags = (FLAG_BATCH if batch else 0) | (FLAG_SEQUENCE if sequenced else 0)
+    parts = [_HEADER.pack(FORMAT_VERSION, flags, len(readings), len(name)), name]
+    for reading in readings:
+        if sequenced:
+            parts.append(_SEQUENCE.pack(reading['seq']))
+        delta = reading['timestamp'] - EPOCH
+        micros = (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+        parts.append(_READING.pack(
+            micros, _nan(reading.get('temperature')), _nan(reading.get('air_humidity')),
+            _nan(reading.get('water_level')), len(reading['locations'])
+        ))
+        for loc in reading['locations']:
+            location_name = loc['location_name'].encode('utf-8')
+            parts.append(_NAME_LENGTH.pack(len(location_name)))
+            parts.append(location_name)
+            parts.append(_SOIL.pack(_nan(loc.get('soil_moisture'))))
+    return b''.join(parts)
+
+
+def decode_readings(buffer):
+    """
+    Décode le contenu déchiffré directement depuis le tampon (memoryview, sans copie
+    intermédiaire). Retourne (device_name, relevés acceptés, résultats par relevé, lot ?),
+    avec les mêmes résultats et messages d'erreur que la validation JSON.
+    """
+    # Import différé : l'encodage, utilisé côté Raspberry, ne dépend pas de Django.
+    from .validation import batch_size_errors, validate_location_name
+
+    view = memoryview(buffer)
+    try:
+        version, flags, count, name_length = _HEADER.unpack_from(view, 0)
+        if version != FORMAT_VERSION:
+            raise BinaryFormatError(f"Version de format inconnue : {version}")
+        if flags & FLAG_BATCH:
+            errors = batch_size_errors(count)
+            if errors:
+                raise BinaryFormatError("Nombre de relevés du lot invalide.", errors)
+        offset = _HEADER.size
+        device_name = str(view[offset:offset + name_length], 'utf-8') or None
+        offset += name_length
+
+        accepted = []
+        results = []
+        sequenced = bool(flags & FLAG_SEQUENCE)
+        for index in range(count):
+            seq = None
+            if sequenced:
+                (seq,) = _SEQUENCE.unpack_from(view, offset)
+                offset += _SEQUENCE.size
+            micros, temperature, air_humidity, water_level, location_count = _READING.unpack_from(view, offset)
+            offset += _READING.size
+            locations = []
+            location_errors = {}
+            for position in range(location_count):
+                (length,) = _NAME_LENGTH.unpack_from(view, offset)
+                offset += _NAME_LENGTH.size
+                location_name, name_errors = validate_location_name(str(view[offset:offset + length], 'utf-8'))
+                if name_errors:
+                    location_errors[position] = name_errors
+                offset += length
+                (soil_moisture,) = _SOIL.unpack_from(view, offset)
+                offset += _SOIL.size
+                locations.append({'location_name': location_name, 'soil_moisture': _float(soil_moisture)})
+
+            reading = {
+                'timestamp': EPOCH + timedelta(microseconds=micros),
+                'locations': locations,
+                'temperature': _float(temperature),
+                'air_humidity': _float(air_humidity),
+                'water_level': _float(water_level),
+            }
+            errors = {'locations': location_errors} if location_errors else {}
+            errors.update((field, ["Ce champ ne peut être nul."]) for field in REQUIRED_FIELDS if reading[field] is None)
+            if seq is not None:
+                if seq < 0:
+                    errors['seq'] = ["Assurez-vous que cette valeur est supérieure ou égale à\xa00."]
+                reading['seq'] = seq
+            if errors:
+                result = {'index': index, 'status': 'rejected', 'errors': errors}
+                if seq is not None and seq >= 0:
+                    result['seq'] = seq
+                results.append(result)
+            else:
+                accepted.append(reading)
+                results.append({'index': index, 'status': 'accepted'})
+    except BinaryFormatError:
+        raise
+    except (struct.error, UnicodeDecodeError, OverflowError, ValueError) as e:
+        # OverflowError / ValueError : horodatage hors des dates représentables.
+        raise BinaryFormatError(f"Contenu binaire tronqué ou invalide : {e}")
+
+    if offset != len(view):
+        raise BinaryFormatError("Octets inattendus après le dernier relevé.")
+    return device_name, accepted, results, bool(flags & FLAG_BATCH)
@@ -1,3 +1,254 @@
-from django.test import TestCase
+import random
+import tempfile
+from datetime import datetime
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.timezone import now, timedelta
+
+from .ingest import Submission, commit_submission, validate_batch
+from .ingest_queue import QueueUnavailable, RedisStreamQueue
+from .management.commands.bench_sensor_queries import view_queries
+from .management.commands.check_partition_pruning import TIME_BOUNDED, scanned_partitions
+from .models import Raspberry, Reading, SensorData, SensorLocation
+from .partitions import (
+    PARTITIONED_MODELS, add_months, create_partition, default_partition_name, month_start, partition_name, partitions,
+)
+from .serializers import IncomingDataSerializer, IncomingReadingSerializer
+from .spool import DiskSpool
+from .telemetry import EPOCH, BinaryFormatError, decode_readings, encode_readings
+from .validation import validate_reading
+
+TIMESTAMP_FORMATS = [
+    '%d/%m/%Y %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%fZ',
+    '%Y-%m-%dT%H:%M:%S.%f%z',
+    '%Y-%m-%dT%H:%M:%S%z',
+]
+ODD_VALUES = [
+    None, True, False, '', '  ', '21.5', 'abc', '1e400', 10 ** 400, float('nan'), float('inf'),
+    -1, 0, 3.0, [], {}, '\x00', '\ud800', ' A ', 7,
+]
+ODD_TIMESTAMPS = [
+    '2026-03-29T02:30:00.000000Z', '2026-10-25T02:30:00.5Z', '1/2/2026 3:04:05', '31/02/2026 10:00:00',
+    '2026-10-01T12:00:00', '2026-10-01T12:00:00+0200', '2026-10-01T12:00:00.123-05:30', '2026-10-01 12:00:00Z',
+    '2026-10-01T24:00:00Z', '٢٠٢٦-10-01T12:00:00Z', 1760000000, None,
+]
+
+
+def canonical(value):
+    """Forme comparable des données validées et des erreurs (types et fuseaux compris)."""
+    if isinstance(value, datetime):
+        return ('datetime', value.isoformat(), str(value.tzinfo))
+    if isinstance(value, dict):
+        return {str(key): canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [canonical(item) for item in value]
+    if isinstance(value, float):
+        return ('float', repr(value))
+    if isinstance(value, str):
+        return str(value)
+    return value
+
+
+def random_reading(rng, base):
+    """Relevé aléatoire : valide, ou (4 fois sur 10) avec un ou deux champs absents ou inhabituels."""
+    odd = rng.random() < 0.4
+    timestamp = base - timedelta(seconds=rng.randrange(10 ** 8), microseconds=rng.randrange(10 ** 6))
+    reading = {
+        'timestamp': (rng.choice(ODD_TIMESTAMPS) if odd and rng.random() < 0.3
+                      else timestamp.strftime(rng.choice(TIMESTAMP_FORMATS))),
+        'locations': [
+            {'location_name': f"loc-{n}", 'soil_moisture': rng.uniform(0, 100)}
+            for n in range(rng.randrange(4))
+        ],
+        'temperature': rng.uniform(-10, 40),
+        'air_humidity': rng.randrange(101),
+        'water_level': rng.uniform(0, 100),
+    }
+    if rng.random() < 0.5:
+        reading['seq'] = rng.randrange(10 ** 6)
+    if rng.random() < 0.5:
+        reading['raspberry'] = {'device_name': 'bench'}
+    if not odd:
+        return reading
+
+    for _ in range(rng.randrange(1, 3)):
+        target = rng.random()
+        if target < 0.5:
+            field = rng.choice(['timestamp', 'locations', 'temperature', 'air_humidity', 'water_level', 'seq', 'raspberry'])
+            if rng.random() < 0.2:
+                reading.pop(field, None)
+            else:
+                reading[field] = rng.choice(ODD_VALUES)
+        elif reading.get('locations') and isinstance(reading['locations'], list):
+            loc = rng.choice(reading['locations'])
+            field = rng.choice(['location_name', 'soil_moisture'])
+            if rng.random() < 0.2:
+                loc.pop(field, None)
+            else:
+                loc[field] = rng.choice(ODD_VALUES)
+    return reading
+
+
+class ValidationEquivalenceTests(SimpleTestCase):
+    """Le validateur rapide (Website/validation.py) donne les mêmes données et erreurs que les serializers DRF."""
+
+    READINGS = 5000
+
+    def reference(self, reading, with_device):
+        serializer = (IncomingDataSerializer if with_device else IncomingReadingSerializer)(data=reading)
+        if serializer.is_valid():
+            return canonical((serializer.validated_data, None))
+        return canonical((None, serializer.errors))
+
+    def test_random_readings(self):
+        rng = random.Random(0)
+        base = now()
+        for _ in range(self.READINGS):
+            reading = random_reading(rng, base)
+            with_device = rng.random() < 0.5
+            with self.subTest(reading=reading, with_device=with_device):
+                expected = self.reference(reading, with_device)
+                self.assertEqual(canonical(validate_reading(reading, with_device)), expected)
+
+    def test_odd_values(self):
+        base = now()
+        for field in ['timestamp', 'temperature', 'air_humidity', 'water_level', 'seq', 'locations', 'raspberry']:
+            for value in [*ODD_VALUES, *ODD_TIMESTAMPS]:
+                reading = random_reading(random.Random(1), base)
+                reading[field] = value
+                for with_device in (False, True):
+                    with self.subTest(field=field, value=value, with_device=with_device):
+                        self.assertEqual(canonical(validate_reading(reading, with_device)), self.reference(reading, with_device))
+
+
+class BinaryFormatParityTests(SimpleTestCase):
+    """Un lot décodé du format binaire (Website/telemetry.py) a les mêmes résultats et erreurs qu'en JSON."""
+
+    def reading(self, index, location_names=('A',), temperature=21.5, soil_moisture=40.5):
+        return {
+            'timestamp': EPOCH + timedelta(days=20000, seconds=index, microseconds=index),
+            'locations': [{'location_name': name, 'soil_moisture': soil_moisture} for name in location_names],
+            'temperature': temperature,
+            'air_humidity': 50.25,
+            'water_level': 80.0,
+            'seq': index,
+        }
+
+    def decode_json(self, readings):
+        data = {
+            'raspberry': {'device_name': 'parity'},
+            'readings': [
+                {**reading, 'timestamp': reading['timestamp'].strftime('%Y-%m-%dT%H:%M:%S.%f%z')} for reading in readings
+            ],
+        }
+        device_name, accepted, results, errors = validate_batch(data)
+        if errors:
+            return canonical(errors)
+        return device_name, self.instants(accepted), canonical(results)
+
+    def decode_binary(self, readings):
+        try:
+            device_name, accepted, results, _ = decode_readings(encode_readings(readings, 'parity', batch=True))
+        except BinaryFormatError as e:
+            return canonical(e.errors)
+        return device_name, self.instants(accepted), canonical(results)
+
+    def instants(self, readings):
+        # Même instant, fuseau différent : le JSON est converti dans le fuseau courant.
+        return canonical([{**reading, 'timestamp': reading['timestamp'].timestamp()} for reading in readings])
+
+    def test_readings(self):
+        readings = [
+            self.reading(0),
+            self.reading(1, location_names=(' A ', 'B')),
+            self.reading(2, location_names=('',)),
+            self.reading(3, location_names=('A', '   ')),
+            self.reading(4, location_names=()),
+            self.reading(5, temperature=None),
+            self.reading(6, location_names=('',), temperature=None),
+            self.reading(7, soil_moisture=None),
+        ]
+        self.assertEqual(self.decode_binary(readings), self.decode_json(readings))
+
+    def test_batch_size(self):
+        for count in (0, 1, settings.INGEST_MAX_BATCH_SIZE, settings.INGEST_MAX_BATCH_SIZE + 1):
+            readings = [self.reading(index) for index in range(count)]
+            with self.subTest(count=count):
+                self.assertEqual(self.decode_binary(readings), self.decode_json(readings))
+
+
+@override_settings(INGEST_MODE='queue')
+class QueueFallbackTests(SimpleTestCase):
+    """En mode queue, un envoi que Redis refuse est écrit dans le tampon disque au lieu d'être perdu."""
+
+    def setUp(self):
+        # Aucun Redis n'écoute sur le port 1 : la connexion est refusée.
+        patcher = mock.patch('Website.ingest.get_queue', return_value=RedisStreamQueue('redis://127.0.0.1:1/0'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.submission = Submission(None, 1, 'fallback', [BinaryFormatParityTests().reading(0)], None, False)
+
+    def test_spooled(self):
+        with tempfile.TemporaryDirectory() as directory:
+            spool = DiskSpool(directory, fsync=False)
+            with mock.patch('Website.ingest.get_spool', return_value=spool), \
+                    mock.patch.object(spool, 'ensure_replayer'):
+                raspberry_id, _, code = commit_submission(self.submission)
+            self.assertEqual((raspberry_id, code), (1, 202))
+            replayed = []
+            spool.replay(lambda *record: replayed.append(record))
+            self.assertEqual(replayed, [(1, 'fallback', self.submission.readings)])
+
+    def test_without_spool(self):
+        with mock.patch('Website.ingest.get_spool', return_value=None):
+            with self.assertRaises(QueueUnavailable):
+                commit_submission(self.submission)
+
+
+POSTGRESQL = connection.vendor == 'postgresql'
+
+
+@skipUnless(POSTGRESQL, "Tables partitionnées sur PostgreSQL uniquement (migration 0021).")
+class PartitionPruningTests(TestCase):
+    """Les requêtes bornées par timestamp des graphiques et de l'API ne lisent que les partitions de la période."""
+
+    # Ailleurs, aucune base de test n'est créée : les migrations (0009, 0021) sont propres à PostgreSQL.
+    databases = {'default'} if POSTGRESQL else set()
+    HOURS = 24
+
+    @classmethod
+    def setUpTestData(cls):
+        current = month_start(now())
+        months = [add_months(current, offset) for offset in range(-3, 2)]
+        for model in PARTITIONED_MODELS:
+            existing = partitions(model._meta.db_table)
+            for month in months:
+                if month not in existing:
+                    create_partition(model._meta.db_table, month)
+        cls.raspberry = Raspberry.objects.create(device_id='pruning')
+        location = SensorLocation.objects.create(raspberry=cls.raspberry, location_name='pruning')
+        timestamps = [month + timedelta(days=1) for month in months[:3]] + [now() - timedelta(hours=1)]
+        Reading.objects.bulk_create([
+            Reading(raspberry=cls.raspberry, timestamp=timestamp, temperature=20, air_humidity=50, water_level=80)
+            for timestamp in timestamps
+        ])
+        SensorData.objects.bulk_create([
+            SensorData(sensor_location=location, timestamp=timestamp, soil_moisture=40) for timestamp in timestamps
+        ])
+
+    def test_time_bounded_queries(self):
+        first_month = month_start(now() - timedelta(hours=self.HOURS))
+        expected = {default_partition_name(model._meta.db_table) for model in PARTITIONED_MODELS}
+        for model in PARTITIONED_MODELS:
+            for offset in range(3):
+                expected.add(partition_name(model._meta.db_table, add_months(first_month, offset)))
+        queries = view_queries(self.raspberry, self.HOURS)
+        for name in TIME_BOUNDED:
+            with self.subTest(query=name):
+                scanned = scanned_partitions(queries[name])
+                self.assertTrue(scanned)
+                self.assertLessEqual(set(scanned), expected)
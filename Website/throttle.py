@@ -0,0 +1,158 @@
+"""
+Limitation du débit de réception par Raspberry (INGEST_RATE_LIMIT).
+
+Chaque Raspberry dispose d'un seau à jetons : RATE jetons par seconde, au plus BURST
+en réserve, un jeton par envoi (relevé unique ou lot). Les valeurs peuvent être
+surchargées par device_id ou par nom de groupe dans OVERRIDES ; RATE = 0 refuse tous les
+envois (Retry-After = MAX_RETRY_AFTER). Les seaux vivent dans
+la mémoire du processus (LocalTokenBuckets) ou dans Redis (RedisTokenBuckets), partagés
+entre tous les processus web.
+"""
+import logging
+import math
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .registry import LRUCache
+
+logger = logging.getLogger('Website')
+
+
+class LocalTokenBuckets:
+    """Seaux en mémoire du processus (bornés, les moins récemment utilisés sont oubliés)."""
+
+    def __init__(self, maxsize=None):
+        self._buckets = LRUCache(maxsize or settings.INGEST_REGISTRY_SIZE)
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, burst, cost=1):
+        """Retourne (accepté, secondes avant qu'assez de jetons soient disponibles)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key) or (burst, now)
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets.set(key, (tokens, now))
+        return allowed, 0 if allowed else (cost - tokens) / rate
+
+
+class RedisTokenBuckets:
+    """Seaux partagés dans Redis ; la mise à jour est atomique (script Lua, horloge du serveur Redis)."""
+
+    SCRIPT = """
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(bucket[1]) or burst
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url, prefix='eden:ratelimit'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(self.SCRIPT)
+
+    def consume(self, key, rate, burst, cost=1):
+        import redis
+
+        try:
+            allowed, tokens = self._script(keys=[f"{self.prefix}:{key}"], args=[rate, burst, cost])
+        except redis.RedisError as e:
+            # Redis indisponible : la réception prime sur la limitation.
+            logger.warning(f"Rate limit backend unavailable, allowing request: {e}")
+            return True, 0
+        if allowed:
+            return True, 0
+        return False, (cost - float(tokens)) / rate
+
+
+class IngestThrottle:
+    def __init__(self, backend, rate, burst, overrides=None, max_retry_after=3600):
+        self.backend = backend
+        self.rate = rate
+        self.burst = burst
+        self.overrides = overrides or {}
+        self.max_retry_after = max_retry_after
+        self.allowed = 0
+        self.throttled = 0
+        self.throttled_devices = Counter()
+        self._lock = threading.Lock()
+
+    def limits(self, names):
+        """(rate, burst) de la première surcharge trouvée parmi names (device_id puis groupe)."""
+        for name in names:
+            override = self.overrides.get(name)
+            if override:
+                return override.get('RATE', self.rate), override.get('BURST', self.burst)
+        return self.rate, self.burst
+
+    def check(self, key, names):
+        """Consomme un jeton pour key ; retourne None si accepté, sinon le délai Retry-After en secondes."""
+        rate, burst = self.limits(names)
+        if rate is None:
+            return None
+        if rate <= 0:
+            # Aucun jeton n'est jamais rendu : envois refusés.
+            allowed, wait = False, self.max_retry_after
+        else:
+            allowed, wait = self.backend.consume(key, rate, burst)
+        with self._lock:
+            if allowed:
+                self.allowed += 1
+                return None
+            self.throttled += 1
+            self.throttled_devices[key] += 1
+        return min(self.max_retry_after, max(1, math.ceil(wait)))
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': type(self.backend).__name__,
+                'allowed': self.allowed,
+                'throttled': self.throttled,
+                'throttled_devices': dict(self.throttled_devices.most_common(20)),
+            }
+
+
+_throttle = None
+_throttle_lock = threading.Lock()
+
+
+def get_throttle():
+    """Limiteur du processus, ou None si INGEST_RATE_LIMIT['ENABLED'] est faux."""
+    global _throttle
+    options = settings.INGEST_RATE_LIMIT
+    if not options.get('ENABLED'):
+        return None
+    if _throttle is None:
+        with _throttle_lock:
+            if _throttle is None:
+                backend = import_string(options['BACKEND'])(**options.get('OPTIONS', {}))
+                _throttle = IngestThrottle(backend, options['RATE'], options['BURST'], options.get('OVERRIDES'),
+                                           options.get('MAX_RETRY_AFTER', 3600))
+    return _throttle
+
+
+if settings.INGEST_RATE_LIMIT.get('ENABLED'):
+    metrics.register('ingest_rate_limit', lambda: get_throttle().stats())
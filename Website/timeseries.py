@@ -0,0 +1,178 @@
+"""
+Agrégation des séries temporelles en base : les lignes d'une période sont regroupées
+en créneaux de durée fixe et la base calcule moyenne, minimum et maximum de chaque
+créneau, au lieu de parcourir toutes les lignes en Python.
+
+Pour les graphiques, lttb() réduit une série à un nombre de points donné en gardant
+sa forme (pics et creux compris) plutôt que des moyennes.
+"""
+import math
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db import NotSupportedError
+from django.db.models import Avg, BigIntegerField, Count, ExpressionWrapper, FloatField, Func, Max, Min, Sum
+
+
+class EpochBucket(Func):
+    """Numéro du créneau de `seconds` secondes contenant l'horodatage (secondes depuis l'epoch // seconds)."""
+
+    output_field = BigIntegerField()
+
+    def __init__(self, expression, seconds, **extra):
+        self.seconds = int(seconds)
+        super().__init__(expression, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(f"EpochBucket n'est pas disponible pour {connection.vendor}.")
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        return f"FLOOR(EXTRACT(EPOCH FROM {sql}) / {self.seconds})::bigint", params
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        return f"CAST(strftime('%%s', {sql}) AS INTEGER) / {self.seconds}", params
+
+
+class Epoch(Func):
+    """Horodatage en secondes depuis l'epoch (flottant, microsecondes comprises)."""
+
+    output_field = FloatField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotSupportedError(f"Epoch n'est pas disponible pour {connection.vendor}.")
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        return f"EXTRACT(EPOCH FROM {sql})::double precision", params
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        return f"((julianday({sql}) - 2440587.5) * 86400.0)", params
+
+
+def bucket_seconds(start_time, end_time, max_points):
+    """
+    Durée des créneaux (secondes) pour couvrir [start_time, end_time] en au plus max_points points.
+    Les créneaux étant alignés sur l'epoch, la période en chevauche un de plus que sa durée divisée
+    par celle d'un créneau.
+    """
+    return max(1, math.ceil((end_time - start_time).total_seconds() / max(1, max_points - 1)))
+
+
+def bucket_queryset(queryset, fields, seconds, group_by=()):
+    """Requête groupée par créneau (et par champs group_by) : 'bucket' puis avg/min/max/count de chaque champ."""
+    aggregates = {}
+    for field in fields:
+        aggregates[f"{field}_avg"] = Avg(field)
+        aggregates[f"{field}_min"] = Min(field)
+        aggregates[f"{field}_max"] = Max(field)
+        aggregates[f"{field}_count"] = Count(field)
+    return (
+        queryset.annotate(bucket=EpochBucket('timestamp', seconds))
+        .values(*group_by, 'bucket')
+        .annotate(**aggregates)
+        .order_by('bucket')
+    )
+
+
+def bucketed(queryset, fields, seconds, group_by=()):
+    """
+    Une ligne par créneau (et par valeur des champs group_by), triées par créneau :
+    'bucket_start' (datetime UTC) puis '<champ>_avg', '<champ>_min', '<champ>_max' et
+    '<champ>_count' (valeurs non nulles) pour chaque champ de fields.
+    """
+    return _with_bucket_start(bucket_queryset(queryset, fields, seconds, group_by), 'bucket', seconds)
+
+
+def rollup_bucketed(queryset, seconds, group_by=()):
+    """
+    bucketed() sur une table d'agrégats (Website.models.Rollup) regroupés en créneaux de
+    seconds secondes : 'avg' (pondérée par value_count), 'min', 'max' et 'count' (relevés) par créneau.
+    """
+    rows = (
+        queryset.annotate(bucket_number=EpochBucket('bucket', seconds))
+        .values(*group_by, 'bucket_number')
+        .annotate(
+            avg=ExpressionWrapper(Sum('value_sum') / Sum('value_count'), output_field=FloatField()),
+            min=Min('value_min'),
+            max=Max('value_max'),
+            count=Sum('value_count'),
+        )
+        .order_by('bucket_number')
+    )
+    return _with_bucket_start(rows, 'bucket_number', seconds)
+
+
+def merge_bucketed(rows, other, fields, group_by=()):
+    """
+    Fusionne deux résultats de bucketed() calculés sur des lignes distinctes (base et archive) :
+    un créneau présent des deux côtés reçoit la moyenne pondérée par les effectifs.
+    """
+    merged = {}
+    for row in [*rows, *other]:
+        key = (*(row[name] for name in group_by), row['bucket_start'])
+        current = merged.get(key)
+        if current is None:
+            merged[key] = dict(row)
+            continue
+        for field in fields:
+            count, extra = current[f"{field}_count"], row[f"{field}_count"]
+            if not extra:
+                continue
+            if not count:
+                current.update({f"{field}_{stat}": row[f"{field}_{stat}"] for stat in ('avg', 'min', 'max', 'count')})
+                continue
+            current[f"{field}_avg"] = (current[f"{field}_avg"] * count + row[f"{field}_avg"] * extra) / (count + extra)
+            current[f"{field}_min"] = min(current[f"{field}_min"], row[f"{field}_min"])
+            current[f"{field}_max"] = max(current[f"{field}_max"], row[f"{field}_max"])
+            current[f"{field}_count"] = count + extra
+    return sorted(merged.values(), key=lambda row: row['bucket_start'])
+
+
+def _with_bucket_start(rows, key, seconds):
+    rows = list(rows)
+    for row in rows:
+        row['bucket_start'] = datetime.fromtimestamp(row.pop(key) * seconds, tz=dt_timezone.utc)
+    return rows
+
+
+def lttb(x, y, threshold):
+    """
+    Indices des points gardés par Largest-Triangle-Three-Buckets (x croissant, y sans NaN) : le
+    premier et le dernier point, et dans chacun des threshold - 2 créneaux intermédiaires le point
+    qui forme le plus grand triangle avec le point gardé précédent et la moyenne du créneau suivant.
+    Moyennes et aires sont calculées par NumPy ; seule la boucle sur les créneaux reste en Python.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64) - x[0]
+    y = np.asarray(y, dtype=np.float64)
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    starts, ends = edges[:-1], edges[1:]
+    sum_x = np.concatenate([[0.0], np.cumsum(x)])
+    sum_y = np.concatenate([[0.0], np.cumsum(y)])
+    counts = ends - starts
+    # Point de référence du créneau i : moyenne du créneau i + 1, dernier point pour le dernier créneau.
+    next_x = np.append(((sum_x[ends] - sum_x[starts]) / counts)[1:], x[-1])
+    next_y = np.append(((sum_y[ends] - sum_y[starts]) / counts)[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        ax, ay = x[previous], y[previous]
+        areas = np.abs((ax - next_x[i]) * (y[start:end] - ay) - (ax - x[start:end]) * (next_y[i] - ay))
+        previous = start + int(areas.argmax())
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample(x, y, max_points):
+    """(x, y) réduits à max_points points par lttb(), après retrait des valeurs absentes (NaN)."""
+    present = np.flatnonzero(~np.isnan(y))
+    kept = present[lttb(x[present], y[present], max_points)]
+    return x[kept], y[kept]
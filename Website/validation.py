@@ -0,0 +1,193 @@
+"""
+Validation rapide des relevés reçus par l'API de réception des données.
+
+Produit les mêmes données validées que IncomingDataSerializer, IncomingReadingSerializer
+et IncomingBatchSerializer sans passer par les champs DRF. Seules les formes usuelles
+sont traitées ici : nombres JSON, noms d'emplacement en texte, timestamp dans l'un des
+formats acceptés écrit avec des champs à deux chiffres. Toute autre entrée (y compris
+invalide) est confiée au serializer, qui reste la référence et fournit les messages
+d'erreur.
+"""
+import math
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.exceptions import ErrorDetail
+
+from .serializers import (
+    IncomingBatchSerializer, IncomingDataSerializer, IncomingLocationSerializer, IncomingReadingSerializer,
+)
+
+# '%d/%m/%Y %H:%M:%S'
+_LOCAL_TIMESTAMP = re.compile(r'(\d{2})/(\d{2})/(\d{4}) (\d{2}):(\d{2}):(\d{2})', re.ASCII)
+# '%Y-%m-%dT%H:%M:%S.%fZ', '%Y-%m-%dT%H:%M:%S.%f%z', '%Y-%m-%dT%H:%M:%S%z'
+_ISO_TIMESTAMP = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,6}))?(?:(Z)|([+-])(\d{2}):?(\d{2}))', re.ASCII
+)
+FLOAT_FIELDS = ('temperature', 'air_humidity', 'water_level')
+
+# Conversion vers le fuseau courant identique à celle du serializer.
+_timestamp_field = serializers.DateTimeField()
+
+
+def _timestamp(value):
+    if type(value) is not str:
+        return None
+    try:
+        match = _LOCAL_TIMESTAMP.fullmatch(value)
+        if match:
+            day, month, year, hour, minute, second = map(int, match.groups())
+            parsed = datetime(year, month, day, hour, minute, second)
+        else:
+            match = _ISO_TIMESTAMP.fullmatch(value)
+            if match is None:
+                return None
+            year, month, day, hour, minute, second, fraction, zulu, sign, tz_hours, tz_minutes = match.groups()
+            microsecond = int(fraction.ljust(6, '0')) if fraction else 0
+            if zulu and fraction:
+                # '%fZ' : le Z est un littéral, le timestamp est interprété dans le fuseau courant.
+                tzinfo = None
+            elif zulu:
+                tzinfo = dt_timezone.utc
+            else:
+                offset = timedelta(hours=int(tz_hours), minutes=int(tz_minutes))
+                tzinfo = dt_timezone(-offset if sign == '-' else offset)
+            parsed = datetime(int(year), int(month), int(day), int(hour), int(minute), int(second),
+                              microsecond, tzinfo=tzinfo)
+        return _timestamp_field.enforce_timezone(parsed)
+    except (ValueError, OverflowError, serializers.ValidationError):
+        return None
+
+
+def _float(value):
+    kind = type(value)
+    if kind is float:
+        return value if math.isfinite(value) else None
+    if kind is int:
+        try:
+            return float(value)
+        except OverflowError:
+            return None
+    return None
+
+
+def _location_name(value):
+    if type(value) is not str:
+        return None
+    value = value.strip()
+    if not value or '\x00' in value:
+        return None
+    try:
+        value.encode('utf-8')
+    except UnicodeEncodeError:
+        # Caractères de substitution isolés, refusés par le serializer.
+        return None
+    return value
+
+
+def validate_location_name(value):
+    """Nom d'emplacement validé comme par IncomingLocationSerializer : (nom, None) ou (None, erreurs)."""
+    location_name = _location_name(value)
+    if location_name is not None:
+        return location_name, None
+    serializer = IncomingLocationSerializer(data={'location_name': value})
+    if serializer.is_valid():
+        return serializer.validated_data['location_name'], None
+    return None, serializer.errors
+
+
+def batch_size_errors(count):
+    """Erreurs d'IncomingBatchSerializer pour un lot de count relevés, None si 0 < count <= INGEST_MAX_BATCH_SIZE."""
+    if 0 < count <= settings.INGEST_MAX_BATCH_SIZE:
+        return None
+    messages = IncomingBatchSerializer().fields['readings'].error_messages
+    if count == 0:
+        return {'readings': [ErrorDetail(messages['empty'], code='empty')]}
+    message = messages['max_length'].format(max_length=settings.INGEST_MAX_BATCH_SIZE)
+    return {'readings': [ErrorDetail(message, code='max_length')]}
+
+
+def _string_keys(value):
+    return type(value) is dict and all(type(key) is str for key in value)
+
+
+def _fast_reading(data, with_device):
+    """Retourne le relevé validé, ou None si l'entrée doit passer par le serializer."""
+    if type(data) is not dict:
+        return None
+    timestamp = _timestamp(data.get('timestamp'))
+    locations = data.get('locations')
+    if timestamp is None or type(locations) is not list:
+        return None
+
+    validated_locations = []
+    for loc in locations:
+        if type(loc) is not dict:
+            return None
+        location_name = _location_name(loc.get('location_name'))
+        if location_name is None:
+            return None
+        if 'soil_moisture' not in loc:
+            validated_locations.append({'location_name': location_name})
+            continue
+        soil_moisture = loc['soil_moisture']
+        if soil_moisture is not None:
+            soil_moisture = _float(soil_moisture)
+            if soil_moisture is None:
+                return None
+        validated_locations.append({'location_name': location_name, 'soil_moisture': soil_moisture})
+
+    reading = {'timestamp': timestamp, 'locations': validated_locations}
+    for field in FLOAT_FIELDS:
+        value = _float(data.get(field))
+        if value is None:
+            return None
+        reading[field] = value
+
+    if 'seq' in data:
+        seq = data['seq']
+        if type(seq) is not int or seq < 0:
+            return None
+        reading['seq'] = seq
+
+    if with_device and 'raspberry' in data:
+        if not _string_keys(data['raspberry']):
+            return None
+        reading['raspberry'] = dict(data['raspberry'])
+    return reading
+
+
+def validate_reading(data, with_device=False):
+    """
+    Valide un relevé (IncomingReadingSerializer, ou IncomingDataSerializer si with_device).
+    Retourne (données validées, None) ou (None, erreurs du serializer).
+    """
+    reading = _fast_reading(data, with_device)
+    if reading is not None:
+        return reading, None
+    serializer = (IncomingDataSerializer if with_device else IncomingReadingSerializer)(data=data)
+    if serializer.is_valid():
+        return serializer.validated_data, None
+    return None, serializer.errors
+
+
+def validate_envelope(data):
+    """
+    Valide l'enveloppe d'un envoi groupé (IncomingBatchSerializer), sans les relevés eux-mêmes.
+    Retourne ({'raspberry': ..., 'readings': [...]}, None) ou (None, erreurs du serializer).
+    """
+    if type(data) is dict:
+        readings = data.get('readings')
+        if (type(readings) is list and 0 < len(readings) <= settings.INGEST_MAX_BATCH_SIZE
+                and all(_string_keys(reading) for reading in readings)
+                and ('raspberry' not in data or _string_keys(data['raspberry']))):
+            envelope = {'readings': readings}
+            if 'raspberry' in data:
+                envelope['raspberry'] = dict(data['raspberry'])
+            return envelope, None
+    serializer = IncomingBatchSerializer(data=data)
+    if serializer.is_valid():
+        return serializer.validated_data, None
+    return None, serializer.errors
@@ -1,4 +1,20 @@
 from .home import *
+from ..ingest import (
+    IngestRejected, resolve_cipher, aresolve_cipher, open_envelope, commit_submission,
+    admit, build_reply, encrypt_payload, open_binary_envelope, encrypt_binary, device_state, adevice_state,
+)
+from ..telemetry import BINARY_CONTENT_TYPE, KEY_ID_HEADER
+from ..ingest_queue import QueueUnavailable
+from ..keyring import UnknownKeyError
+from ..serializers import SensorDataBucketSerializer
+from ..timeseries import bucket_seconds
+from .. import db_pool, metrics, rollups
+from django.db import InterfaceError, OperationalError
+from django.http import JsonResponse, HttpResponse
+from asgiref.sync import sync_to_async
+
+import asyncio
+from operator import itemgetter
 
 @csrf_exempt
 @api_view(['POST'])
@@ -7,92 +23,148 @@ def receive_sensor_data(request):
     """
     Reçoit les données chiffrées depuis le Raspberry,
     les déchiffre, valide et enregistre dans la base.
+    Accepte un relevé unique ou un lot de relevés ({"raspberry": ..., "readings": [...]}),
+    en JSON ou au format binaire compact (Website/telemetry.py).
     """
     request_id = str(uuid.uuid4())
+    if request.content_type == BINARY_CONTENT_TYPE:
+        return receive_binary_sensor_data(request, request_id)
     try:
         encrypted_data_b64 = request.data.get('encrypted')
         if not encrypted_data_b64:
             logger.error(f"[{request_id}] Missing encrypted data.")
             return Response({"error": "Données chiffrées manquantes."}, status=status.HTTP_400_BAD_REQUEST)
 
-        encrypted_data = base64.b64decode(encrypted_data_b64)
-        nonce = encrypted_data[:12]
-        ciphertext = encrypted_data[12:]
-        aesgcm = AESGCM(settings.AES_SECRET_KEY)
-        decrypted_data = aesgcm.decrypt(nonce, ciphertext, None)
-        data = json.loads(decrypted_data.decode('utf-8'))
-
-        logger.debug(f"[{request_id}] Decrypted data: {data}")
-
-        serializer = IncomingDataSerializer(data=data)
-        if not serializer.is_valid():
-            logger.error(f"[{request_id}] Invalid data received: {serializer.errors}")
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-
-        validated_data = serializer.validated_data
-        timestamp = validated_data['timestamp']
-        device_name = validated_data['raspberry'].get('device_name')
-        locations = validated_data['locations'] 
-        temperature = validated_data['temperature']
-        air_humidity = validated_data['air_humidity']
-        water_level = validated_data.get('water_level')
-
-        with transaction.atomic():
-            group, _ = Group.objects.get_or_create(
-                name=DEFAULT_GROUP_NAME,
-                defaults={'description': "Default group for unassigned Raspberries."}
-            )
-            raspberry, _ = Raspberry.objects.get_or_create(
-                device_id=device_name,
-                defaults={'group': group, 'active': True, 'status': 'unassigned'}
-            )
-
-            for loc in locations:
-                location_name = loc['location_name']
-                soil_val = loc.get('soil_moisture', None)
-
-                sensor_location, _ = SensorLocation.objects.get_or_create(
-                    raspberry=raspberry,
-                    location_name=location_name
-                    
-                )
-                sensor_location.soil_moisture = soil_val
-                sensor_location.save()
-
-                SensorData.objects.create(
-                    sensor_location=sensor_location,
-                    timestamp=timestamp,
-                    temperature=temperature,
-                    air_humidity=air_humidity,
-                    soil_moisture=soil_val,
-                    water_level=water_level
-                )
-        
-        success_message = {
-            "message": "Données enregistrées avec succès.",
-            "raspberry": {
-                'id': raspberry.id,
-                'device_id': raspberry.device_id,
-                'group': raspberry.group.name if raspberry.group else "Non Assigné",
-                'active': raspberry.active,
-                'pump': raspberry.pump_state,
-                'fan': raspberry.fan_state,
-            }
-        }
-        nonce_resp = os.urandom(12)
-        data_bytes = json.dumps(success_message).encode('utf-8')
-        ciphertext_resp = aesgcm.encrypt(nonce_resp, data_bytes, None)
-        encrypted_data_resp = nonce_resp + ciphertext_resp
-        encrypted_data_b64_resp = base64.b64encode(encrypted_data_resp).decode('utf-8')
-        return Response({"encrypted": encrypted_data_b64_resp}, status=status.HTTP_201_CREATED)
+        key_id = request.data.get('key_id')
+        try:
+            raspberry_id, aesgcm = resolve_cipher(key_id)
+        except UnknownKeyError:
+            logger.warning(f"[{request_id}] Unknown or expired key id: {key_id}")
+            return Response({"error": "Clé inconnue ou expirée."}, status=status.HTTP_403_FORBIDDEN)
 
+        try:
+            submission = open_envelope(aesgcm, raspberry_id, encrypted_data_b64, request_id)
+            admit(submission, request_id)
+        except IngestRejected as e:
+            body = {"encrypted": encrypt_payload(aesgcm, e.body)} if e.encrypted else e.body
+            return Response(body, status=e.http_status, headers=e.headers)
+
+        raspberry_id, message, response_status = commit_submission(submission)
+        reply = build_reply(submission, raspberry_id, message, device_state(raspberry_id), request_id)
+        return Response({"encrypted": encrypt_payload(aesgcm, reply)}, status=response_status)
+
+    except (OperationalError, InterfaceError, QueueUnavailable) as e:
+        logger.error(f"[{request_id}] Database or ingest queue unavailable in receive_sensor_data: {e}")
+        return Response({"error": "Service temporairement indisponible."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
     except Exception as e:
         logger.exception(f"[{request_id}] Error in receive_sensor_data: {e}")
         return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+@csrf_exempt
+async def receive_sensor_data_async(request):
+    """
+    Version asynchrone de receive_sensor_data pour le serveur ASGI (INGEST_VIEW = 'async').
+    Le déchiffrement et la validation tournent hors de la boucle d'événements ;
+    l'écriture reste transactionnelle et partagée avec la vue synchrone.
+    """
+    request_id = str(uuid.uuid4())
+    if request.method != 'POST':
+        return JsonResponse({"error": "Méthode non autorisée."}, status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    if request.content_type == BINARY_CONTENT_TYPE:
+        return await areceive_binary_sensor_data(request, request_id)
+    try:
+        envelope = json.loads(request.body or b'{}')
+        encrypted_data_b64 = envelope.get('encrypted')
+        if not encrypted_data_b64:
+            logger.error(f"[{request_id}] Missing encrypted data.")
+            return JsonResponse({"error": "Données chiffrées manquantes."}, status=status.HTTP_400_BAD_REQUEST)
+
+        key_id = envelope.get('key_id')
+        try:
+            raspberry_id, aesgcm = await aresolve_cipher(key_id)
+        except UnknownKeyError:
+            logger.warning(f"[{request_id}] Unknown or expired key id: {key_id}")
+            return JsonResponse({"error": "Clé inconnue ou expirée."}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            submission = await asyncio.to_thread(open_envelope, aesgcm, raspberry_id, encrypted_data_b64, request_id)
+            await sync_to_async(admit)(submission, request_id)
+        except IngestRejected as e:
+            body = {"encrypted": encrypt_payload(aesgcm, e.body)} if e.encrypted else e.body
+            return JsonResponse(body, status=e.http_status, headers=e.headers)
+
+        raspberry_id, message, response_status = await sync_to_async(commit_submission)(submission)
+        reply = build_reply(submission, raspberry_id, message, await adevice_state(raspberry_id), request_id)
+        return JsonResponse({"encrypted": encrypt_payload(aesgcm, reply)}, status=response_status)
+
+    except (OperationalError, InterfaceError, QueueUnavailable) as e:
+        logger.error(f"[{request_id}] Database or ingest queue unavailable in receive_sensor_data_async: {e}")
+        return JsonResponse({"error": "Service temporairement indisponible."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        logger.exception(f"[{request_id}] Error in receive_sensor_data_async: {e}")
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def receive_binary_sensor_data(request, request_id):
+    """
+    Corps binaire : nonce + AES-GCM(relevés encodés), clé désignée par l'en-tête X-Eden-Key-Id.
+    La réponse chiffrée est renvoyée telle quelle (nonce + AES-GCM(JSON)), sans base64.
+    """
+    key_id = request.headers.get(KEY_ID_HEADER)
+    try:
+        raspberry_id, aesgcm = resolve_cipher(key_id)
+        submission = open_binary_envelope(aesgcm, raspberry_id, request.body, request_id)
+        admit(submission, request_id)
+        raspberry_id, message, response_status = commit_submission(submission)
+        reply = build_reply(submission, raspberry_id, message, device_state(raspberry_id), request_id)
+        return HttpResponse(encrypt_binary(aesgcm, reply), content_type=BINARY_CONTENT_TYPE, status=response_status)
+    except UnknownKeyError:
+        logger.warning(f"[{request_id}] Unknown or expired key id: {key_id}")
+        return JsonResponse({"error": "Clé inconnue ou expirée."}, status=status.HTTP_403_FORBIDDEN)
+    except IngestRejected as e:
+        return _binary_rejection(aesgcm, e)
+    except (OperationalError, InterfaceError, QueueUnavailable) as e:
+        logger.error(f"[{request_id}] Database or ingest queue unavailable in receive_binary_sensor_data: {e}")
+        return JsonResponse({"error": "Service temporairement indisponible."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        logger.exception(f"[{request_id}] Error in receive_binary_sensor_data: {e}")
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+async def areceive_binary_sensor_data(request, request_id):
+    """Version asynchrone de receive_binary_sensor_data."""
+    key_id = request.headers.get(KEY_ID_HEADER)
+    try:
+        raspberry_id, aesgcm = await aresolve_cipher(key_id)
+        submission = await asyncio.to_thread(open_binary_envelope, aesgcm, raspberry_id, request.body, request_id)
+        await sync_to_async(admit)(submission, request_id)
+        raspberry_id, message, response_status = await sync_to_async(commit_submission)(submission)
+        reply = build_reply(submission, raspberry_id, message, await adevice_state(raspberry_id), request_id)
+        return HttpResponse(encrypt_binary(aesgcm, reply), content_type=BINARY_CONTENT_TYPE, status=response_status)
+    except UnknownKeyError:
+        logger.warning(f"[{request_id}] Unknown or expired key id: {key_id}")
+        return JsonResponse({"error": "Clé inconnue ou expirée."}, status=status.HTTP_403_FORBIDDEN)
+    except IngestRejected as e:
+        return _binary_rejection(aesgcm, e)
+    except (OperationalError, InterfaceError, QueueUnavailable) as e:
+        logger.error(f"[{request_id}] Database or ingest queue unavailable in areceive_binary_sensor_data: {e}")
+        return JsonResponse({"error": "Service temporairement indisponible."}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    except Exception as e:
+        logger.exception(f"[{request_id}] Error in areceive_binary_sensor_data: {e}")
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _binary_rejection(aesgcm, error):
+    if error.encrypted:
+        return HttpResponse(encrypt_binary(aesgcm, error.body), content_type=BINARY_CONTENT_TYPE,
+                            status=error.http_status, headers=error.headers)
+    return JsonResponse(error.body, status=error.http_status, headers=error.headers)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@use_replica
 def get_latest_sensor_data(request, raspberry_id):
     request_id = str(uuid.uuid4())
     logger.debug(f"[{request_id}] Starting get_latest_sensor_data. User={request.user}, RaspberryID={raspberry_id}")
@@ -119,18 +191,50 @@ def get_latest_sensor_data(request, raspberry_id):
             logger.error(f"[{request_id}] Invalid time_range: {time_range}")
             return Response({"error": "Valeur de time_range invalide."}, status=status.HTTP_400_BAD_REQUEST)
 
+        max_points = request.GET.get('max_points', str(settings.SENSOR_DATA_API['DEFAULT_POINTS']))
+        if not max_points.isdigit() or int(max_points) < 2:
+            logger.error(f"[{request_id}] Invalid max_points: {max_points}")
+            return Response({"error": "Valeur de max_points invalide."}, status=status.HTTP_400_BAD_REQUEST)
+        max_points = min(int(max_points), settings.SENSOR_DATA_API['MAX_POINTS'])
+
         end_time = now()
         start_time = end_time - timedelta(hours=time_range)
+        # Créneaux de durée fixe choisie pour ne pas dépasser max_points par emplacement ; les agrégats
+        # horaires ou journaliers remplacent les données brutes au-delà de ROLLUPS['HOURLY_FROM_HOURS'].
+        seconds = bucket_seconds(start_time, end_time, max_points)
+        logger.debug(f"[{request_id}] Serving {seconds} s buckets for time_range={time_range}, max_points={max_points}")
 
         sensor_locations = SensorLocation.objects.filter(raspberry=raspberry)
-        sensor_data = SensorData.objects.filter(
-            sensor_location__in=sensor_locations,
-            timestamp__gte=start_time
-        ).order_by('timestamp')
-
-        serializer = SensorDataSerializer(sensor_data, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        locations = {location.id: location for location in sensor_locations.select_related('raspberry', 'plant')}
+        device = {row['bucket_start']: row for row in rollups.reading_series(raspberry, start_time, end_time, seconds)}
+        rows = []
+        for bucket in rollups.soil_series(sensor_locations, start_time, end_time, seconds):
+            reading = device.get(bucket['bucket_start'], {})
+            rows.append({
+                'sensor_location': locations[bucket['sensor_location_id']],
+                'timestamp': bucket['bucket_start'],
+                'count': bucket['soil_moisture_count'],
+                'temperature': reading.get('temperature_avg'),
+                'temperature_min': reading.get('temperature_min'),
+                'temperature_max': reading.get('temperature_max'),
+                'air_humidity': reading.get('air_humidity_avg'),
+                'air_humidity_min': reading.get('air_humidity_min'),
+                'air_humidity_max': reading.get('air_humidity_max'),
+                'soil_moisture': bucket['soil_moisture_avg'],
+                'soil_moisture_min': bucket['soil_moisture_min'],
+                'soil_moisture_max': bucket['soil_moisture_max'],
+            })
+        rows.sort(key=itemgetter('timestamp'))
+        return Response(
+            SensorDataBucketSerializer(rows, many=True).data, status=status.HTTP_200_OK,
+            headers={'X-Bucket-Seconds': str(seconds)}
+        )
 
     except Exception as e:
         logger.exception(f"[{request_id}] Error in get_latest_sensor_data for Raspberry={raspberry_id}: {e}")
-        return Response({"error": "Erreur interne du serveur."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({"error": "Erreur interne du serveur."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@user_passes_test(is_admin, login_url='login')
+def get_metrics(request):
+    return JsonResponse(metrics.collect())
@@ -20,7 +20,9 @@ import os
 
 import logging
 
-from ..models import SensorData, SensorLocation, Group
+from ..models import Reading, SensorData, SensorLocation, Group
+from .. import chunks
+from ..replicas import use_replica
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
@@ -78,6 +80,7 @@ def home_page(request):
     return render(request, 'home.html')
 
 @login_required(login_url='login')
+@use_replica
 def statuses_page(request):
     request_id = str(uuid.uuid4())
     logger.debug(f"[{request_id}] Starting statuses_page. User={request.user}, Method={request.method}")
@@ -87,7 +90,7 @@ def statuses_page(request):
         if user.is_superuser or user.is_staff:
             logger.debug(f"[{request_id}] {user} is admin/staff. Fetching all active raspberries.")
             raspberries = Raspberry.objects.filter(active=True).annotate(
-                last_data=Max('sensor_locations__sensor_data__timestamp')
+                last_data=chunks.last_data()
             )
         else:
             logger.debug(f"[{request_id}] {user} is standard user. Fetching raspberries by group.")
@@ -99,7 +102,7 @@ def statuses_page(request):
                     'error': "Vous n'êtes associé à aucun groupe.",
                 })
             raspberries = Raspberry.objects.filter(group__in=user_groups, active=True).annotate(
-                last_data=Max('sensor_locations__sensor_data__timestamp')
+                last_data=chunks.last_data()
             )
 
         current_time = now()
@@ -130,6 +133,7 @@ def statuses_page(request):
         })
     
 
+@use_replica
 def guest_statuses_page(request):
     request_id = str(uuid.uuid4())
     logger.debug(f"[{request_id}] Starting guest_statuses_page. User={request.user}, Method={request.method}")
@@ -145,7 +149,7 @@ def guest_statuses_page(request):
                 'error': "Vous n'êtes associé à aucun groupe.",
             })
         raspberries = Raspberry.objects.filter(group__in=user_groups, active=True).annotate(
-            last_data=Max('sensor_locations__sensor_data__timestamp')
+            last_data=chunks.last_data()
         )
 
         current_time = now()